@@ -0,0 +1,7 @@
+"""Benchmarks for pg_analyse. Not a part of the distribution.
+
+Run as modules from the repository root, e.g.:
+
+    $ python -m benchmarks.inspections --help
+
+"""
@@ -0,0 +1,86 @@
+from collections import namedtuple
+from typing import List, Sequence
+
+Column = namedtuple('Column', ['name'])
+
+COLUMNS = ('table_name', 'index_name', 'table_size', 'index_size', 'bloat_size', 'bloat_percentage')
+"""Columns resembling those of index_health inspections results."""
+
+
+class FakeDriver:
+    """Imitates psycopg module, its connections and cursors
+    synthesizing results of the given size for every query.
+
+    Used instead of psycopg in `pg_analyse.toolbox` to measure
+    Python-side costs without a database.
+
+    """
+
+    def __init__(self, *, rows: int = 1_000_000, columns: Sequence[str] = COLUMNS):
+        """
+
+        :param rows: Number of rows in every result.
+        :param columns: Result columns names. Names containing "size" get sizes (integers),
+            those containing "percentage" get floats, others get strings.
+
+        """
+        self.rows_count = rows
+        self.columns = list(columns)
+        self._rows = None
+        self._offset = 0
+
+    def _get_rows(self) -> List[tuple]:
+
+        rows = self._rows
+
+        if rows is None:
+            makers = []
+
+            for name in self.columns:
+                if 'size' in name:
+                    makers.append(lambda idx: idx * 8192 + 1)
+                elif 'percentage' in name:
+                    makers.append(lambda idx: idx % 100 + 0.5)
+                else:
+                    makers.append(lambda idx, name=name: f'{name}_{idx}')
+
+            rows = self._rows = [tuple(make(idx) for make in makers) for idx in range(self.rows_count)]
+
+        return rows
+
+    @property
+    def description(self) -> List[Column]:
+        return [Column(name) for name in self.columns]
+
+    def connect(self, *args, **kwargs) -> 'FakeDriver':
+        return self
+
+    def cursor(self, *args) -> 'FakeDriver':
+        return self
+
+    def execute(self, *args, **kwargs):
+        self._offset = 0
+
+    def fetchall(self) -> List[tuple]:
+        # A new list every time, like a real driver.
+        return list(self._get_rows())
+
+    def fetchmany(self, size: int) -> List[tuple]:
+        offset = self._offset
+        self._offset += size
+        return self._get_rows()[offset:offset + size]
+
+    def rollback(self):
+        pass
+
+    def cancel(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
@@ -0,0 +1,189 @@
+"""Measures Python-side time and peak memory of formatting analysis results
+using a fake driver synthesizing large results (see FakeDriver).
+
+Compares measurements with stored baselines to reveal regressions:
+
+    $ python -m benchmarks.formatters
+    $ python -m benchmarks.formatters --update  # store new baselines
+
+Peak memory is deterministic, so it is compared by default. Times depend on the machine
+and its load, so they are only compared if asked (--time), as ratios to the time
+of the reference case (REFERENCE: rows joined into text by plain Python code)
+measured in the same run:
+
+    $ python -m benchmarks.formatters --time  # on an idle machine
+
+"""
+import argparse
+import json
+import platform
+import sys
+import tracemalloc
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Sequence
+from unittest.mock import patch
+
+from pg_analyse.formatters import Formatter
+from pg_analyse.toolbox import Analyser, analyse_and_format
+
+from .driver import FakeDriver
+
+PATH_BASELINES = Path(__file__).parent / 'baselines' / 'formatters.json'
+"""File to store baselines in."""
+
+REFERENCE = 'plain'
+"""Case times of other cases are divided by: rows are joined into text by plain Python code,
+so that its time scales with the machine and interpreter speed like that of formatters.
+
+"""
+
+METRICS = ('memory',)
+"""Measurements compared with baselines by default."""
+
+METRICS_TIME = ('ratio',)
+"""Measurements compared with baselines if asked (--time). Absolute time is stored for information only."""
+
+
+def measure(*, driver: FakeDriver, fmt: Optional[str], human: bool, only: List[str], repeat: int) -> Dict[str, float]:
+    """Returns best time (seconds) and peak memory (MB) for analyse_and_format().
+
+    :param driver:
+    :param fmt: Formatter alias. None - measure the reference case (see REFERENCE).
+    :param human: Human friendly values formatting.
+    :param only: Inspections to run.
+    :param repeat: Number of time measurements.
+
+    """
+    run: Callable[[], None]
+
+    if fmt is None:
+        def run():
+            for inspection in Analyser(dsn='fake').run(only=only):
+                '\n'.join(', '.join(f'{value}' for value in row) for row in inspection.result.rows)
+
+    else:
+        def run():
+            analyse_and_format(dsn='fake', fmt=fmt, human=human, only=only)
+
+    with patch('pg_analyse.toolbox.psycopg', driver):
+        # Warm up synthesized rows.
+        driver.fetchall()
+
+        times = []
+
+        for _ in range(repeat):
+            started = perf_counter()
+            run()
+            times.append(perf_counter() - started)
+
+        # Separate run, since tracing slows things down.
+        tracemalloc.start()
+
+        try:
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'time': round(min(times), 4),
+        'memory': round(peak / 1024 / 1024, 2),
+    }
+
+
+def compare(current: dict, baseline: dict, *, tolerance: float, metrics: Sequence[str] = METRICS) -> List[str]:
+    """Returns regressions descriptions.
+
+    :param current: Measurements.
+    :param baseline: Baseline measurements.
+    :param tolerance: Allowed relative increase (e.g. 0.2 for 20%).
+    :param metrics: Measurements to compare.
+
+    """
+    regressions = []
+
+    for case, values in current.items():
+        base = baseline.get(case)
+
+        if not base:
+            regressions.append(f'{case}: no baseline, use --update to store one')
+            continue
+
+        for metric in metrics:
+            value = values.get(metric)
+            base_value = base.get(metric)
+
+            if base_value and value > base_value * (1 + tolerance):
+                regressions.append(f'{case} {metric}: {value} vs {base_value} baseline (+{value / base_value - 1:.0%})')
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        '--rows', type=int, default=1_000_000,
+        help='Rows in every inspection result (baselines are stored for the default)')
+    parser.add_argument('--one', action='append', help='Inspection alias to run (default: idx_bloat)')
+    parser.add_argument('--fmt', action='append', help='Formatter alias to measure (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='Time measurements per case (best is taken)')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative increase over baseline')
+    parser.add_argument(
+        '--time', action='store_true',
+        help='Compare times too (as ratios to the reference case time). Use on an idle machine')
+    parser.add_argument('--update', action='store_true', help='Store measurements as new baselines')
+
+    args = parser.parse_args()
+
+    driver = FakeDriver(rows=args.rows)
+    only = args.one or ['idx_bloat']
+
+    cases = {REFERENCE: (None, False)}
+
+    for fmt in args.fmt or list(Formatter.formatters_all):
+        for human in (False, True):
+            cases[f"{fmt}{'-human' if human else ''}"] = (fmt, human)
+
+    current = {}
+
+    for case, (fmt, human) in cases.items():
+        current[case] = values = measure(driver=driver, fmt=fmt, human=human, only=only, repeat=args.repeat)
+        values['ratio'] = round(values['time'] / current[REFERENCE]['time'], 2)
+        print(f'{case}: {values["time"]} s (x{values["ratio"]} of {REFERENCE}), {values["memory"]} MB', file=sys.stderr)
+
+    key = f'{args.rows}:{",".join(sorted(only))}'
+
+    baselines = {}
+
+    if PATH_BASELINES.exists():
+        baselines = json.loads(PATH_BASELINES.read_text())
+
+    if args.update:
+        baseline = baselines.setdefault(key, {'cases': {}})
+        baseline['python'] = platform.python_version()
+        baseline['cases'].update(current)
+        PATH_BASELINES.parent.mkdir(parents=True, exist_ok=True)
+        PATH_BASELINES.write_text(json.dumps(baselines, indent=2, sort_keys=True) + '\n')
+        return
+
+    baseline = baselines.get(key)
+
+    if not baseline:
+        print(f'No baseline for {key}. Use --update to store one.', file=sys.stderr)
+        sys.exit(1)
+
+    regressions = compare(
+        current, baseline['cases'], tolerance=args.tolerance,
+        metrics=METRICS + METRICS_TIME if args.time else METRICS)
+
+    for regression in regressions:
+        print(f'REGRESSION {regression}', file=sys.stderr)
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
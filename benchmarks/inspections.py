@@ -0,0 +1,234 @@
+"""Times index_health inspections against synthetic schemas of growing size.
+
+Schemas are generated in a throwaway local PostgreSQL (see LocalPostgres)
+or in databases created using the given DSN.
+
+    $ python -m benchmarks.inspections --scales 1000,10000 --out report.json
+
+"""
+import argparse
+import json
+import math
+import platform
+import sys
+from time import monotonic
+from typing import List, Dict, Optional
+
+import psycopg
+from psycopg.conninfo import make_conninfo
+
+from pg_analyse import VERSION_STR
+from pg_analyse.inspections import Inspection
+from pg_analyse.inspections.contrib.index_health import inspections as index_health
+from pg_analyse.toolbox import Analyser
+
+from .schema import SchemaSpec, iter_schema_sql
+from .server import LocalPostgres
+
+SCHEMA = 'bench'
+
+EXPONENT_WARN = 1.5
+"""Growth exponent (time ~ relations ** exponent) considered alarming."""
+
+
+def get_inspections(only: List[str] = None) -> List[str]:
+    """Returns aliases of index_health inspections to benchmark.
+
+    :param only: Aliases to limit to.
+
+    """
+    return [
+        inspection_cls.alias for inspection_cls in Inspection.inspections_all
+        if inspection_cls.__module__ == index_health.__name__ and (not only or inspection_cls.alias in only)]
+
+
+def create_schema(dsn: str, spec: SchemaSpec) -> float:
+    """Creates synthetic schema. Returns seconds spent.
+
+    :param dsn:
+    :param spec:
+
+    """
+    started = monotonic()
+
+    with psycopg.connect(dsn, autocommit=True) as connection:
+        for sql in iter_schema_sql(spec, schema=SCHEMA):
+            connection.execute(sql)
+
+    return monotonic() - started
+
+
+def count_relations(dsn: str) -> int:
+    with psycopg.connect(dsn) as connection:
+        return connection.execute('SELECT count(*) FROM pg_class').fetchone()[0]
+
+
+def time_inspections(dsn: str, *, aliases: List[str], repeat: int) -> Dict[str, dict]:
+    """Runs every inspection `repeat` times, returns best times.
+
+    :param dsn:
+    :param aliases:
+    :param repeat:
+
+    """
+    out = {}
+
+    for alias in aliases:
+        times = []
+        entry = {}
+
+        for _ in range(repeat):
+            inspection = Analyser(dsn=dsn, profile=True).run(
+                only=[alias], arguments={'common': {'schema': SCHEMA}})[0]
+
+            if inspection.errors:
+                entry['error'] = '\n'.join(inspection.errors)
+                break
+
+            times.append(inspection.profile['time'])
+            entry['rows'] = inspection.profile['rows']
+
+        if times:
+            entry['time'] = min(times)
+
+        out[alias] = entry
+
+    return out
+
+
+def get_exponent(prev: dict, current: dict, alias: str) -> Optional[float]:
+    """Estimates growth exponent of inspection time from relations count
+    between two adjacent scales.
+
+    """
+    time_prev = prev['inspections'][alias].get('time')
+    time_current = current['inspections'][alias].get('time')
+    ratio = current['relations'] / prev['relations']
+
+    if not (time_prev and time_current) or ratio <= 1:
+        return None
+
+    return round(math.log(time_current / time_prev) / math.log(ratio), 2)
+
+
+def run(*, dsn: str, scales: List[int], spec: SchemaSpec, aliases: List[str], repeat: int) -> dict:
+    """Runs the benchmark. Returns report.
+
+    :param dsn: DSN to create benchmark databases with.
+    :param scales: Numbers of tables for every step.
+    :param spec: Base schema description (tables number is taken from scales).
+    :param aliases: Inspections to benchmark.
+    :param repeat: Number of runs for every inspection (best time is taken).
+
+    """
+    with psycopg.connect(dsn, autocommit=True) as connection:
+        server_version = connection.execute('SHOW server_version').fetchone()[0]
+
+    report = {
+        'meta': {
+            'pg_analyse': VERSION_STR,
+            'python': platform.python_version(),
+            'postgresql': server_version,
+            'repeat': repeat,
+        },
+        'results': [],
+    }
+
+    results = report['results']
+
+    for tables in scales:
+        spec_current = SchemaSpec(**{**spec.as_dict(), 'tables': tables})
+        dbname = f'pg_analyse_bench_{tables}'
+
+        with psycopg.connect(dsn, autocommit=True) as connection:
+            connection.execute(f'DROP DATABASE IF EXISTS {dbname}')
+            connection.execute(f'CREATE DATABASE {dbname}')
+
+        dsn_bench = make_conninfo(dsn, dbname=dbname)
+
+        try:
+            print(f'Creating schema with {tables} tables ...', file=sys.stderr)
+            created_in = create_schema(dsn_bench, spec_current)
+
+            result = {
+                'spec': spec_current.as_dict(),
+                'relations': count_relations(dsn_bench),
+                'schema_created_in': round(created_in, 3),
+            }
+
+            print(f'Timing inspections over {result["relations"]} relations ...', file=sys.stderr)
+            result['inspections'] = time_inspections(dsn_bench, aliases=aliases, repeat=repeat)
+
+        finally:
+            with psycopg.connect(dsn, autocommit=True) as connection:
+                connection.execute(f'DROP DATABASE IF EXISTS {dbname}')
+
+        if results:
+            for alias, entry in result['inspections'].items():
+                exponent = get_exponent(results[-1], result, alias)
+
+                if exponent is not None:
+                    entry['exponent'] = exponent
+
+                    if exponent > EXPONENT_WARN:
+                        print(f'WARNING: {alias} time grows as relations ** {exponent}', file=sys.stderr)
+
+        results.append(result)
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        '--dsn', default='',
+        help='DSN to a server to create benchmark databases on. If not set a local server is initialized')
+    parser.add_argument('--scales', default='100,1000,10000', help='Comma-separated tables numbers')
+    parser.add_argument('--indexes', type=int, default=SchemaSpec.indexes, help='Secondary indexes per table')
+    parser.add_argument('--fks', type=int, default=SchemaSpec.fks, help='Tables with foreign keys')
+    parser.add_argument('--partitioned', type=int, default=SchemaSpec.partitioned, help='Partitioned tables')
+    parser.add_argument('--partitions', type=int, default=SchemaSpec.partitions, help='Partitions per table')
+    parser.add_argument('--sequences', type=int, default=SchemaSpec.sequences, help='Standalone sequences')
+    parser.add_argument('--rows', type=int, default=SchemaSpec.rows, help='Rows per table')
+    parser.add_argument('--one', action='append', help='Inspection alias to limit runs')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per inspection (best time is taken)')
+    parser.add_argument('--out', default='', help='File to write JSON report into (default: stdout)')
+
+    args = parser.parse_args()
+
+    spec = SchemaSpec(
+        indexes=args.indexes,
+        fks=args.fks,
+        partitioned=args.partitioned,
+        partitions=args.partitions,
+        sequences=args.sequences,
+        rows=args.rows,
+    )
+
+    kwargs = dict(
+        scales=[int(scale) for scale in args.scales.split(',') if scale.strip()],
+        spec=spec,
+        aliases=get_inspections(args.one),
+        repeat=max(args.repeat, 1),
+    )
+
+    if args.dsn:
+        report = run(dsn=args.dsn, **kwargs)
+
+    else:
+        # Many relations are created and dropped at once.
+        with LocalPostgres(settings={'max_locks_per_transaction': 1024}) as dsn:
+            report = run(dsn=dsn, **kwargs)
+
+    out = json.dumps(report, indent=2)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(out)
+
+    else:
+        print(out)
+
+
+if __name__ == '__main__':
+    main()
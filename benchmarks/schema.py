@@ -0,0 +1,130 @@
+from dataclasses import dataclass, asdict
+from typing import Iterator
+
+
+@dataclass
+class SchemaSpec:
+    """Synthetic schema description.
+
+    Tables are made to trigger various inspections: tables without PK,
+    foreign keys without indexes, duplicated and intersecting indexes,
+    indexes on boolean and array columns, json columns, etc.
+
+    """
+
+    tables: int = 100
+    """Number of regular tables."""
+
+    indexes: int = 3
+    """Number of secondary indexes per table (max 6)."""
+
+    fks: int = 50
+    """Number of tables with a foreign key to a previous table."""
+
+    partitioned: int = 5
+    """Number of partitioned tables."""
+
+    partitions: int = 10
+    """Number of partitions per partitioned table."""
+
+    sequences: int = 20
+    """Number of standalone sequences."""
+
+    rows: int = 10
+    """Number of rows per table."""
+
+    nopk_every: int = 10
+    """Every N-th table has no primary key."""
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+INDEXES = (
+    'CREATE INDEX ON %1$I.%2$I (name)',
+    'CREATE INDEX ON %1$I.%2$I (name)',  # duplicate
+    'CREATE INDEX ON %1$I.%2$I (name, parent_id)',  # intersects
+    'CREATE INDEX ON %1$I.%2$I (flag)',
+    'CREATE INDEX ON %1$I.%2$I (tags)',
+    'CREATE INDEX ON %1$I.%2$I (parent_id)',
+)
+"""Secondary index templates for format() (schema, table)."""
+
+
+def iter_schema_sql(spec: SchemaSpec, *, schema: str = 'bench', batch: int = 500) -> Iterator[str]:
+    """Yields SQL statements creating a synthetic schema.
+
+    Objects are created server-side in batches (DO blocks),
+    each batch is meant to be run in its own transaction
+    not to exceed max_locks_per_transaction.
+
+    :param spec: Schema description.
+    :param schema: Schema name.
+    :param batch: Number of tables created by one statement.
+
+    """
+    assert schema.isidentifier(), 'Schema name must be an identifier'
+
+    indexes = INDEXES[:max(min(spec.indexes, len(INDEXES)), 0)]
+    indexes_sql = '\n    '.join(f"EXECUTE format('{index}', s, t);" for index in indexes)
+
+    yield f'CREATE SCHEMA IF NOT EXISTS {schema}'
+
+    for start in range(1, spec.tables + 1, batch):
+        stop = min(start + batch - 1, spec.tables)
+
+        yield f'''
+DO $$
+DECLARE
+  s text := '{schema}';
+  t text;
+BEGIN
+  FOR i IN {start}..{stop} LOOP
+    t := 't_' || i;
+
+    EXECUTE format(
+      'CREATE TABLE %I.%I (id %s, parent_id bigint, flag boolean, payload json, tags int[], name text)',
+      s, t, CASE WHEN i % {spec.nopk_every} = 0 THEN 'bigint' ELSE 'bigserial PRIMARY KEY' END);
+
+    {indexes_sql}
+
+    IF i > 1 AND i <= {spec.fks} + 1 AND i % {spec.nopk_every} <> 0 AND (i - 1) % {spec.nopk_every} <> 0 THEN
+      EXECUTE format(
+        'ALTER TABLE %1$I.%2$I ADD FOREIGN KEY (parent_id) REFERENCES %1$I.%3$I (id)', s, t, 't_' || (i - 1));
+    END IF;
+
+    EXECUTE format(
+      'INSERT INTO %I.%I (id, parent_id, flag, payload, tags, name) '
+      'SELECT g, NULL, g %% 2 = 0, ''{{}}''::json, ARRAY[g], md5(g::text) FROM generate_series(1, {spec.rows}) g',
+      s, t);
+  END LOOP;
+END $$'''
+
+    for idx in range(1, spec.partitioned + 1):
+        yield f'''
+DO $$
+DECLARE
+  s text := '{schema}';
+  t text := 'p_{idx}';
+BEGIN
+  EXECUTE format('CREATE TABLE %I.%I (id bigint, created date, name text) PARTITION BY HASH (id)', s, t);
+  EXECUTE format('CREATE INDEX ON %I.%I (name)', s, t);
+
+  FOR i IN 0..{spec.partitions - 1} LOOP
+    EXECUTE format(
+      'CREATE TABLE %1$I.%2$I PARTITION OF %1$I.%3$I FOR VALUES WITH (MODULUS {spec.partitions}, REMAINDER %4$s)',
+      s, t || '_' || i, t, i);
+  END LOOP;
+END $$'''
+
+    if spec.sequences:
+        yield f'''
+DO $$
+BEGIN
+  FOR i IN 1..{spec.sequences} LOOP
+    EXECUTE format('CREATE SEQUENCE %I.%I MAXVALUE 100', '{schema}', 'seq_' || i);
+    EXECUTE format('SELECT setval(%L, 90)', '{schema}.seq_' || i);
+  END LOOP;
+END $$'''
+
+    yield 'ANALYZE'
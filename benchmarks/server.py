@@ -0,0 +1,109 @@
+import os
+import shutil
+import socket
+import subprocess
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Optional
+
+
+class LocalPostgres:
+    """Throwaway PostgreSQL instance initialized in a temporary directory.
+
+    Requires PostgreSQL server binaries (initdb, pg_ctl) to be available
+    in PATH or in a directory from PG_BIN environment variable.
+
+    Usage:
+
+        with LocalPostgres() as dsn:
+            ...
+
+    """
+
+    def __init__(self, *, bin_dir: str = '', settings: dict = None):
+        """
+
+        :param bin_dir: Directory with PostgreSQL binaries.
+
+        :param settings: Additional server settings, e.g. {'shared_buffers': '256MB'}.
+
+        """
+        self.bin_dir = bin_dir or os.environ.get('PG_BIN', '')
+        self.settings = {
+            'listen_addresses': "''",
+            'fsync': 'off',
+            'synchronous_commit': 'off',
+            'full_page_writes': 'off',
+            **(settings or {}),
+        }
+        self._tmp: Optional[TemporaryDirectory] = None
+        self._data_dir: Optional[Path] = None
+
+    def _get_bin(self, name: str) -> str:
+
+        bin_dir = self.bin_dir
+
+        if bin_dir:
+            return str(Path(bin_dir) / name)
+
+        path = shutil.which(name)
+
+        if not path:
+            raise RuntimeError(f'Unable to find "{name}". Put PostgreSQL binaries into PATH or set PG_BIN.')
+
+        return path
+
+    @staticmethod
+    def _get_port() -> int:
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            return sock.getsockname()[1]
+
+    def start(self) -> str:
+        """Initializes and starts the server. Returns DSN to connect to it."""
+
+        self._tmp = TemporaryDirectory(prefix='pg_analyse_bench_')
+        tmp = Path(self._tmp.name)
+        data_dir = tmp / 'data'
+        port = self._get_port()
+
+        subprocess.run(
+            [self._get_bin('initdb'), '-D', str(data_dir), '-U', 'postgres', '--auth=trust', '--no-sync'],
+            check=True, capture_output=True)
+
+        options = ' '.join(f'-c {name}={value}' for name, value in self.settings.items())
+
+        subprocess.run(
+            [
+                self._get_bin('pg_ctl'), '-D', str(data_dir), '-w', '-l', str(tmp / 'server.log'),
+                '-o', f'-p {port} -k {tmp} {options}', 'start',
+            ],
+            check=True, capture_output=True)
+
+        self._data_dir = data_dir
+
+        return f'host={tmp} port={port} user=postgres dbname=postgres'
+
+    def stop(self):
+        """Stops the server and removes its data."""
+
+        if self._data_dir:
+            subprocess.run(
+                [self._get_bin('pg_ctl'), '-D', str(self._data_dir), '-m', 'immediate', 'stop'],
+                capture_output=True)
+            self._data_dir = None
+
+        if self._tmp:
+            self._tmp.cleanup()
+            self._tmp = None
+
+    def __enter__(self) -> str:
+        try:
+            return self.start()
+
+        except Exception:
+            self.stop()
+            raise
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
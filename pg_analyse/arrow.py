@@ -0,0 +1,301 @@
+import json
+import os
+from datetime import datetime, timezone
+from decimal import ROUND_HALF_EVEN, Context, Decimal, InvalidOperation
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence, Union
+
+try:
+    import pyarrow as pa
+
+except ImportError as e:  # pragma: nocover
+    raise ImportError('Arrow export requires pyarrow. Install it with: pip install pg_analyse[arrow]') from e
+
+from .inspections import Inspection, InspectionResult
+
+NUMERIC_SCALE = 9
+"""Digits after the decimal point kept for numeric values."""
+
+NUMERIC_TYPE = pa.decimal128(38, NUMERIC_SCALE)
+"""Arrow type for numeric values. Fixed, so that values of all batches fit
+the type regardless of precision and scale of values of the first batch.
+
+"""
+
+ARROW_TYPES = {
+    16: pa.bool_(),  # bool
+    18: pa.string(),  # char
+    19: pa.string(),  # name
+    20: pa.int64(),  # int8
+    21: pa.int16(),  # int2
+    23: pa.int32(),  # int4
+    25: pa.string(),  # text
+    26: pa.int64(),  # oid
+    114: pa.string(),  # json
+    700: pa.float32(),  # float4
+    701: pa.float64(),  # float8
+    1000: pa.list_(pa.bool_()),  # bool[]
+    1002: pa.list_(pa.string()),  # char[]
+    1003: pa.list_(pa.string()),  # name[]
+    1005: pa.list_(pa.int16()),  # int2[]
+    1007: pa.list_(pa.int32()),  # int4[]
+    1009: pa.list_(pa.string()),  # text[]
+    1015: pa.list_(pa.string()),  # varchar[]
+    1016: pa.list_(pa.int64()),  # int8[]
+    1021: pa.list_(pa.float32()),  # float4[]
+    1022: pa.list_(pa.float64()),  # float8[]
+    1042: pa.string(),  # bpchar
+    1043: pa.string(),  # varchar
+    1082: pa.date32(),  # date
+    1083: pa.time64('us'),  # time
+    1114: pa.timestamp('us'),  # timestamp
+    1184: pa.timestamp('us', tz='UTC'),  # timestamptz
+    1186: pa.duration('us'),  # interval
+    1700: NUMERIC_TYPE,  # numeric
+    2950: pa.string(),  # uuid
+    3802: pa.string(),  # jsonb
+}
+"""Arrow types for PostgreSQL type OIDs. Types not listed here are inferred from values,
+decimals being of NUMERIC_TYPE.
+
+"""
+
+_numeric_context = Context(prec=76)
+_numeric_quantum = Decimal(1).scaleb(-NUMERIC_SCALE)
+
+
+def _cast_numeric(value: Decimal) -> Decimal:
+    """Rounds numeric value to NUMERIC_SCALE digits after the decimal point.
+    Values too large to be rounded are returned as is.
+
+    """
+    if not isinstance(value, Decimal) or not value.is_finite():
+        return value
+
+    try:
+        return value.quantize(_numeric_quantum, rounding=ROUND_HALF_EVEN, context=_numeric_context)
+
+    except InvalidOperation:
+        return value
+
+
+VALUE_CASTERS = {
+    114: json.dumps,
+    1700: _cast_numeric,
+    2950: str,
+    3802: json.dumps,
+}
+"""Casters for values of PostgreSQL type OIDs not having native Arrow counterparts."""
+
+DATASET_FORMATS = {
+    'parquet': 'parquet',
+    'arrow': 'arrow',
+}
+"""Dataset formats aliases mapped to files extensions."""
+
+
+def get_arrow_array(values: Sequence, *, oid: Optional[int] = None, type_: 'pa.DataType' = None) -> 'pa.Array':
+    """Returns Arrow array for column values.
+
+    Raises ValueError if a value does not fit the type (e.g. a fractional or too large
+    number for an integer type, a numeric beyond NUMERIC_TYPE, numeric NaN),
+    rather than losing it.
+
+    :param values:
+    :param oid: PostgreSQL type OID of values.
+    :param type_: Arrow type to use (e.g. from the schema of the first batch).
+        If not set it is taken from the OID or inferred from values.
+
+    """
+    caster = VALUE_CASTERS.get(oid)
+
+    if caster:
+        values = [None if value is None else caster(value) for value in values]
+
+    type_ = type_ or ARROW_TYPES.get(oid)
+
+    if type_ is not None and pa.types.is_integer(type_) and {type(value) for value in values} - {int, type(None)}:
+        # Arrow truncates fractional values to integers.
+        _check_fitting(values, type_)
+
+    try:
+        array = pa.array(values, type=type_)
+
+        if type_ is None and pa.types.is_decimal(array.type):
+            # Inferred precision and scale may not fit values of subsequent batches.
+            array = pa.array([None if value is None else _cast_numeric(value) for value in values], type=NUMERIC_TYPE)
+
+    except (pa.ArrowInvalid, pa.ArrowTypeError, ArithmeticError, OverflowError):
+
+        if type_ is None or pa.types.is_string(type_):
+            # Values of unknown types not fitting into one Arrow type are stringified.
+            array = pa.array([None if value is None else f'{value}' for value in values], type=pa.string())
+
+        else:
+            _check_fitting(values, type_)
+            raise
+
+    if pa.types.is_null(array.type):
+        # No values to infer a type from.
+        array = pa.nulls(len(array), pa.string())
+
+    return array
+
+
+def _check_fitting(values: Sequence, type_: 'pa.DataType'):
+    """Raises ValueError for the first value not fitting the Arrow type."""
+    integer = pa.types.is_integer(type_)
+
+    for value in values:
+
+        if value is None:
+            continue
+
+        if isinstance(value, Decimal) and pa.types.is_decimal(type_):
+            value = _cast_numeric(value)
+
+        try:
+            if integer and type(value) is not int and value != int(value):
+                raise ArithmeticError
+
+            pa.scalar(value, type=type_)
+
+        except (pa.ArrowInvalid, pa.ArrowTypeError, ArithmeticError, OverflowError, TypeError, ValueError):
+            raise ValueError(f'Value {value!r} does not fit column type {type_}') from None
+
+
+def iter_record_batches(result: InspectionResult, *, batch_size: int = 65536) -> Iterator['pa.RecordBatch']:
+    """Yields Arrow record batches for inspection result.
+    Lazily fetched rows are consumed in the process.
+
+    The first batch defines the schema: types inferred from its values
+    are used for the subsequent batches. Raises ValueError for values not fitting them.
+
+    :param result:
+    :param batch_size: Maximum number of rows in a batch.
+
+    """
+    columns = list(result.columns)
+    oids = result.types or [None] * len(columns)
+    rows = iter(result.rows)
+    schema = None
+
+    while True:
+        chunk = list(islice(rows, batch_size))
+
+        if schema is not None and not chunk:
+            break
+
+        data = InspectionResult(columns, chunk).get_columns_data()
+
+        batch = pa.RecordBatch.from_arrays(
+            [
+                get_arrow_array(values, oid=oid, type_=None if schema is None else schema.field(idx).type)
+                for idx, (values, oid) in enumerate(zip(data, oids))
+            ],
+            schema=schema,
+            names=columns if schema is None else None,
+        )
+        schema = batch.schema
+
+        yield batch
+
+        if len(chunk) < batch_size:
+            break
+
+
+def get_arrow_table(inspection: Inspection) -> 'pa.Table':
+    """Returns inspection result as Arrow table.
+
+    :param inspection: Inspection with result.
+
+    """
+    return pa.Table.from_batches(list(iter_record_batches(inspection.result)))
+
+
+def write_result(result: InspectionResult, path: Union[str, Path], *, fmt: str = 'parquet', batch_size: int = 65536):
+    """Writes inspection result into a file batch by batch.
+
+    :param result:
+    :param path: File path.
+    :param fmt: Dataset format alias. See DATASET_FORMATS.
+    :param batch_size: Maximum number of rows in a batch.
+
+    """
+    batches = iter_record_batches(result, batch_size=batch_size)
+    batch = next(batches)
+
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(f'{path}', batch.schema)
+
+    else:
+        writer = pa.ipc.new_file(f'{path}', batch.schema)
+
+    with writer:
+        writer.write_batch(batch)
+
+        for batch in batches:
+            writer.write_batch(batch)
+
+
+def write_dataset(
+        inspections: Iterable[Inspection],
+        path: Union[str, Path],
+        *,
+        fmt: str = 'parquet',
+        batch_size: int = 65536
+) -> List[Inspection]:
+    """Writes inspections results into a directory partitioned
+    by inspection alias (hive style), e.g.: <path>/alias=idx_bloat/part-20260101T000000.000000Z.parquet
+
+    Every call adds its own part files named after the time it started (UTC),
+    so a directory accumulates results of all runs. Remove it to start over.
+
+    Such a dataset can be read by DuckDB (filename=true tells runs apart):
+        SELECT * FROM read_parquet('<path>/alias=idx_bloat/*.parquet', filename=true);
+
+    Results are written as soon as inspections are available.
+    Inspections without results (e.g. failed) are skipped.
+    Results with values not fitting column types (see `iter_record_batches`)
+    are not written, the error is added to inspection errors.
+
+    Returns inspections.
+
+    :param inspections: Inspections with results.
+    :param path: Directory path.
+    :param fmt: Dataset format alias. See DATASET_FORMATS.
+    :param batch_size: Maximum number of rows in a batch.
+
+    """
+    extension = DATASET_FORMATS[fmt]
+    path = Path(path)
+    name = f"part-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S.%fZ')}"
+    written = []
+
+    for inspection in inspections:
+        written.append(inspection)
+
+        result = inspection.result
+
+        if result is None:
+            continue
+
+        path_partition = path / f'alias={inspection.alias}'
+        path_partition.mkdir(parents=True, exist_ok=True)
+
+        # Hidden, so that readers never see partially written files.
+        path_tmp = path_partition / f'.{name}.tmp'
+
+        try:
+            write_result(result, path_tmp, fmt=fmt, batch_size=batch_size)
+
+        except ValueError as e:
+            path_tmp.unlink(missing_ok=True)
+            inspection.errors.append(f'Unable to export: {e}')
+            continue
+
+        os.replace(path_tmp, path_partition / f'{name}.{extension}')
+
+    return written
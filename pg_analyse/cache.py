@@ -0,0 +1,158 @@
+import json
+import sqlite3
+from hashlib import sha256
+from pathlib import Path
+from threading import Lock
+from time import time
+from typing import Union, Optional, Tuple
+
+from .encoding import dumps, loads
+from .inspections import Inspection, InspectionResult
+from .settings import DIR_CACHE
+
+
+class ResultsCache:
+    """Persistent inspections results cache backed by SQLite.
+    Results are stored as JSON (see `encoding`), so that reading the cache never executes code.
+
+    Entries expire after TTL (see Inspection.cache_ttl) and
+    the least recently used ones are evicted when cache size exceeds the limit.
+
+    """
+
+    def __init__(self, path: Union[str, Path] = '', *, ttl: float = 300, size_max: int = 64 * 1024 * 1024):
+        """
+
+        :param path: Cache database file path. Defaults to `results.sqlite` in user cache directory.
+
+        :param ttl: Default seconds for results to be considered fresh.
+
+        :param size_max: Maximum cache size (bytes of stored results).
+
+        """
+        self.path = Path(path or DIR_CACHE / 'results.sqlite')
+        self.ttl = ttl
+        self.size_max = size_max
+
+        self._lock = Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _get_connection(self) -> sqlite3.Connection:
+
+        connection = self._connection
+
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+            connection = self._connection = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None)
+
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                'key TEXT PRIMARY KEY, alias TEXT, created REAL, accessed REAL, size INTEGER, data BLOB)')
+
+        return connection
+
+    @staticmethod
+    def get_key(*, dsn: str, inspection: Inspection) -> str:
+        """Returns cache key for the given inspection run against the given DSN.
+
+        :param dsn:
+        :param inspection:
+
+        """
+        arguments = {name: f'{value}' for name, value in inspection.arguments.items()}
+
+        return sha256(json.dumps([
+            sha256(dsn.encode()).hexdigest(),
+            inspection.alias,
+            arguments,
+            sha256(inspection.get_sql().encode()).hexdigest(),
+        ], sort_keys=True).encode()).hexdigest()
+
+    def get(self, key: str, *, ttl: float = 0) -> Optional[Tuple[InspectionResult, float]]:
+        """Returns cached result and its age (seconds) or None if there's no fresh result.
+
+        :param key: See `get_key`.
+        :param ttl: Seconds for the result to be considered fresh. Defaults to cache TTL.
+
+        """
+        now = time()
+
+        with self._lock:
+            connection = self._get_connection()
+            row = connection.execute('SELECT created, data FROM results WHERE key = ?', (key,)).fetchone()
+
+            if row is None:
+                return None
+
+            created, data = row
+            age = now - created
+
+            if age > (ttl or self.ttl):
+                connection.execute('DELETE FROM results WHERE key = ?', (key,))
+                return None
+
+            try:
+                columns, rows, types = loads(data)
+
+            except ValueError:
+                # E.g. stored by a previous version.
+                connection.execute('DELETE FROM results WHERE key = ?', (key,))
+                return None
+
+            connection.execute('UPDATE results SET accessed = ? WHERE key = ?', (now, key))
+
+        result = InspectionResult(columns, rows)
+        result.types = types
+
+        return result, age
+
+    def set(self, key: str, *, inspection: Inspection):
+        """Puts inspection result into cache.
+
+        :param key: See `get_key`.
+        :param inspection: Inspection with result.
+
+        """
+        result = inspection.result
+        data = dumps([list(result.columns), list(result.rows), result.types])
+        now = time()
+
+        with self._lock:
+            connection = self._get_connection()
+            connection.execute(
+                'INSERT OR REPLACE INTO results (key, alias, created, accessed, size, data) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (key, inspection.alias, now, now, len(data), data))
+
+            self._evict(connection)
+
+    def _evict(self, connection: sqlite3.Connection):
+        """Removes least recently used entries to fit into the cache size limit."""
+
+        size_total = 0
+        evicted = []
+
+        for key, size in connection.execute('SELECT key, size FROM results ORDER BY accessed DESC'):
+            size_total += size
+
+            if size_total > self.size_max:
+                evicted.append((key,))
+
+        if evicted:
+            connection.executemany('DELETE FROM results WHERE key = ?', evicted)
+
+    def clear(self):
+        """Removes all cached results."""
+        with self._lock:
+            self._get_connection().execute('DELETE FROM results')
+
+    def close(self):
+        """Closes cache database connection."""
+        with self._lock:
+            connection = self._connection
+
+            if connection is not None:
+                connection.close()
+                self._connection = None
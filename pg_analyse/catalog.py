@@ -0,0 +1,144 @@
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+NAMESPACES_SYSTEM = (
+    "SELECT oid FROM pg_catalog.pg_namespace "
+    "WHERE nspname IN ('pg_catalog', 'information_schema') OR nspname LIKE 'pg\\_toast%'")
+"""SQL selecting OIDs of system schemas, relations of which are not materialized."""
+
+CATALOG_SLICES: Dict[str, Tuple[str, List[str]]] = {
+    'pg_class': (
+        f'relnamespace NOT IN ({NAMESPACES_SYSTEM})',
+        ['oid', 'relnamespace']),
+    'pg_namespace': (
+        '',
+        ['oid']),
+    'pg_index': (
+        'indrelid IN (SELECT oid FROM pg_temp.pg_analyse_pg_class)',
+        ['indexrelid', 'indrelid']),
+    'pg_attribute': (
+        'attnum > 0 AND attrelid IN (SELECT oid FROM pg_temp.pg_analyse_pg_class)',
+        ['attrelid, attnum']),
+    'pg_constraint': (
+        f'connamespace NOT IN ({NAMESPACES_SYSTEM})',
+        ['oid', 'conrelid', 'confrelid']),
+}
+"""System catalogs which may be materialized: name -> (rows filter, columns to index).
+Slices are created in this order, pg_class slice is always created as others depend on it.
+
+"""
+
+CATALOG_OIDS = {'pg_class', 'pg_namespace', 'pg_constraint'}
+"""Catalogs having "oid" column, hidden (system) one before PostgreSQL 12."""
+
+SQL_COLUMNS = (
+    "SELECT c.relname, string_agg(quote_ident(a.attname), ', ' ORDER BY a.attnum) "
+    "FROM pg_catalog.pg_attribute a "
+    "JOIN pg_catalog.pg_class c ON c.oid = a.attrelid "
+    "JOIN pg_catalog.pg_type t ON t.oid = a.atttypid "
+    "WHERE c.relnamespace = 'pg_catalog'::regnamespace AND c.relname = ANY(%(names)s) "
+    "AND a.attnum > 0 AND NOT a.attisdropped AND t.typtype <> 'p' "
+    "GROUP BY c.relname"
+)
+"""SQL returning columns of the given catalogs, but those of pseudo-types (e.g. anyarray),
+which can not be stored into a table.
+
+"""
+
+
+def get_table_name(name: str, *, prefix: str = 'pg_analyse_') -> str:
+    """Returns name of the temporary table holding the slice of the given catalog.
+
+    :param name: Catalog name.
+    :param prefix: Table name prefix.
+
+    """
+    return f'pg_temp.{prefix}{name}'
+
+
+def get_slices(names: Iterable[str]) -> List[str]:
+    """Returns names of catalogs to materialize, in order of creation.
+
+    :param names: Catalogs read by inspections (see Inspection.catalog).
+
+    """
+    names = set(names).intersection(CATALOG_SLICES)
+
+    if not names:
+        return []
+
+    names.add('pg_class')
+
+    return [name for name in CATALOG_SLICES if name in names]
+
+
+def iter_create_sql(columns: Dict[str, str]) -> Iterator[str]:
+    """Yields SQL statements creating and indexing slices of catalogs.
+
+    :param columns: Catalog name -> comma separated columns to copy (see SQL_COLUMNS).
+        Catalogs are taken in order of `get_slices`.
+
+    """
+    for name in get_slices(columns):
+        filter_, indexes = CATALOG_SLICES[name]
+        table = get_table_name(name)
+        columns_sql = columns[name]
+
+        if name in CATALOG_OIDS and 'oid' not in columns_sql.split(', '):
+            columns_sql = f'oid, {columns_sql}'
+
+        yield f'DROP TABLE IF EXISTS {table}'
+        yield (
+            f'CREATE TEMP TABLE {table.partition(".")[2]} AS '
+            f'SELECT {columns_sql} FROM pg_catalog.{name}{f" WHERE {filter_}" if filter_ else ""}')
+
+        for index in indexes:
+            yield f'CREATE INDEX ON {table} ({index})'
+
+        yield f'ANALYZE {table}'
+
+
+def get_drop_sql(names: Iterable[str]) -> str:
+    """Returns SQL dropping slices of the given catalogs.
+
+    :param names: Catalog names.
+
+    """
+    return f"DROP TABLE IF EXISTS {', '.join(map(get_table_name, names))}"
+
+
+@lru_cache(maxsize=256)
+def _get_re_relation(names: Tuple[str, ...]):
+    return re.compile(
+        # Comments, string literals (e.g. 'pg_class'::regclass) and quoted identifiers are kept intact.
+        r"""--[^\n]*|/\*.*?\*/|'(?:[^']|'')*'|"(?:[^"]|"")*"|"""
+        r'(?<![.\w])(pg_catalog\s*\.\s*)?\b(%s)\b(?!\s*\()(\s*\.)?' % '|'.join(map(re.escape, names)),
+        re.DOTALL)
+
+
+@lru_cache(maxsize=256)
+def rewrite(sql: str, names: Tuple[str, ...], *, prefix: str = 'pg_analyse_') -> str:
+    """Returns SQL reading slices of the given catalogs instead of catalogs themselves.
+
+    :param sql:
+    :param names: Materialized catalogs names.
+    :param prefix: Slices tables (or views) names prefix. See `get_table_name`.
+
+    """
+    if not names:
+        return sql
+
+    def replace(match) -> str:
+        schema, name, dot = match.groups()
+
+        if name is None:
+            return match.group(0)
+
+        if dot and not schema:
+            # Column qualified with table name, e.g. pg_class.oid.
+            return f'{get_table_name(name, prefix=prefix).partition(".")[2]}{dot}'
+
+        return f'{get_table_name(name, prefix=prefix)}{dot or ""}'
+
+    return _get_re_relation(names).sub(replace, sql)
@@ -1,13 +1,15 @@
 #!/usr/bin/env python
 from functools import partial
+from pathlib import Path
 from textwrap import wrap, indent
 
 import click
 
 from pg_analyse import VERSION_STR
 from pg_analyse.formatters import Formatter
-from pg_analyse.inspections.base import Inspection
-from pg_analyse.toolbox import analyse_and_format, parse_args_string
+
+# Heavier modules (DB driver, cache storage) are imported by commands requiring them
+# to keep CLI startup fast (e.g. for --version and `inspections`).
 
 
 @click.group()
@@ -38,21 +40,287 @@ def entry_point():
     help='Arguments to pass to inspections. E.g.: "idx_bloat:schema=my,bloat_min=20;idx_unused:schema=my"',
     default=''
 )
-def run(dsn, fmt, one, human, args):
+@click.option(
+    '--jobs',
+    help='Number of inspections to run in parallel (each using its own connection)',
+    type=click.IntRange(min=1),
+    default=1
+)
+@click.option(
+    '--dsn-file',
+    help='File with DSNs (one per line) to analyse many PG instances and merge results by host',
+    type=click.Path(exists=True, dir_okay=False),
+    default=None
+)
+@click.option(
+    '--hosts-jobs',
+    help='Number of PG instances from --dsn-file to analyse in parallel',
+    type=click.IntRange(min=1),
+    default=8
+)
+@click.option(
+    '--timeout',
+    help='Seconds allowed for the analysis of one PG instance (0 - no limit). '
+         'Timeouts for inspections can be passed in --args, e.g.: "common:timeout=60"',
+    type=click.FloatRange(min=0),
+    default=0
+)
+@click.option(
+    '--stream',
+    help='Output every inspection result as soon as it is available. '
+         'Row formats (ndjson, csv) along with --fetch-size output rows as they are fetched',
+    is_flag=True
+)
+@click.option(
+    '--fetch-size',
+    help='Fetch rows in chunks of the given size using server-side cursors (0 - all at once). '
+         'Along with --stream allows output of large results without holding them in memory',
+    type=click.IntRange(min=0),
+    default=0
+)
+@click.option(
+    '--pipeline',
+    help='Send all inspections queries at once using pipeline mode to save on network round trips',
+    is_flag=True
+)
+@click.option(
+    '--cache/--no-cache',
+    help='Take fresh results from local cache and put new results into it',
+    default=False
+)
+@click.option(
+    '--refresh',
+    help='Do not take results from local cache, but put new results into it',
+    is_flag=True
+)
+@click.option(
+    '--profile',
+    help='Gather and output inspections profiling information (time, rows, size)',
+    is_flag=True
+)
+@click.option(
+    '--explain',
+    help='Gather and output query execution plans (runs inspection queries once again). Implies --profile',
+    is_flag=True
+)
+@click.option(
+    '--dataset',
+    help='Directory to write results into as typed columnar files partitioned by inspection alias '
+         '(see --dataset-fmt) instead of output. Requires pg_analyse[arrow]',
+    type=click.Path(file_okay=False),
+    default=None
+)
+@click.option(
+    '--dataset-fmt',
+    help='Format of files for --dataset',
+    type=click.Choice(['parquet', 'arrow']),
+    default='parquet'
+)
+@click.option(
+    '--snapshot',
+    help='Save results snapshot to compare with later (see "diff" command)',
+    is_flag=True
+)
+@click.option(
+    '--timings',
+    help='Record inspections run times and start the longest expected first with --jobs (see "timings" command)',
+    is_flag=True
+)
+@click.option(
+    '--catalog',
+    help='Scan system catalogs once per connection for all inspections instead of once per inspection '
+         '(with --jobs N, N scans). Useful for databases with many relations',
+    is_flag=True
+)
+@click.option(
+    '--shards',
+    help='Split heavy inspections (e.g. tbl_bloat, idx_bloat) into this number of queries '
+         'run in parallel on separate connections',
+    type=click.IntRange(min=0),
+    default=0
+)
+@click.option(
+    '--consistent',
+    help='Make inspections run on many connections (--jobs, --shards) see the same database state '
+         'using an exported snapshot',
+    is_flag=True
+)
+def run(
+        dsn, fmt, one, human, args, jobs, dsn_file, hosts_jobs, timeout, stream, fetch_size, pipeline,
+        cache, refresh, profile, explain, dataset, dataset_fmt, snapshot, timings, catalog,
+        shards, consistent
+):
     """Run analysis."""
+    from pg_analyse.cache import ResultsCache
+    from pg_analyse.snapshots import SnapshotStore
+    from pg_analyse.timings import Timings
+    from pg_analyse.toolbox import (
+        analyse_and_export, analyse_and_format, analyse_and_write, parse_args_string, read_dsns,
+    )
 
-    click.secho(analyse_and_format(
+    kwargs = dict(
         dsn=dsn,
+        dsns=read_dsns(dsn_file) if dsn_file else None,
+        concurrency=hosts_jobs,
+        timeout=timeout,
         fmt=fmt or '',
         only=one,
         human=human,
-        arguments=parse_args_string(args)
-    ))
+        arguments=parse_args_string(args),
+        workers=jobs,
+        fetch_size=fetch_size,
+        pipeline=pipeline,
+        cache=ResultsCache() if (cache or refresh) else None,
+        cache_refresh=refresh,
+        profile=profile,
+        explain=explain,
+        snapshots=SnapshotStore() if snapshot else None,
+        timings=Timings() if timings else None,
+        catalog=catalog,
+        shards=shards,
+        consistent=consistent,
+    )
+
+    if dataset:
+        for key in ('fmt', 'human'):
+            kwargs.pop(key)
+
+        for inspection in analyse_and_export(dataset, fmt=dataset_fmt, **kwargs):
+            for error in inspection.errors:
+                click.secho(f'{inspection.alias}: {error}', err=True)
+
+        return
+
+    if stream:
+        analyse_and_write(click.get_text_stream('stdout'), **kwargs)
+        return
+
+    out = analyse_and_format(**kwargs)
+    click.secho(out, nl=not out.endswith('\n'))
+
+
+@entry_point.command()
+@click.option('--dsn', help='DSN to connect to PG', default='')
+@click.option(
+    '--one',
+    help='Inspection name to limit exported inspections',
+    multiple=True
+)
+@click.option(
+    '--args',
+    help='Arguments to pass to inspections. Refresh intervals (seconds) can be passed as "interval", '
+         'e.g.: "tbl_bloat:interval=3600;common:schema=my"',
+    default=''
+)
+@click.option(
+    '--interval',
+    help='Default seconds between inspections refreshes (inspections may define their own)',
+    type=click.FloatRange(min=1),
+    default=300
+)
+@click.option('--host', help='Address to listen on', default='127.0.0.1')
+@click.option('--port', help='Port to listen on', type=click.IntRange(min=1, max=65535), default=9187)
+@click.option(
+    '--timeout',
+    help='Seconds allowed for every refresh run (0 - no limit)',
+    type=click.FloatRange(min=0),
+    default=0
+)
+def serve(dsn, one, args, interval, host, port, timeout):
+    """Serve metrics (OpenMetrics) refreshed in background at /metrics."""
+    from pg_analyse.exporter import Exporter, serve as serve_metrics
+    from pg_analyse.toolbox import parse_args_string
+
+    exporter = Exporter(dsn=dsn, only=one, arguments=parse_args_string(args), interval=interval, timeout=timeout)
+
+    click.secho(f'Serving metrics at http://{host}:{port}/metrics', err=True)
+    serve_metrics(exporter, host=host, port=port)
+
+
+@entry_point.command()
+@click.option('--dsn', help='DSN of PG snapshots are made for', default='')
+@click.option(
+    '--old',
+    help='Older snapshot file (default: the previous one for the DSN)',
+    type=click.Path(exists=True, dir_okay=False),
+    default=None
+)
+@click.option(
+    '--new',
+    help='Newer snapshot file (default: the latest one for the DSN)',
+    type=click.Path(exists=True, dir_okay=False),
+    default=None
+)
+@click.option(
+    '--fmt',
+    help='Format used for output',
+    type=click.Choice(Formatter.formatters_all.keys()),
+)
+@click.option(
+    '--one',
+    help='Inspection name to limit comparison',
+    multiple=True
+)
+@click.option(
+    '--human',
+    help='Use human friendly values formatting (e.g. sizes)',
+    is_flag=True
+)
+def diff(dsn, old, new, fmt, one, human):
+    """Output rows added, removed and changed between two results snapshots (see "run --snapshot")."""
+    from pg_analyse.snapshots import Snapshot, SnapshotStore, diff_snapshots
+    from pg_analyse.toolbox import Analyser, format_inspections
+
+    if not (old and new):
+        paths = SnapshotStore().get_paths(Analyser(dsn=dsn).dsn)
+
+        if new:
+            paths = [path for path in paths if path.name < Path(new).name]
+
+        if len(paths) < (1 if (old or new) else 2):
+            raise click.ClickException('Not enough snapshots to compare. Use "run --snapshot" to make them')
+
+        old = old or paths[-1 if new else -2]
+        new = new or paths[-1]
+
+    try:
+        snapshot_old, snapshot_new = Snapshot.load(old), Snapshot.load(new)
+
+    except ValueError as e:
+        raise click.ClickException(f'{e}')
+
+    inspections = diff_snapshots(snapshot_old, snapshot_new, only=one)
+
+    out = format_inspections(inspections, fmt=fmt or '', human=human)
+    click.secho(out, nl=not out.endswith('\n'))
+
+
+@entry_point.command()
+@click.option('--dsn', help='DSN of PG timings are recorded for', default='')
+@click.option(
+    '--fmt',
+    help='Format used for output',
+    type=click.Choice(Formatter.formatters_all.keys()),
+)
+def timings(dsn, fmt):
+    """Output recorded inspections run times along with expected ones (see "run --timings")."""
+    from pg_analyse.inspections import Inspection
+    from pg_analyse.timings import Timings
+    from pg_analyse.toolbox import Analyser, format_inspections
+
+    inspection = Inspection()
+    inspection.alias = 'timings'
+    inspection.title = 'Inspections run times, seconds'
+    inspection.result = Timings().get_result(dsn=Analyser(dsn=dsn).dsn)
+
+    out = format_inspections([inspection], fmt=fmt or '')
+    click.secho(out, nl=not out.endswith('\n'))
 
 
 @entry_point.command()
 def inspections():
     """List known inspections."""
+    from pg_analyse.inspections import Inspection
 
     for inspection in Inspection.inspections_all:
         click.secho(f'* {inspection.title} [{inspection.alias}]', fg='blue')
@@ -0,0 +1,114 @@
+import json
+from base64 import b64decode, b64encode
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict
+from uuid import UUID
+
+TYPES_PLAIN = {str, int, float, bool, type(None)}
+"""Types of values kept as is."""
+
+ENCODERS: Dict[type, tuple] = {
+    Decimal: ('decimal', str),
+    datetime: ('datetime', datetime.isoformat),
+    date: ('date', date.isoformat),
+    time: ('time', time.isoformat),
+    timedelta: ('timedelta', lambda value: [value.days, value.seconds, value.microseconds]),
+    UUID: ('uuid', str),
+    bytes: ('bytes', lambda value: b64encode(value).decode()),
+    memoryview: ('bytes', lambda value: b64encode(value).decode()),
+}
+"""Value type -> (tag, function returning JSON compatible representation)."""
+
+DECODERS: Dict[str, Callable[[Any], Any]] = {
+    'decimal': Decimal,
+    'datetime': datetime.fromisoformat,
+    'date': date.fromisoformat,
+    'time': time.fromisoformat,
+    'timedelta': lambda value: timedelta(*value),
+    'uuid': UUID,
+    'bytes': b64decode,
+}
+"""Tag -> function returning value for its representation."""
+
+
+def encode(value: Any) -> Any:
+    """Returns JSON compatible representation of the value (e.g. of a result row).
+
+    Values of types without JSON counterparts are tagged: {"$<tag>": representation}.
+    Dicts are tagged too ({"$dict": ...}), so that they are not confused with tagged values.
+    Tuples become lists. Values of unknown types are stringified.
+
+    :param value:
+
+    """
+    type_ = type(value)
+
+    if type_ in TYPES_PLAIN:
+        return value
+
+    if type_ is list or type_ is tuple:
+        return [encode(item) for item in value]
+
+    if type_ is dict:
+        return {'$dict': {key: encode(item) for key, item in value.items()}}
+
+    encoder = ENCODERS.get(type_)
+
+    if encoder is None:
+        # Subclasses (e.g. of str, int) or unknown types (e.g. IP addresses, ranges).
+        if isinstance(value, (str, int, float)):
+            return value
+
+        return f'{value}'
+
+    tag, get_repr = encoder
+
+    return {f'${tag}': get_repr(value)}
+
+
+def decode(value: Any) -> Any:
+    """Returns value for its representation made by `encode`.
+
+    :param value:
+
+    """
+    type_ = type(value)
+
+    if type_ is list:
+        return [decode(item) for item in value]
+
+    if type_ is dict:
+        (tag, representation), = value.items()
+
+        if tag == '$dict':
+            return {key: decode(item) for key, item in representation.items()}
+
+        return DECODERS[tag[1:]](representation)
+
+    return value
+
+
+def dumps(value: Any) -> bytes:
+    """Returns JSON data for the value, see `encode`.
+
+    :param value:
+
+    """
+    return json.dumps(encode(value), separators=(',', ':')).encode()
+
+
+def loads(data: bytes) -> Any:
+    """Returns value from JSON data made by `dumps`.
+    Unlike pickle, data of untrusted origin can not execute code.
+
+    Raises ValueError for invalid data.
+
+    :param data:
+
+    """
+    try:
+        return decode(json.loads(data))
+
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f'Invalid data: {e}') from e
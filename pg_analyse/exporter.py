@@ -0,0 +1,386 @@
+import re
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Event, Lock, Thread
+from time import monotonic, time
+from typing import Dict, List, Optional, Tuple
+
+from .inspections import Inspection
+from .toolbox import TypeInspectionsArgs, TypeOnly, get_analyser
+
+CONTENT_TYPE_OPENMETRICS = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+CONTENT_TYPE_TEXT = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Exporter:
+    """Refreshes inspections in background on per-inspection schedules
+    and renders their last results as metrics (OpenMetrics or Prometheus text format),
+    so that metrics requests never trigger queries.
+
+    Numeric result columns having "size" (bytes) or "percent" in names become gauges,
+    labeled with text columns of the same row.
+
+    """
+
+    prefix: str = 'pg_analyse'
+    """Metrics names prefix."""
+
+    re_name_invalid = re.compile('[^a-zA-Z0-9_]')
+
+    def __init__(
+            self,
+            *,
+            only: TypeOnly = None,
+            arguments: TypeInspectionsArgs = None,
+            interval: float = 300,
+            **options
+    ):
+        """
+
+        :param only: Names of inspections to export. If not set all inspections are exported.
+
+        :param arguments: Arguments to pass to inspections (see `Analyser.run`).
+            Refresh intervals for certain inspections (seconds) may be passed
+            as "interval" (e.g. "tbl_bloat:interval=3600").
+
+        :param interval: Default seconds between inspections refreshes.
+            Inspections with `cache_ttl` are refreshed after that time.
+
+        :param options: Options for analyser (see `get_analyser`).
+
+        """
+        arguments = {alias: dict(args) for alias, args in (arguments or {}).items()}
+
+        self.intervals: Dict[str, float] = {
+            alias: float(args.pop('interval')) for alias, args in arguments.items() if args.get('interval')}
+        """Inspection alias (or "common") -> seconds between refreshes, taken from arguments."""
+
+        self.only = only
+        self.arguments = arguments
+        """Arguments to pass to inspections, but refresh intervals."""
+
+        self.interval = interval
+        self.analyser = get_analyser(**options)
+
+        self._lock = Lock()
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+
+        self._schedule: Dict[str, float] = {}
+        """Inspection alias -> monotonic time of the next refresh."""
+
+        self._snapshot: Dict[str, Tuple[Inspection, List[str]]] = {}
+        """Inspection alias -> (last refreshed inspection, rendered metrics lines of the last good result)."""
+
+        self._refreshed: Dict[str, Tuple[float, float, bool]] = {}
+        """Inspection alias -> (refresh timestamp, refresh duration, success)."""
+
+        self._succeeded: Dict[str, float] = {}
+        """Inspection alias -> timestamp of the last successful refresh."""
+
+    def get_interval(self, inspection: Inspection) -> float:
+        """Returns seconds between refreshes of the given inspection.
+
+        :param inspection:
+
+        """
+        intervals = self.intervals
+
+        return float(
+            intervals.get(inspection.alias) or intervals.get('common') or inspection.cache_ttl or self.interval)
+
+    def refresh(self, *, only: TypeOnly = None) -> List[Inspection]:
+        """Runs inspections updating metrics snapshot. Returns refreshed inspections.
+
+        :param only: Names of inspections to refresh. If not set all exported inspections are refreshed.
+
+        """
+        only = only or self.only
+        started = monotonic()
+
+        try:
+            inspections = self.analyser.run(only=only, arguments=self.arguments)
+
+        except Exception as e:
+            # Unable to connect, etc.
+            inspections = self.analyser._get_inspections(only=only, arguments=self.arguments)
+
+            for inspection in inspections:
+                inspection.errors.append(f'{e}')
+
+        duration = monotonic() - started
+        now = time()
+
+        with self._lock:
+
+            for inspection in inspections:
+                alias = inspection.alias
+                success = not inspection.errors
+                lines = self._snapshot.get(alias, (None, []))[1]
+
+                if inspection.result is not None:
+                    lines = list(self._iter_result_lines(inspection))
+
+                if success:
+                    self._succeeded[alias] = now
+
+                self._snapshot[alias] = (inspection, lines)
+                self._refreshed[alias] = (now, duration, success)
+                self._schedule[alias] = started + self.get_interval(inspection)
+
+        return inspections
+
+    def _get_due(self) -> Tuple[List[str], float]:
+        """Returns aliases of inspections to be refreshed now and seconds to wait for the next one."""
+
+        now = monotonic()
+
+        with self._lock:
+            schedule = dict(self._schedule)
+
+        due = [alias for alias, next_run in schedule.items() if next_run <= now]
+        wait = min((next_run - now for next_run in schedule.values() if next_run > now), default=self.interval)
+
+        return due, wait
+
+    def _run(self):
+        """Background refresh loop."""
+
+        self.refresh()
+
+        while not self._stop.is_set():
+            due, wait = self._get_due()
+
+            if due:
+                self.refresh(only=due)
+                continue
+
+            self._stop.wait(wait)
+
+    def start(self):
+        """Starts background refresh."""
+        self._stop.clear()
+        self._thread = thread = Thread(target=self._run, name='pg_analyse_exporter', daemon=True)
+        thread.start()
+
+    def stop(self, *, timeout: float = None):
+        """Stops background refresh. Inspection being run is awaited.
+
+        :param timeout: Seconds to wait.
+
+        """
+        self._stop.set()
+
+        thread = self._thread
+
+        if thread is not None:
+            thread.join(timeout)
+            self._thread = None
+
+        close = getattr(self.analyser, 'close', None)
+
+        if close:
+            close()
+
+    def get_name(self, *chunks: str) -> str:
+        """Returns metric name for the given chunks.
+
+        :param chunks:
+
+        """
+        return self.re_name_invalid.sub('_', '_'.join((self.prefix, *chunks)))
+
+    @staticmethod
+    def _get_labels(labels: List[Tuple[str, str]]) -> str:
+        """Returns labels in metric sample format.
+
+        :param labels: Names and values.
+
+        """
+        if not labels:
+            return ''
+
+        def escape(value) -> str:
+            return f'{value}'.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+        return '{%s}' % ','.join(f'{name}="{escape(value)}"' for name, value in labels)
+
+    def _iter_result_lines(self, inspection: Inspection):
+        """Yields metrics families lines for inspection result.
+
+        :param inspection: Inspection with result.
+
+        """
+        result = inspection.result
+        columns = list(result.columns)
+        rows = list(result.rows)
+
+        def is_number(value) -> bool:
+            return isinstance(value, (int, float, Decimal)) and not isinstance(value, bool)
+
+        metrics = [
+            idx for idx, name in enumerate(columns)
+            if ('size' in name or 'percent' in name) and any(is_number(row[idx]) for row in rows)]
+
+        labels = [
+            idx for idx, name in enumerate(columns)
+            if idx not in metrics and all(row[idx] is None or isinstance(row[idx], str) for row in rows)]
+
+        label_names = [self.re_name_invalid.sub('_', columns[idx]) for idx in labels]
+
+        for idx in metrics:
+            column = columns[idx]
+            name = self.get_name(inspection.alias, column)
+            unit = ''
+
+            if 'size' in column:
+                unit = 'bytes'
+                name = f'{name}_{unit}'
+
+            yield f'# TYPE {name} gauge'
+
+            if unit:
+                yield f'# UNIT {name} {unit}'
+
+            yield f"# HELP {name} {inspection.title}: {column.replace('_', ' ')}."
+
+            seen = set()
+
+            for row in rows:
+                value = row[idx]
+
+                if not is_number(value):
+                    continue
+
+                sample_labels = self._get_labels([
+                    (label_name, '' if row[label_idx] is None else row[label_idx])
+                    for label_name, label_idx in zip(label_names, labels)])
+
+                if sample_labels in seen:
+                    # Metric samples are to be unique.
+                    continue
+
+                seen.add(sample_labels)
+
+                yield f'{name}{sample_labels} {float(value)!r}'
+
+    def _iter_state_lines(self):
+        """Yields metrics families lines describing refreshes state (staleness)."""
+
+        now = time()
+
+        with self._lock:
+            refreshed = dict(self._refreshed)
+            succeeded = dict(self._succeeded)
+
+        families = [
+            ('inspection_up', '', 'Whether the last inspection refresh succeeded.',
+             lambda alias: float(refreshed[alias][2])),
+            ('inspection_refresh_duration', 'seconds', 'Duration of the last refresh run.',
+             lambda alias: refreshed[alias][1]),
+            ('inspection_last_success_timestamp', 'seconds', 'Time of the last successful refresh.',
+             lambda alias: succeeded.get(alias)),
+            ('inspection_age', 'seconds', 'Age of the exported result (since the last successful refresh).',
+             lambda alias: None if alias not in succeeded else now - succeeded[alias]),
+        ]
+
+        for name, unit, description, get_value in families:
+            name = self.get_name(name)
+
+            if unit:
+                name = f'{name}_{unit}'
+
+            yield f'# TYPE {name} gauge'
+
+            if unit:
+                yield f'# UNIT {name} {unit}'
+
+            yield f'# HELP {name} {description}'
+
+            for alias in sorted(refreshed):
+                value = get_value(alias)
+
+                if value is not None:
+                    yield f'{name}{self._get_labels([("inspection", alias)])} {float(value)!r}'
+
+    def render(self, *, openmetrics: bool = True) -> str:
+        """Returns metrics of the last snapshot.
+
+        :param openmetrics: Use OpenMetrics format. Otherwise Prometheus text format is used.
+
+        """
+        with self._lock:
+            snapshot = [self._snapshot[alias][1] for alias in sorted(self._snapshot)]
+
+        lines = list(self._iter_state_lines())
+
+        for result_lines in snapshot:
+            lines.extend(result_lines)
+
+        if openmetrics:
+            lines.append('# EOF')
+
+        else:
+            lines = [line for line in lines if not line.startswith('# UNIT ')]
+
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serves metrics from exporter (see `serve`)."""
+
+    exporter: Exporter = None
+
+    def do_GET(self):
+
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+
+        openmetrics = 'application/openmetrics-text' in self.headers.get('Accept', '')
+
+        body = self.exporter.render(openmetrics=openmetrics).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE_OPENMETRICS if openmetrics else CONTENT_TYPE_TEXT)
+        self.send_header('Content-Length', f'{len(body)}')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes are too frequent to be logged.
+        pass
+
+
+def get_server(exporter: Exporter, *, host: str = '127.0.0.1', port: int = 9187) -> ThreadingHTTPServer:
+    """Returns HTTP server exposing exporter metrics at /metrics.
+
+    :param exporter:
+    :param host: Address to listen on.
+    :param port: Port to listen on.
+
+    """
+    handler = type('MetricsHandler', (MetricsHandler,), {'exporter': exporter})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(exporter: Exporter, *, host: str = '127.0.0.1', port: int = 9187):
+    """Starts background refresh and serves exporter metrics at /metrics until interrupted.
+
+    :param exporter:
+    :param host: Address to listen on.
+    :param port: Port to listen on.
+
+    """
+    server = get_server(exporter, host=host, port=port)
+    exporter.start()
+
+    try:
+        server.serve_forever()
+
+    except KeyboardInterrupt:  # pragma: nocover
+        pass
+
+    finally:
+        server.server_close()
+        exporter.stop(timeout=5)
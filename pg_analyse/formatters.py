@@ -1,6 +1,7 @@
+import csv
 import json
-import math
-from typing import Type, Dict, List
+from io import StringIO
+from typing import Type, Dict, List, Iterable, Iterator, Optional, Callable, Sequence, TextIO
 from textwrap import indent
 
 if False:  # pragma: nocover
@@ -34,22 +35,51 @@ class Formatter:
         if alias:
             cls.formatters_all[alias] = cls
 
-    @staticmethod
-    def humanize_size(bytes_size: int) -> str:
+    size_units = ('B', 'KB', 'MB', 'GB', 'TB', 'PB', 'EB', 'ZB', 'YB')
+    """Size units names, every next is 1024 times bigger."""
+
+    _size_divisors = tuple(1 << (10 * idx) for idx in range(len(size_units)))
+
+    _size_unit_by_bits = tuple(min(bits // 10, 8) for bits in range(129))
+    """Unit index by bit length of a size (sizes are below 2 ** 128)."""
+
+    @classmethod
+    def humanize_size(cls, bytes_size: int) -> str:
         """Returns human readable size.
 
         :param bytes_size:
 
         """
-        if not bytes_size:
-            return '0 B'
+        return cls.humanize_sizes([bytes_size])[0]
+
+    @classmethod
+    def humanize_sizes(cls, sizes: Sequence[int]) -> List[str]:
+        """Returns human readable sizes for a column of sizes.
+
+        :param sizes:
+
+        """
+        units = cls.size_units
+        divisors = cls._size_divisors
+        unit_by_bits = cls._size_unit_by_bits
 
-        names = ('B', 'KB', 'MB', 'GB', 'TB', 'PB', 'EB', 'ZB', 'YB')
+        # Every unit is 2 ** 10 times bigger, so units are derived from bit lengths at once.
+        units_idx = [unit_by_bits[int(bytes_size).bit_length() - 1] if bytes_size else 0 for bytes_size in sizes]
 
-        name_idx = int(math.floor(math.log(bytes_size, 1024)))
-        size = round(bytes_size / math.pow(1024, name_idx), 2)
+        return [
+            f'{round(bytes_size / divisors[unit_idx], 2)} {units[unit_idx]}' if bytes_size else '0 B'
+            for bytes_size, unit_idx in zip(sizes, units_idx)]
 
-        return '%s %s' % (size, names[name_idx])
+    def _get_column_casters(self) -> List[Optional[Callable[[Sequence], list]]]:
+        """Returns casters for result columns. A caster takes a column values
+        and returns processed values. None is for columns not to be processed.
+
+        """
+        human = self.human
+
+        return [
+            self.humanize_sizes if (human and 'size' in name) else None
+            for name in self.inspection.result.columns]
 
     def _get_rows_processed(self) -> list:
 
@@ -58,23 +88,39 @@ class Formatter:
         if not result:
             return []
 
-        column_casters = []
-        human = self.human
+        if not isinstance(result.rows, list):
+            return list(self._iter_rows_processed())
 
-        for name in result.columns:
-            func = lambda value: value
+        casters = self._get_column_casters()
 
-            if human and 'size' in name:
-                func = self.humanize_size
+        if not any(casters):
+            return [list(row) for row in result.rows]
 
-            column_casters.append(func)
+        # Values are processed by columns in batches.
+        data = [
+            caster(values) if caster else values
+            for caster, values in zip(casters, result.get_columns_data())]
 
-        out = []
+        return [list(row) for row in zip(*data)]
 
-        for row in result.rows:
-            out.append([column_casters[idx](chunk) for idx, chunk in enumerate(row)])
+    def _iter_rows_processed(self) -> Iterator[list]:
+        """Yields processed result rows one by one.
+        Lazily fetched rows are consumed in the process.
 
-        return out
+        """
+        result = self.inspection.result
+
+        if not result:
+            return
+
+        casters = [
+            (lambda value, caster=caster: caster([value])[0]) if caster else None
+            for caster in self._get_column_casters()]
+
+        for row in result.rows:
+            yield [
+                caster(value) if caster else value
+                for caster, value in zip(casters, row)]
 
     def run(self) -> str:  # pragma: nocover
         """Must format data from self.inspection into a string."""
@@ -89,6 +135,39 @@ class Formatter:
         """
         raise NotImplementedError
 
+    def write(self, out: TextIO):
+        """Writes formatted data from self.inspection into a file-like object.
+
+        :param out:
+
+        """
+        out.write(self.run())
+
+    @classmethod
+    def write_all(cls, formatters: Iterable['Formatter'], out: TextIO):
+        """Writes formatted data of many inspections into a file-like object
+        as soon as every inspection is available. The document is the same
+        as from `iter_wrap`, terminated with a newline.
+
+        :param formatters: Formatters bound to inspections.
+        :param out:
+
+        """
+        for chunk in cls.iter_wrap(formatter.run() for formatter in formatters):
+            out.write(chunk)
+
+        out.write('\n')
+
+    @classmethod
+    def iter_wrap(cls, lines: Iterable[str]) -> Iterator[str]:  # pragma: nocover
+        """Must yield chunks which joined make up the same document as `wrap`,
+        so that each result can be output as soon as it's available.
+
+        :param lines: Multiple results from self.run.
+
+        """
+        raise NotImplementedError
+
 
 class TableFormatter(Formatter):
     """Format inspection result as table."""
@@ -111,15 +190,84 @@ class TableFormatter(Formatter):
         if errors:
             lines.append('\n'.join(errors))
 
-        else:
+        if not errors or inspection.result:
+            # Fleet mode may have both errors from some hosts and results from others.
+            if errors:
+                lines.append('')
+
+            errors_count = len(errors)
             lines.append(f'{tabulate(self._get_rows_processed(), headers=columns)}')
 
-        return f'{inspection.title} [{inspection.alias}]\n\n' + indent('\n'.join(lines), '  ')
+            if len(errors) > errors_count:
+                # Errors of lazily fetched rows.
+                lines.extend(['', *errors[errors_count:]])
+
+        profile = inspection.profile
+        if profile:
+            lines.append('')
+            lines.extend(self._get_profile_lines(profile))
+
+        title = f'{inspection.title} [{inspection.alias}]'
+
+        hosts = inspection.hosts
+        if hosts:
+            title = f'{title} @ {len(hosts)} host(s)'
+
+        cached_age = inspection.cached_age
+        if cached_age is not None:
+            title = f'{title} (cached {cached_age:.0f} s ago)'
+
+        return f'{title}\n\n' + indent('\n'.join(lines), '  ')
+
+    def _get_profile_lines(self, profile: dict) -> List[str]:
+        """Returns profiling information lines.
+
+        :param profile: See Inspection.profile.
+
+        """
+        size = profile['bytes']
+        size = self.humanize_size(size) if self.human else f'{size} B'
+
+        expected = profile.get('expected')
+        expected = '' if expected is None else f' (expected {expected:.3f} s)'
+
+        lines = [f"Profile: {profile['time']:.3f} s{expected}, {profile['rows']} row(s), {size}"]
+
+        for host, host_profile in profile.get('hosts', {}).items():
+            # Fleet mode.
+            lines.extend(f'{host}: {line}' for line in self._get_profile_lines(host_profile))
+
+        plan = profile.get('explain')
+
+        if plan:
+            plan = plan[0]
+            node = plan.get('Plan', {})
+
+            lines.append(
+                f"Plan: execution {plan.get('Execution Time')} ms, "
+                f"planning {plan.get('Planning Time')} ms, "
+                f"cost {node.get('Total Cost')}, "
+                f"shared buffers hit {node.get('Shared Hit Blocks')} read {node.get('Shared Read Blocks')}")
+
+        error = profile.get('explain_error')
+
+        if error:
+            lines.append(f'Plan: {error}')
+
+        return lines
 
     @classmethod
     def wrap(cls, lines: List[str]) -> str:
         return '\n\n\n'.join(lines)
 
+    @classmethod
+    def iter_wrap(cls, lines: Iterable[str]) -> Iterator[str]:
+        sep = ''
+
+        for line in lines:
+            yield f'{sep}{line}'
+            sep = '\n\n\n'
+
 
 class JsonFormatter(Formatter):
     """Format inspection result as JSON."""
@@ -140,8 +288,129 @@ class JsonFormatter(Formatter):
             },
         }
 
+        hosts = inspection.hosts
+        if hosts:
+            line['hosts'] = hosts
+
+        cached_age = inspection.cached_age
+        if cached_age is not None:
+            line['cached_age'] = round(cached_age, 3)
+
+        profile = inspection.profile
+        if profile:
+            line['profile'] = profile
+
         return json.dumps(line)
 
     @classmethod
     def wrap(cls, lines: List[str]) -> str:
         return f"[{','.join(lines)}]"
+
+    @classmethod
+    def iter_wrap(cls, lines: Iterable[str]) -> Iterator[str]:
+        # One item per line, so that the array can also be consumed line by line.
+        sep = '[\n'
+
+        for line in lines:
+            yield f'{sep}{line}'
+            sep = ',\n'
+
+        yield '[]' if sep == '[\n' else '\n]'
+
+
+class RowsFormatter(Formatter):
+    """Base for formatters writing results row by row, so that
+    large results never have to be held in memory.
+
+    Every row carries the inspection alias, hence results of
+    many inspections are simply concatenated.
+
+    """
+    def run(self) -> str:
+        out = StringIO()
+        self.write(out)
+        return out.getvalue()
+
+    def write(self, out: TextIO):  # pragma: nocover
+        """Must write rows from self.inspection into a file-like object."""
+        raise NotImplementedError
+
+    @classmethod
+    def write_all(cls, formatters: Iterable['Formatter'], out: TextIO):
+        for formatter in formatters:
+            formatter.write(out)
+
+    @classmethod
+    def wrap(cls, lines: List[str]) -> str:
+        return ''.join(lines)
+
+    @classmethod
+    def iter_wrap(cls, lines: Iterable[str]) -> Iterator[str]:
+        yield from lines
+
+
+class NdjsonFormatter(RowsFormatter):
+    """Format inspection result as newline delimited JSON:
+    an object per result row (or error) with the inspection alias.
+
+    {"inspection": "idx_bloat", "index_name": "my_idx", ...}
+    {"inspection": "idx_unused", "error": "..."}
+
+    """
+    alias: str = 'ndjson'
+
+    def write(self, out: TextIO):
+        inspection = self.inspection
+        alias = inspection.alias
+        dumps = json.dumps
+
+        errors = inspection.errors
+        errors_count = len(errors)
+
+        for error in errors:
+            out.write(f"{dumps({'inspection': alias, 'error': error})}\n")
+
+        if not inspection.result:
+            return
+
+        columns = ['inspection', *inspection.result.columns]
+
+        for row in self._iter_rows_processed():
+            out.write(f'{dumps(dict(zip(columns, [alias, *row])))}\n')
+
+        # Errors of lazily fetched rows.
+        for error in errors[errors_count:]:
+            out.write(f"{dumps({'inspection': alias, 'error': error})}\n")
+
+
+class CsvFormatter(RowsFormatter):
+    """Format inspection result as CSV. The first column is the inspection alias.
+
+    Every inspection (and its errors) starts with a header row,
+    since columns differ from inspection to inspection.
+
+    """
+    alias: str = 'csv'
+
+    def write(self, out: TextIO):
+        inspection = self.inspection
+        alias = inspection.alias
+        writer = csv.writer(out, lineterminator='\n')
+
+        errors = inspection.errors
+        errors_count = len(errors)
+
+        if errors:
+            writer.writerow(['inspection', 'error'])
+            writer.writerows([alias, error] for error in errors)
+
+        if not inspection.result:
+            return
+
+        writer.writerow(['inspection', *inspection.result.columns])
+        writer.writerows([alias, *row] for row in self._iter_rows_processed())
+
+        if len(errors) > errors_count:
+            # Errors of lazily fetched rows.
+            writer.writerow(['inspection', 'error'])
+            writer.writerows([alias, error] for error in errors[errors_count:])
@@ -1,3 +1,17 @@
-from .base import Inspection, InspectionResult
-from .bundled import *
-from .contrib import *
+from .base import Inspection, InspectionResult, SqlTemplates
+
+
+def __getattr__(name: str):
+    # Inspections classes are imported lazily (see Inspection.inspections_modules).
+    from importlib import import_module
+
+    if name.startswith('__'):
+        raise AttributeError(name)
+
+    for module_name in Inspection.inspections_modules:
+        module = import_module(module_name)
+
+        if hasattr(module, name):
+            return getattr(module, name)
+
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -1,10 +1,214 @@
+import re
 from collections import namedtuple
+from importlib import import_module
 from pathlib import Path
-from typing import List, Type, Optional, Dict
+from threading import Lock, RLock
+from typing import List, Type, Optional, Dict, Callable, Sequence, Tuple, Union
 
 from ..settings import DIR_SQL
 
-InspectionResult = namedtuple('InspectionResult', ['columns', 'rows'])
+
+class InspectionsRegistry:
+    """Registry of known inspections.
+
+    Populated on first access by importing modules listed
+    in `Inspection.inspections_modules`, so that merely importing
+    the package (e.g. for `--version` in CLI) stays cheap.
+
+    """
+    def __init__(self):
+        self.registered: List[Type['Inspection']] = []
+        self.loaded: bool = False
+        self._lock = RLock()
+
+    def __get__(self, instance, owner) -> List[Type['Inspection']]:
+
+        if not self.loaded:
+
+            with self._lock:
+
+                if not self.loaded:
+
+                    for module in owner.inspections_modules:
+                        import_module(module)
+
+                    self.loaded = True
+
+        return self.registered
+
+
+class InspectionResult(namedtuple('InspectionResult', ['columns', 'rows'])):
+    """Inspection result: column names and rows.
+    Rows are usually a list, but may be an iterator consumed once, if fetched lazily (see Analyser fetch_size).
+
+    """
+    types: Optional[List[Optional[int]]] = None
+    """PostgreSQL type OIDs of columns, if known (see `from_description`)."""
+
+    @classmethod
+    def from_description(cls, description: Sequence, rows) -> 'InspectionResult':
+        """Creates result taking column names and types from cursor description.
+
+        :param description: DB API cursor description.
+        :param rows:
+
+        """
+        result = cls([column.name for column in description], rows)
+        result.types = [getattr(column, 'type_code', None) for column in description]
+        return result
+
+    def _replace(self, **kwargs) -> 'InspectionResult':
+        result = super()._replace(**kwargs)
+        result.types = self.types
+        return result
+
+    def get_columns_data(self) -> List[tuple]:
+        """Returns result data column-wise: a tuple of values for every column.
+        Lazily fetched rows are consumed in the process.
+
+        """
+        data = list(zip(*self.rows))
+        return data or [() for _ in self.columns]
+
+    @classmethod
+    def from_columns_data(cls, columns: List[str], data: List[Sequence]) -> 'InspectionResult':
+        """Creates result from column-wise data (see `get_columns_data`).
+
+        :param columns: Column names.
+        :param data: Values for every column.
+
+        """
+        return cls(columns, [list(row) for row in zip(*data)])
+
+
+class SqlTemplates:
+    """Cache of SQL templates compiled into SQL acceptable for psycopg."""
+
+    re_token = re.compile(r'%|(?<!:):([A-Za-z_][A-Za-z0-9_]*)')
+    """Matches % to escape and :placeholders (not ::type casts)."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._sources: Dict[str, str] = {}
+        self._compiled: Dict[tuple, str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def compile(cls, source: str, placeholders: Dict[str, str], expressions: Dict[str, str] = None) -> str:
+        """Replaces ":var"-like param placeholders with "%(var)s"-like acceptable for psycopg,
+        escaping % with %%. Done in a single pass, so that placeholder names sharing a prefix
+        (e.g. :schema and :schema_name_param) do not clash.
+
+        :param source: SQL template.
+        :param placeholders: Placeholder name to query param name mapping.
+        :param expressions: Placeholder name to SQL expression mapping, for placeholders
+            to be replaced with expressions instead of query params.
+
+        """
+        expressions = expressions or {}
+
+        def replace(match) -> str:
+            name_sql = match.group(1)
+
+            if name_sql is None:
+                return '%%'
+
+            expression = expressions.get(name_sql)
+
+            if expression is not None:
+                return expression
+
+            name = placeholders.get(name_sql)
+
+            if name is None:
+                return match.group(0)
+
+            return f'%({name})s'
+
+        return cls.re_token.sub(replace, source)
+
+    def get(
+            self,
+            path: str,
+            placeholders: Dict[str, str],
+            *,
+            read: Callable[[], str],
+            expressions: Dict[str, str] = None
+    ) -> str:
+        """Returns compiled SQL for the given template.
+
+        :param path: Template file path.
+        :param placeholders: Placeholder name to query param name mapping.
+        :param read: Function returning template source if it is not yet cached.
+        :param expressions: Placeholder name to SQL expression mapping. See `compile`.
+
+        """
+        key = (path, tuple(sorted(placeholders.items())), tuple(sorted((expressions or {}).items())))
+
+        with self._lock:
+            compiled = self._compiled.get(key)
+
+            if compiled is not None:
+                self.hits += 1
+                return compiled
+
+            self.misses += 1
+            source = self._sources.get(path)
+
+        if source is None:
+            source = read()
+
+        compiled = self.compile(source, placeholders, expressions)
+
+        with self._lock:
+            self._sources[path] = source
+            self._compiled[key] = compiled
+
+        return compiled
+
+    def stats(self) -> Dict[str, int]:
+        """Returns cache statistics."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'templates': len(self._sources),
+            'compiled': len(self._compiled),
+        }
+
+    def clear(self, path: str = ''):
+        """Invalidates cache, e.g. when templates are changed in development.
+
+        :param path: Template file path to drop from cache. If not set, all templates are dropped.
+
+        """
+        with self._lock:
+
+            if not path:
+                self._sources.clear()
+                self._compiled.clear()
+                self.hits = self.misses = 0
+                return
+
+            self._sources.pop(path, None)
+
+            for key in [key for key in self._compiled if key[0] == path]:
+                del self._compiled[key]
+
+
+def get_schemas_patterns(schemas: Sequence[str]) -> List[str]:
+    """Returns LIKE patterns for schema names and glob patterns (* and ?).
+
+    :param schemas:
+
+    """
+    patterns = []
+
+    for schema in schemas:
+        pattern = schema.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        patterns.append(pattern.replace('*', '%').replace('?', '_'))
+
+    return patterns
 
 
 class Inspection:
@@ -28,13 +232,79 @@ class Inspection:
     sql_dir: Path = DIR_SQL
     """SQL template directory."""
 
-    inspections_all: List[Type['Inspection']] = []
+    cache_ttl: float = 0
+    """Seconds for cached result to be considered fresh. 0 - use cache default."""
+
+    cost: float = 1
+    """Expected run time (seconds) on a moderately sized database. Used to schedule
+    inspections run in parallel (the longest first) when there are no recorded timings (see Timings).
+
+    """
+
+    catalog: Tuple[str, ...] = ()
+    """System catalogs (e.g. pg_index) the inspection SQL reads, which may be replaced
+    with copies made once per run (see Analyser `catalog`).
+
+    """
+
+    shard_relkinds: Tuple[str, ...] = ()
+    """Kinds of relations (pg_class.relkind, e.g. "i" for indexes) the inspection reports on,
+    one row per relation at most. If set, the inspection may be split into shards
+    run in parallel, each reporting on relations of its own OID range (see Analyser `shards`).
+
+    """
+
+    shard_order: Tuple[str, ...] = ()
+    """Text result columns to sort rows of shards by, to merge results of shards preserving the order.
+    Rows of sharded runs are ordered by these columns in "C" collation (code points).
+
+    """
+
+    schema_arg: str = 'schema'
+    """Argument holding schema name. A list of schema names and glob patterns (e.g. tenant_*)
+    may be passed instead, to run the inspection once for all matching schemas (see `get_schemas`).
+    Result then has the leading "schema" column. Only used by inspections having the argument in `params`.
+
+    """
+
+    sql_schemas: str = (
+        'SELECT pg_analyse_schemas.nspname AS schema, pg_analyse_result.* FROM ('
+        'SELECT nspname FROM pg_catalog.pg_namespace '
+        'WHERE nspname LIKE ANY(%(pg_analyse_schemas)s::text[]) ORDER BY nspname'
+        ') pg_analyse_schemas CROSS JOIN LATERAL (\n{sql}\n) pg_analyse_result')
+    """SQL running inspection SQL for every matching schema in one query.
+    Schema placeholder is replaced with schema name from `pg_analyse_schemas`.
+
+    Note that it saves round trips, not catalog scans: the inspection SQL is still executed
+    once per matching schema (e.g. 3000 catalog passes for 3000 schemas) within the statement.
+    Inspections owning SQL taking schema patterns scan catalogs once instead
+    (ClientInspection uses its client engine for many schemas by default).
+
+    """
+
+    re_sql_end = re.compile(r';(?:\s|--[^\n]*)*$')
+
+    inspections_all: List[Type['Inspection']] = InspectionsRegistry()
+    """Registry of all known inspections. Populated on first access."""
+
+    inspections_modules: List[str] = [
+        'pg_analyse.inspections.bundled',
+        'pg_analyse.inspections.contrib',
+    ]
+    """Modules with inspections to import to populate the registry.
+    Third-party modules can be appended here.
+
+    """
+
+    templates: SqlTemplates = SqlTemplates()
+    """Compiled SQL templates cache shared by all inspections."""
 
     def __init_subclass__(cls):
         super().__init_subclass__()
 
         if cls.alias:
-            cls.inspections_all.append(cls)
+            # Registry is taken bypassing its descriptor not to trigger modules import.
+            vars(Inspection)['inspections_all'].registered.append(cls)
 
     def __init__(self, *, args: Dict[str, str] = None):
 
@@ -45,12 +315,121 @@ class Inspection:
         self.arguments = {**self.params, **(args or {})}
         """User supplied arguments to replace defaults."""
 
+        self.timeout: Union[str, float, None] = self.arguments.pop('timeout', None)
+        """Seconds allowed for the inspection (0 - no limit), taken from "timeout" argument,
+        as it is not a query parameter. Validated when run (see Analyser).
+
+        """
+
         self.errors: List[str] = []
         """Inspection errors description."""
 
         self.result: Optional[InspectionResult] = None
         """Inspection run result. Populated runtime."""
 
+        self.hosts: List[str] = []
+        """Hosts the result is gathered from. Populated runtime in fleet mode."""
+
+        self.cached_age: Optional[float] = None
+        """Age (seconds) of the result, if it is taken from cache. Populated runtime."""
+
+        self.expected: Optional[float] = None
+        """Expected run time (seconds, see `cost`). Populated runtime."""
+
+        self.elapsed: Optional[float] = None
+        """Seconds spent on the query. Populated runtime (not in pipeline mode)."""
+
+        self.shard: Optional[Tuple[int, Optional[int]]] = None
+        """OID range [from, to) of relations reported on, if the inspection is a shard. Populated runtime."""
+
+        self.profile: Optional[dict] = None
+        """Profiling information. Populated runtime in profiling mode.
+
+        Keys: time (seconds), rows (count), bytes (approximate size of data fetched),
+        expected (expected time, seconds), explain (execution plan, if requested).
+        In fleet mode: time of the slowest host, sums of rows and bytes, and hosts (host -> profile).
+
+        """
+
+    def get_params(self) -> dict:
+        """Returns query parameters: arguments cast to types of defaults from `params`
+        (e.g. "20" to 20 for an int), so that parameters types are the same from run to run,
+        and the server may reuse plans of prepared statements.
+
+        """
+        defaults = self.params
+        params = {}
+
+        for name, value in self.arguments.items():
+            default = defaults.get(name)
+
+            if isinstance(value, str) and default is not None and not isinstance(default, str):
+                caster = type(default)
+
+                try:
+                    if caster is bool:
+                        value = value.lower() in {'1', 'true', 'yes', 'on'}
+
+                    else:
+                        value = caster(value)
+
+                except ValueError:
+                    # Server will report.
+                    pass
+
+            params[name] = value
+
+        schemas = self.get_schemas()
+
+        if schemas is not None:
+            params.pop(self.schema_arg, None)
+            params['pg_analyse_schemas'] = get_schemas_patterns(schemas)
+
+        return params
+
+    def get_schemas(self) -> Optional[List[str]]:
+        """Returns schema names and glob patterns (* and ?) the inspection is to be run for,
+        if it is to be run for many schemas (a list or a pattern is passed in schema argument).
+        Otherwise (or if the inspection takes no schema argument) returns None.
+
+        """
+        schema_arg = self.schema_arg
+
+        if schema_arg not in self.params:
+            return None
+
+        value = self.arguments.get(schema_arg)
+
+        if isinstance(value, str):
+
+            if '*' not in value and '?' not in value:
+                return None
+
+            return [value]
+
+        if isinstance(value, (list, tuple, set)):
+            return sorted(value)
+
+        return None
+
+    def get_shard_order(self) -> Tuple[str, ...]:
+        """Returns result columns to sort rows of shards by (see `shard_order`)."""
+        order = self.shard_order
+
+        if order and self.get_schemas() is not None:
+            order = ('schema', *order)
+
+        return order
+
+    def get_result(self, result: InspectionResult) -> InspectionResult:
+        """Returns inspection result for the given query result.
+        Inspections computing results client side may override this.
+
+        :param result: Query result. Rows may be fetched lazily.
+
+        """
+        return result
+
     def _get_sql_dir(self) -> Path:
         """Returns SQL directory."""
         return self.sql_dir
@@ -66,19 +445,25 @@ class Inspection:
 
     def get_sql(self) -> str:
         """Returns SQL ready to be executed."""
+        aliases = self.params_aliases
+        schemas = self.get_schemas()
+        expressions = {}
 
-        # Here we replace ":var"-like param placeholders
-        # with "%(var)s"-like acceptable for psycopg2,
-        # escaping % with %%.
+        if schemas is not None:
+            expressions[aliases.get(self.schema_arg, self.schema_arg)] = 'pg_analyse_schemas.nspname'
 
-        out = self._tpl_read().replace('%', '%%')
-        aliases = self.params_aliases
+        sql = self.templates.get(
+            self.get_sql_path(),
+            {aliases.get(name, name): name for name in self.arguments},
+            read=self._tpl_read,
+            expressions=expressions,
+        )
 
-        for name, value in self.arguments.items():
-            name_sql = aliases.get(name, name)
-            out = out.replace(f':{name_sql}', f'%({name})s')
+        if schemas is not None:
+            # Not str.format(): inspection SQL may hold braces (e.g. array literals).
+            sql = self.sql_schemas.replace('{sql}', self.re_sql_end.sub('', sql))
 
-        return out
+        return sql
 
 
 class ContribInspection(Inspection):
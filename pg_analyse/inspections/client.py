@@ -0,0 +1,264 @@
+from collections import defaultdict, namedtuple
+from typing import Dict, List, Iterable, Sequence, Tuple
+
+from .base import Inspection, InspectionResult, get_schemas_patterns
+from ..settings import DIR_SQL
+
+IndexDefinition = namedtuple('IndexDefinition', [
+    'table', 'name', 'size', 'method', 'keys', 'includes', 'predicate', 'unique'])
+"""Index definition. `keys` are (column or expression, operator class) pairs of key columns,
+`includes` are non-key (INCLUDE) columns.
+
+"""
+
+ForeignKeyDefinition = namedtuple('ForeignKeyDefinition', ['table', 'name', 'table_foreign', 'columns'])
+"""Foreign key definition. `columns` are (column, referenced column) attribute numbers pairs."""
+
+
+def get_index_definitions(rows: Iterable[Sequence]) -> List[IndexDefinition]:
+    """Returns index definitions for rows of `client/index_definitions.sql`.
+
+    :param rows:
+
+    """
+    definitions = []
+
+    for table, name, size, method, keys_count, columns, opclasses, predicate, unique in rows:
+        definitions.append(IndexDefinition(
+            table, name, size, method,
+            tuple(zip(columns[:keys_count], opclasses)),
+            tuple(columns[keys_count:]),
+            predicate,
+            unique,
+        ))
+
+    return definitions
+
+
+def get_foreign_key_definitions(rows: Iterable[Sequence]) -> List[ForeignKeyDefinition]:
+    """Returns foreign key definitions for rows of `client/foreign_keys_definitions.sql`.
+
+    :param rows:
+
+    """
+    return [
+        ForeignKeyDefinition(table, name, table_foreign, tuple(zip(columns, columns_foreign)))
+        for table, name, table_foreign, columns, columns_foreign in rows]
+
+
+def _get_indexes_info(indexes: Iterable[IndexDefinition]) -> str:
+    """Returns description of indexes in the form used by index_health SQL."""
+    return '; '.join(f'idx={index.name}, size={index.size}' for index in indexes)
+
+
+def find_duplicated_indexes(definitions: List[IndexDefinition]) -> List[list]:
+    """Returns rows (table_name, duplicated_indexes) for groups of identical indexes.
+
+    Indexes are grouped by hash of table, access method, key columns
+    with operator classes, included columns and predicate, so that time is linear.
+
+    :param definitions:
+
+    """
+    groups: Dict[tuple, List[IndexDefinition]] = defaultdict(list)
+
+    for index in definitions:
+        groups[(index.table, index.method, index.keys, index.includes, index.predicate)].append(index)
+
+    rows = [
+        [indexes[0].table, _get_indexes_info(sorted(indexes, key=lambda index: index.name))]
+        for indexes in groups.values() if len(indexes) > 1]
+
+    return sorted(rows)
+
+
+def find_intersected_indexes(definitions: List[IndexDefinition]) -> List[list]:
+    """Returns rows (table_name, intersected_indexes) for pairs of indexes of the same table,
+    key columns of one being a leading part of key columns of another.
+    Identical indexes are reported by `find_duplicated_indexes`.
+
+    Key columns vectors of a table (and access method, predicate) are sorted,
+    so that vectors starting with a given one follow it. Time is O(n log n + pairs).
+
+    :param definitions:
+
+    """
+    groups: Dict[tuple, List[IndexDefinition]] = defaultdict(list)
+
+    for index in definitions:
+        groups[(index.table, index.method, index.predicate)].append(index)
+
+    rows = []
+
+    for indexes in groups.values():
+
+        if len(indexes) < 2:
+            continue
+
+        indexes.sort(key=lambda index: (index.keys, index.name))
+
+        for idx, index in enumerate(indexes):
+            keys = index.keys
+            keys_len = len(keys)
+
+            for other in indexes[idx + 1:]:
+
+                if other.keys[:keys_len] != keys:
+                    break
+
+                if other.keys != keys:
+                    pair = sorted((index, other), key=lambda item: item.name)
+                    rows.append([index.table, _get_indexes_info(pair)])
+
+    return sorted(rows)
+
+
+def find_duplicated_foreign_keys(definitions: List[ForeignKeyDefinition]) -> List[list]:
+    """Returns rows (table_name, constraint_name, duplicate_constraint_name) for foreign keys
+    of the same table referencing the same columns of the same table (in any order).
+
+    :param definitions:
+
+    """
+    groups: Dict[tuple, List[ForeignKeyDefinition]] = defaultdict(list)
+
+    for foreign_key in definitions:
+        groups[(foreign_key.table, foreign_key.table_foreign, frozenset(foreign_key.columns))].append(foreign_key)
+
+    rows = []
+
+    for foreign_keys in groups.values():
+        first, *others = sorted(foreign_keys, key=lambda foreign_key: foreign_key.name)
+
+        for other in others:
+            rows.append([first.table, first.name, other.name])
+
+    return sorted(rows)
+
+
+def find_intersected_foreign_keys(definitions: List[ForeignKeyDefinition]) -> List[list]:
+    """Returns rows (table_name, constraint_name, intersected_constraint_name) for pairs
+    of foreign keys of the same table having overlapping sets of columns.
+    Duplicates are reported by `find_duplicated_foreign_keys`.
+
+    Pairs are found using an inverted index (table column -> foreign keys), so that
+    only foreign keys actually sharing columns are compared.
+
+    :param definitions:
+
+    """
+    by_column: Dict[tuple, List[ForeignKeyDefinition]] = defaultdict(list)
+
+    for foreign_key in definitions:
+        for column, _ in foreign_key.columns:
+            by_column[(foreign_key.table, column)].append(foreign_key)
+
+    pairs = set()
+
+    for foreign_keys in by_column.values():
+
+        if len(foreign_keys) < 2:
+            continue
+
+        for idx, foreign_key in enumerate(foreign_keys):
+            for other in foreign_keys[idx + 1:]:
+
+                duplicate = (
+                    foreign_key.table_foreign == other.table_foreign and
+                    frozenset(foreign_key.columns) == frozenset(other.columns))
+
+                if not duplicate:
+                    first, second = sorted((foreign_key, other), key=lambda item: item.name)
+                    pairs.add((first.table, first.name, second.name))
+
+    return sorted(map(list, pairs))
+
+
+class ClientInspection(Inspection):
+    """Base class for inspections which may compute results client side (engine=client):
+    definitions are fetched once as compact rows (see `sql_name_client`),
+    and analysed by `analyse` instead of SQL self-joins, which may be slow for many indexes.
+
+    Definitions SQL takes an array of schema LIKE patterns and returns schema name
+    in the first column, so that many schemas are fetched in one scan (see `get_schemas`).
+    Hence, engine=auto (the default) uses client engine for many schemas,
+    as SQL engine would run once per schema (see `sql_schemas`), and SQL engine otherwise.
+
+    """
+
+    sql_name_client: str = ''
+    """SQL template file name (in `client` SQL directory) fetching definitions to analyse."""
+
+    columns_client: Tuple[str, ...] = ()
+    """Result columns for client side engine (same as of SQL engine)."""
+
+    def is_client(self) -> bool:
+        """Returns True if result is to be computed client side."""
+        engine = self.arguments.get('engine')
+
+        if engine == 'auto':
+            return self.get_schemas() is not None
+
+        return engine == 'client'
+
+    def get_sql_path(self) -> str:
+
+        if self.is_client():
+            return str(DIR_SQL / 'client' / f'{self.sql_name_client}.sql')
+
+        return super().get_sql_path()
+
+    def get_sql(self) -> str:
+
+        if not self.is_client():
+            return super().get_sql()
+
+        aliases = self.params_aliases
+
+        return self.templates.get(
+            self.get_sql_path(),
+            {aliases.get(name, name): name for name in self.arguments},
+            read=self._tpl_read,
+        )
+
+    def get_params(self) -> dict:
+        params = super().get_params()
+
+        if self.is_client():
+            params.pop('pg_analyse_schemas', None)
+            params[self.schema_arg] = get_schemas_patterns(
+                self.get_schemas() or [self.arguments.get(self.schema_arg)])
+
+        return params
+
+    def get_result(self, result: InspectionResult) -> InspectionResult:
+
+        if not self.is_client():
+            return result
+
+        by_schema: Dict[str, List[Sequence]] = defaultdict(list)
+
+        for schema, *row in result.rows:
+            by_schema[schema].append(row)
+
+        columns = list(self.columns_client)
+
+        if self.get_schemas() is None:
+            rows = self.analyse([row for rows in by_schema.values() for row in rows])
+
+        else:
+            columns.insert(0, 'schema')
+            rows = [[schema, *row] for schema, rows in sorted(by_schema.items()) for row in self.analyse(rows)]
+
+        result = InspectionResult(columns, rows)
+        result.types = [25] * len(columns)  # 25 - text
+
+        return result
+
+    def analyse(self, rows: Iterable[Sequence]) -> List[list]:  # pragma: nocover
+        """Returns result rows for definitions rows.
+
+        :param rows: Rows of `sql_name_client` query.
+
+        """
+        raise NotImplementedError
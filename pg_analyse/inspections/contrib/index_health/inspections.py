@@ -1,7 +1,14 @@
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Tuple, Iterable, Sequence, List
 
 from ...base import ContribInspection
+from ...client import (
+    ClientInspection, get_index_definitions, get_foreign_key_definitions, find_duplicated_indexes,
+    find_intersected_indexes, find_duplicated_foreign_keys, find_intersected_foreign_keys,
+)
+
+CATALOG_KEYS: Tuple[str, ...] = ('pg_namespace', 'pg_class', 'pg_index', 'pg_attribute', 'pg_constraint')
+"""System catalogs describing indexes and constraints, read by many inspections."""
 
 
 class _IndexHealthInspection(ContribInspection):
@@ -19,6 +26,7 @@ class SeqOverflow(_IndexHealthInspection):
     title: str = 'Sequences exhaustion'
     alias: str = 'seq_exh'
     sql_name: str = 'sequence_overflow'
+    cache_ttl: float = 1800
 
     params: dict = {
         'schema': 'public',
@@ -37,6 +45,10 @@ class IndexesBloated(_IndexHealthInspection):
     title: str = 'Bloating indexes'
     alias: str = 'idx_bloat'
     sql_name: str = 'bloated_indexes'
+    cache_ttl: float = 3600
+    cost: float = 20
+    shard_relkinds: Tuple[str, ...] = ('i',)
+    shard_order: Tuple[str, ...] = ('table_name', 'index_name')
 
     params: dict = {
         'schema': 'public',
@@ -49,21 +61,28 @@ class IndexesBloated(_IndexHealthInspection):
     }
 
 
-class IndexesDuplicated(_IndexHealthInspection):
+class IndexesDuplicated(ClientInspection, _IndexHealthInspection):
     """Reveals duplicated/identical indexes."""
 
     title: str = 'Duplicated indexes'
     alias: str = 'idx_dub'
     sql_name: str = 'duplicated_indexes'
+    catalog: Tuple[str, ...] = CATALOG_KEYS
+    sql_name_client: str = 'index_definitions'
+    columns_client: Tuple[str, ...] = ('table_name', 'duplicated_indexes')
 
     params: dict = {
         'schema': 'public',
+        'engine': 'auto',
     }
 
     params_aliases: Dict[str, str] = {
         'schema': 'schema_name_param',
     }
 
+    def analyse(self, rows: Iterable[Sequence]) -> List[list]:
+        return find_duplicated_indexes(get_index_definitions(rows))
+
 
 class IndexesMissingForFk(_IndexHealthInspection):
     """Reveals foreign keys without indexes."""
@@ -71,6 +90,7 @@ class IndexesMissingForFk(_IndexHealthInspection):
     title: str = 'Foreign keys without indexes'
     alias: str = 'idx_fk'
     sql_name: str = 'foreign_keys_without_index'
+    catalog: Tuple[str, ...] = CATALOG_KEYS
 
     params: dict = {
         'schema': 'public',
@@ -103,6 +123,7 @@ class IndexesWithNulls(_IndexHealthInspection):
     title: str = 'Indexes with NULLs'
     alias: str = 'idx_nulls'
     sql_name: str = 'indexes_with_null_values'
+    catalog: Tuple[str, ...] = CATALOG_KEYS
 
     params: dict = {
         'schema': 'public',
@@ -119,6 +140,7 @@ class IndexesBoolean(_IndexHealthInspection):
     title: str = 'Indexes on Boolean'
     alias: str = 'idx_bool'
     sql_name: str = 'indexes_with_boolean'
+    catalog: Tuple[str, ...] = CATALOG_KEYS
 
     params: dict = {
         'schema': 'public',
@@ -129,21 +151,28 @@ class IndexesBoolean(_IndexHealthInspection):
     }
 
 
-class IndexesWithIntersections(_IndexHealthInspection):
+class IndexesWithIntersections(ClientInspection, _IndexHealthInspection):
     """Reveals partially identical (intersected) indexes."""
 
     title: str = 'Intersecting indexes'
     alias: str = 'idx_intersect'
     sql_name: str = 'intersected_indexes'
+    catalog: Tuple[str, ...] = CATALOG_KEYS
+    sql_name_client: str = 'index_definitions'
+    columns_client: Tuple[str, ...] = ('table_name', 'intersected_indexes')
 
     params: dict = {
         'schema': 'public',
+        'engine': 'auto',
     }
 
     params_aliases: Dict[str, str] = {
         'schema': 'schema_name_param',
     }
 
+    def analyse(self, rows: Iterable[Sequence]) -> List[list]:
+        return find_intersected_indexes(get_index_definitions(rows))
+
 
 class IndexesInvalid(_IndexHealthInspection):
     """Reveals invalid/broken indexes."""
@@ -199,6 +228,10 @@ class TablesBloated(_IndexHealthInspection):
     title: str = 'Bloating tables'
     alias: str = 'tbl_bloat'
     sql_name: str = 'bloated_tables'
+    cache_ttl: float = 3600
+    cost: float = 30
+    shard_relkinds: Tuple[str, ...] = ('r', 'm')
+    shard_order: Tuple[str, ...] = ('table_name',)
 
     params: dict = {
         'schema': 'public',
@@ -292,21 +325,28 @@ class ColumnsUnconventionalNames(_IndexHealthInspection):
     }
 
 
-class FkDuplicated(_IndexHealthInspection):
+class FkDuplicated(ClientInspection, _IndexHealthInspection):
     """Reveals duplicated foreign keys."""
 
     title: str = 'FK duplicated'
     alias: str = 'fk_dub'
     sql_name: str = 'duplicated_foreign_keys'
+    catalog: Tuple[str, ...] = CATALOG_KEYS
+    sql_name_client: str = 'foreign_keys_definitions'
+    columns_client: Tuple[str, ...] = ('table_name', 'constraint_name', 'duplicate_constraint_name')
 
     params: dict = {
         'schema': 'public',
+        'engine': 'auto',
     }
 
     params_aliases: Dict[str, str] = {
         'schema': 'schema_name_param',
     }
 
+    def analyse(self, rows: Iterable[Sequence]) -> List[list]:
+        return find_duplicated_foreign_keys(get_foreign_key_definitions(rows))
+
 
 class FkUnmatchedType(_IndexHealthInspection):
     """Reveals foreign keys with the constrained column type not matching
@@ -325,21 +365,28 @@ class FkUnmatchedType(_IndexHealthInspection):
     }
 
 
-class FkIntersecting(_IndexHealthInspection):
+class FkIntersecting(ClientInspection, _IndexHealthInspection):
     """Reveals foreign keys with overlapping sets of columns."""
 
     title: str = 'FK intersected'
     alias: str = 'fk_isect'
     sql_name: str = 'intersected_foreign_keys'
+    catalog: Tuple[str, ...] = CATALOG_KEYS
+    sql_name_client: str = 'foreign_keys_definitions'
+    columns_client: Tuple[str, ...] = ('table_name', 'constraint_name', 'intersected_constraint_name')
 
     params: dict = {
         'schema': 'public',
+        'engine': 'auto',
     }
 
     params_aliases: Dict[str, str] = {
         'schema': 'schema_name_param',
     }
 
+    def analyse(self, rows: Iterable[Sequence]) -> List[list]:
+        return find_intersected_foreign_keys(get_foreign_key_definitions(rows))
+
 
 class QueriesSlowest(_IndexHealthInspection):
     """Reveals slowest queries. Requires the pg_stat_statement extension"""
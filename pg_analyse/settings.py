@@ -1,3 +1,4 @@
+from os import environ
 from pathlib import Path
 
 
@@ -6,3 +7,9 @@ DIR_SQL = Path(__file__).parent.absolute() / 'sql'
 
 ENV_VAR = 'PG_ANALYSE_DSN'
 """Name of environment variable to search PostgreSQL DSN in."""
+
+DIR_CACHE = Path(environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'pg_analyse'
+"""Directory to store cached data in."""
+
+DIR_DATA = Path(environ.get('XDG_DATA_HOME') or Path.home() / '.local' / 'share') / 'pg_analyse'
+"""Directory to store persistent data (e.g. snapshots) in."""
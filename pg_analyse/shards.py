@@ -0,0 +1,127 @@
+from heapq import merge
+from typing import List, Optional, Sequence, Tuple
+
+from .catalog import get_table_name, rewrite
+from .inspections import InspectionResult
+
+TypeShard = Tuple[int, Optional[int]]
+
+PREFIX = 'pg_analyse_shard_'
+"""Prefix of the temporary view standing for pg_class in a shard query."""
+
+SQL_BOUNDS = (
+    'SELECT percentile_disc(%(fractions)s::float8[]) WITHIN GROUP (ORDER BY oid::bigint) '
+    'FROM pg_catalog.pg_class WHERE relkind::text = ANY(%(relkinds)s::text[])'
+)
+"""SQL returning OIDs splitting relations of the given kinds into parts of equal size."""
+
+
+def get_bounds_params(*, relkinds: Sequence[str], count: int) -> dict:
+    """Returns params for `SQL_BOUNDS`.
+
+    :param relkinds: Kinds of relations to split.
+    :param count: Number of shards.
+
+    """
+    return {
+        'fractions': [idx / count for idx in range(1, count)],
+        'relkinds': list(relkinds),
+    }
+
+
+def get_shards(bounds: Sequence[Optional[int]]) -> List[TypeShard]:
+    """Returns OID ranges [from, to) for bounds returned by `SQL_BOUNDS`.
+    The last range is open (to is None). Ranges made empty by repeating bounds are dropped.
+
+    :param bounds:
+
+    """
+    shards = []
+    start = 0
+
+    for bound in sorted({bound for bound in bounds if bound}):
+        shards.append((start, bound))
+        start = bound
+
+    shards.append((start, None))
+
+    return shards
+
+
+def get_view_sql(*, relkinds: Sequence[str], shard: TypeShard) -> str:
+    """Returns SQL creating a temporary view of pg_class, listing relations
+    of the given kinds only within the OID range of the shard, and all other relations.
+
+    :param relkinds: Kinds of relations the inspection reports on.
+    :param shard: OID range.
+
+    """
+    start, end = shard
+    condition = f'oid::bigint >= {int(start)}'
+
+    if end is not None:
+        condition = f'{condition} AND oid::bigint < {int(end)}'
+
+    kinds = ', '.join(f"'{kind}'" for kind in relkinds if kind.isalpha() and len(kind) == 1)
+
+    return (
+        f'CREATE TEMP VIEW {get_table_name("pg_class", prefix=PREFIX).partition(".")[2]} AS '
+        f'SELECT * FROM pg_catalog.pg_class WHERE relkind NOT IN ({kinds}) OR ({condition})')
+
+
+def rewrite_shard(sql: str) -> str:
+    """Returns SQL reading the shard view (see `get_view_sql`) instead of pg_class.
+
+    :param sql:
+
+    """
+    return rewrite(sql, ('pg_class',), prefix=PREFIX)
+
+
+def get_ordered_sql(sql: str, *, order: Sequence[str]) -> str:
+    """Returns SQL ordering rows of the given SQL by text columns in "C" collation
+    (code points order, the one of Python strings), so that results of shards
+    can be merged (see `merge_results`) regardless of the database collation.
+
+    :param sql: Shard SQL, without trailing semicolon.
+    :param order: Names of text columns to order by.
+
+    """
+    if not order:
+        return sql
+
+    columns = ', '.join(f'pg_analyse_shard.{quote_ident(column)} COLLATE "C"' for column in order)
+
+    return f'SELECT * FROM (\n{sql}\n) pg_analyse_shard ORDER BY {columns}'
+
+
+def quote_ident(name: str) -> str:
+    """Returns quoted SQL identifier."""
+    return '"%s"' % name.replace('"', '""')
+
+
+def merge_results(results: Sequence[InspectionResult], *, order: Sequence[str]) -> InspectionResult:
+    """Returns results of shards merged into one, preserving rows order.
+
+    Every result is expected to be sorted by the given columns (ascending, nulls last,
+    text in "C" collation, see `get_ordered_sql`), rows are merged using k-way merge.
+    Columns not in results are ignored.
+
+    :param results: Results of shards of the same inspection.
+    :param order: Names of columns rows are sorted by.
+
+    """
+    first = results[0]
+    columns = list(first.columns)
+    positions = [columns.index(column) for column in order if column in columns]
+
+    def key(row: Sequence) -> tuple:
+        return tuple((row[position] is None, row[position]) for position in positions)
+
+    if positions:
+        rows = list(merge(*(result.rows for result in results), key=key))
+
+    else:
+        rows = [row for result in results for row in result.rows]
+
+    return first._replace(rows=rows)
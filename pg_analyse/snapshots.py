@@ -0,0 +1,286 @@
+import os
+import zlib
+from datetime import datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+from typing import Union, Optional, List, Dict, Iterable, Tuple
+
+from .encoding import dumps, loads
+from .inspections import Inspection, InspectionResult
+from .settings import DIR_DATA
+
+TEXT_TYPES = {18, 19, 25, 1042, 1043, 2205}
+"""PostgreSQL type OIDs of text-like columns (char, name, text, bpchar, varchar, regclass)."""
+
+
+class Snapshot:
+    """Inspections results saved at some moment (see SnapshotStore)."""
+
+    version: int = 2
+    """Snapshot format version."""
+
+    def __init__(self, *, created: float, host: str = '', inspections: Dict[str, dict] = None, path: Path = None):
+        """
+
+        :param created: Timestamp of creation.
+
+        :param host: Host label (without credentials).
+
+        :param inspections: Inspection alias -> dict with keys:
+            title, arguments, errors, columns, types, data (column-wise, see InspectionResult.get_columns_data).
+
+        :param path: File the snapshot is stored in.
+
+        """
+        self.created = created
+        self.host = host
+        self.inspections = inspections or {}
+        self.path = path
+
+    @classmethod
+    def from_inspections(cls, inspections: Iterable[Inspection], *, host: str = '') -> 'Snapshot':
+        """Creates a snapshot of the given inspections results.
+
+        :param inspections: Inspections with results (rows are consumed if fetched lazily).
+        :param host: Host label.
+
+        """
+        items = {}
+
+        for inspection in inspections:
+            result = inspection.result
+
+            items[inspection.alias] = {
+                'title': inspection.title,
+                'arguments': inspection.arguments,
+                'errors': inspection.errors,
+                'columns': list(result.columns) if result else [],
+                'types': result.types if result else None,
+                'data': result.get_columns_data() if result else [],
+            }
+
+        return cls(created=datetime.now(timezone.utc).timestamp(), host=host, inspections=items)
+
+    def dumps(self) -> bytes:
+        """Returns compressed snapshot data (JSON, see `encoding.dumps`)."""
+        return zlib.compress(dumps({
+            'version': self.version,
+            'created': self.created,
+            'host': self.host,
+            'inspections': self.inspections,
+        }), 1)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'Snapshot':
+        """Loads snapshot from file.
+        Files of untrusted origin are safe to load: data is never unpickled.
+
+        Raises ValueError if the file is not a snapshot of the current format version.
+
+        :param path:
+
+        """
+        path = Path(path)
+
+        try:
+            data = loads(zlib.decompress(path.read_bytes()))
+
+        except (zlib.error, ValueError) as e:
+            raise ValueError(f'{path}: not a snapshot ({e})') from e
+
+        version = data.get('version') if isinstance(data, dict) else None
+
+        if version != cls.version:
+            raise ValueError(f'{path}: unsupported snapshot version {version!r}, expected {cls.version}')
+
+        return cls(created=data['created'], host=data['host'], inspections=data['inspections'], path=path)
+
+
+class SnapshotStore:
+    """Append-only inspections results snapshots store.
+
+    Every run is stored into its own file named after creation time,
+    in a directory per PostgreSQL instance (see `get_key`).
+
+    """
+
+    extension: str = '.snapshot'
+
+    def __init__(self, path: Union[str, Path] = ''):
+        """
+
+        :param path: Store directory. Defaults to `snapshots` in user data directory.
+
+        """
+        self.path = Path(path or DIR_DATA / 'snapshots')
+
+    @staticmethod
+    def get_key(dsn: str) -> str:
+        """Returns key identifying PostgreSQL instance and database for the given DSN.
+        Credentials do not influence the key.
+
+        :param dsn:
+
+        """
+        from .toolbox import get_dsn_key
+        return get_dsn_key(dsn)
+
+    def save(self, inspections: Iterable[Inspection], *, dsn: str) -> Path:
+        """Saves a snapshot of the given inspections results. Returns snapshot file path.
+
+        :param inspections: Inspections with results.
+        :param dsn: DSN inspections are run against.
+
+        """
+        from .toolbox import Fleet
+
+        snapshot = Snapshot.from_inspections(inspections, host=Fleet.get_host(dsn))
+
+        path_dir = self.path / self.get_key(dsn)
+        path_dir.mkdir(parents=True, exist_ok=True)
+
+        name = datetime.fromtimestamp(snapshot.created, timezone.utc).strftime('%Y%m%dT%H%M%S.%fZ')
+        path = path_dir / f'{name}{self.extension}'
+        path_tmp = path_dir / f'.{name}.tmp'
+
+        path_tmp.write_bytes(snapshot.dumps())
+        # Readers never see partially written snapshots.
+        os.replace(path_tmp, path)
+
+        snapshot.path = path
+
+        return path
+
+    def get_paths(self, dsn: str) -> List[Path]:
+        """Returns paths of snapshots for the given DSN, from the oldest to the latest.
+
+        :param dsn:
+
+        """
+        return sorted((self.path / self.get_key(dsn)).glob(f'*{self.extension}'))
+
+
+def get_diff_columns(types: Optional[List[Optional[int]]], data: List[tuple]) -> List[int]:
+    """Returns indexes of columns identifying result rows: columns of text types
+    (or having only text values, if types are unknown).
+
+    :param types: PostgreSQL type OIDs.
+    :param data: Column-wise data.
+
+    """
+    if types and all(types):
+        return [idx for idx, oid in enumerate(types) if oid in TEXT_TYPES]
+
+    return [
+        idx for idx, values in enumerate(data)
+        if all(value is None or isinstance(value, str) for value in values)]
+
+
+def _get_delta(old, new):
+    """Returns difference between numeric values or None."""
+    numeric = (int, float, Decimal)
+
+    if isinstance(old, numeric) and isinstance(new, numeric) and not isinstance(old, bool):
+        return new - old
+
+    return None
+
+
+def diff_result(old: dict, new: dict) -> InspectionResult:
+    """Returns result holding only rows added, removed or changed
+    between two snapshots of the same inspection.
+
+    Rows are matched by key columns (see `get_diff_columns`) using a hash join.
+    Columns are: change (added, removed, changed), key columns, other columns
+    (new values, old ones for removed rows), and "<column>_delta" for every other column.
+
+    If keys are not unique, rows are matched as a whole, so changes
+    are reported as removed and added rows.
+
+    :param old: Inspection data from the older snapshot. See Snapshot.inspections.
+    :param new: Inspection data from the newer snapshot.
+
+    """
+    columns = new['columns']
+    data_new = new['data']
+    data_old = old['data']
+
+    keys_idx = get_diff_columns(new['types'], data_new)
+    values_idx = [idx for idx in range(len(columns)) if idx not in keys_idx]
+
+    def index(data: List[tuple]) -> Tuple[Dict[tuple, tuple], int]:
+        rows_count = len(data[0]) if data else 0
+        keys = list(zip(*[data[idx] for idx in keys_idx])) if keys_idx else [()] * rows_count
+        values = list(zip(*[data[idx] for idx in values_idx])) if values_idx else [()] * rows_count
+        return dict(zip(keys, values)), rows_count
+
+    rows_old, count_old = index(data_old)
+    rows_new, count_new = index(data_new)
+
+    if len(rows_old) < count_old or len(rows_new) < count_new:
+        # Not unique keys. Compare whole rows.
+        keys_idx, values_idx = list(range(len(columns))), []
+        rows_old, _ = index(data_old)
+        rows_new, _ = index(data_new)
+
+    deltas_none = [None] * len(values_idx)
+    rows = []
+
+    for key, values in rows_new.items():
+        values_old = rows_old.pop(key, None)
+
+        if values_old is None:
+            rows.append(['added', *key, *values, *deltas_none])
+
+        elif values_old != values:
+            rows.append(['changed', *key, *values, *map(_get_delta, values_old, values)])
+
+    for key, values in rows_old.items():
+        rows.append(['removed', *key, *values, *deltas_none])
+
+    values_names = [columns[idx] for idx in values_idx]
+
+    return InspectionResult(
+        ['change', *[columns[idx] for idx in keys_idx], *values_names, *[f'{name}_delta' for name in values_names]],
+        rows)
+
+
+def diff_snapshots(old: Snapshot, new: Snapshot, *, only: Iterable[str] = None) -> List[Inspection]:
+    """Returns inspections holding differences between two snapshots
+    (see `diff_result`), ready to be formatted.
+
+    :param old: The older snapshot.
+    :param new: The newer snapshot.
+    :param only: Inspections aliases to compare. If not set all inspections of the newer snapshot are compared.
+
+    """
+    inspections_cls = {inspection_cls.alias: inspection_cls for inspection_cls in Inspection.inspections_all}
+    only = set(only or [])
+
+    elapsed = new.created - old.created
+    diffs = []
+
+    for alias, item_new in new.inspections.items():
+
+        if only and alias not in only:
+            continue
+
+        inspection = inspections_cls.get(alias, Inspection)(args=item_new['arguments'])
+        inspection.alias = alias
+        inspection.title = f"{item_new['title']} (changes in {elapsed / 3600:.1f} h)"
+        inspection.errors = list(item_new['errors'])
+
+        item_old = old.inspections.get(alias)
+
+        if item_old is None or not item_old['columns']:
+            inspection.errors.append('No result in the older snapshot')
+
+        elif item_old['columns'] != item_new['columns']:
+            inspection.errors.append('Result columns differ between snapshots')
+
+        elif item_new['columns']:
+            inspection.result = diff_result(item_old, item_new)
+
+        diffs.append(inspection)
+
+    return diffs
@@ -0,0 +1,14 @@
+-- Compact definitions of foreign keys in schemas matching patterns, analysed client side
+-- (see pg_analyse.inspections.client).
+select
+    nsp.nspname::text as schema_name,
+    c.conrelid::regclass::text as table_name,
+    c.conname as constraint_name,
+    c.confrelid::regclass::text as foreign_table_name,
+    c.conkey as columns,
+    c.confkey as foreign_columns
+from pg_catalog.pg_constraint c
+    join pg_catalog.pg_namespace nsp on nsp.oid = c.connamespace
+where
+    c.contype = 'f' and
+    nsp.nspname like any(:schema_name_param::text[]);
@@ -0,0 +1,23 @@
+-- Compact definitions of indexes in schemas matching patterns, analysed client side
+-- (see pg_analyse.inspections.client).
+select
+    nsp.nspname::text as schema_name,
+    i.indrelid::regclass::text as table_name,
+    i.indexrelid::regclass::text as index_name,
+    pg_relation_size(i.indexrelid) as index_size,
+    am.amname as access_method,
+    i.indnkeyatts as key_columns_count,
+    array(
+        select pg_get_indexdef(i.indexrelid, k, true)
+        from generate_series(1, i.indnatts) k
+        order by k
+    ) as columns,
+    i.indclass::oid[] as opclasses,
+    coalesce(pg_get_expr(i.indpred, i.indrelid, true), '') as predicate,
+    i.indisunique as is_unique
+from pg_catalog.pg_index i
+    join pg_catalog.pg_class ic on ic.oid = i.indexrelid
+    join pg_catalog.pg_namespace nsp on nsp.oid = ic.relnamespace
+    join pg_catalog.pg_am am on am.oid = ic.relam
+where
+    nsp.nspname like any(:schema_name_param::text[]);
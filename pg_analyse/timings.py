@@ -0,0 +1,146 @@
+import json
+import os
+from pathlib import Path
+from threading import Lock
+from typing import Union, Optional, Dict, Iterable
+
+from .inspections import Inspection, InspectionResult
+from .settings import DIR_DATA
+
+
+class Timings:
+    """Inspections run times recorded per PostgreSQL instance,
+    used to estimate how long inspections will take (see `get_expected`)
+    and to schedule the longest ones first when run in parallel.
+
+    Estimates are exponentially weighted moving averages of recorded times.
+    Inspections never run against an instance are estimated using `Inspection.cost`.
+
+    """
+
+    smoothing: float = 0.5
+    """Weight of the latest run time in the estimate (0..1)."""
+
+    def __init__(self, path: Union[str, Path] = ''):
+        """
+
+        :param path: Timings file path. Defaults to `timings.json` in user data directory.
+
+        """
+        self.path = Path(path or DIR_DATA / 'timings.json')
+
+        self._lock = Lock()
+        self._data: Optional[Dict[str, Dict[str, dict]]] = None
+        """Instance key -> inspection alias -> dict with keys:
+        expected (estimate), last (last run time), last_expected (estimate before the last run), runs.
+
+        """
+
+    def _get_data(self) -> Dict[str, Dict[str, dict]]:
+
+        data = self._data
+
+        if data is None:
+
+            try:
+                data = json.loads(self.path.read_text())
+
+            except (OSError, ValueError):
+                data = {}
+
+            self._data = data
+
+        return data
+
+    def get_expected(self, inspection: Inspection, *, dsn: str) -> float:
+        """Returns seconds the inspection is expected to run for against the given DSN.
+
+        :param inspection:
+        :param dsn:
+
+        """
+        from .toolbox import get_dsn_key
+
+        with self._lock:
+            timing = self._get_data().get(get_dsn_key(dsn), {}).get(inspection.alias)
+
+        if timing is None:
+            return float(inspection.cost)
+
+        return timing['expected']
+
+    def record(self, inspections: Iterable[Inspection], *, dsn: str):
+        """Records run times of successful inspections (see Inspection.elapsed) and saves timings.
+
+        :param inspections:
+        :param dsn: DSN inspections are run against.
+
+        """
+        from .toolbox import get_dsn_key
+
+        smoothing = self.smoothing
+
+        with self._lock:
+            timings = self._get_data().setdefault(get_dsn_key(dsn), {})
+            changed = False
+
+            for inspection in inspections:
+                elapsed = inspection.elapsed
+
+                if elapsed is None or inspection.errors:
+                    continue
+
+                timing = timings.get(inspection.alias)
+
+                if timing is None:
+                    timing = timings[inspection.alias] = {'expected': elapsed, 'runs': 0}
+
+                timing['last_expected'] = None if inspection.expected is None else round(inspection.expected, 6)
+                timing['last'] = elapsed
+                timing['expected'] = smoothing * elapsed + (1 - smoothing) * timing['expected']
+                timing['runs'] += 1
+                changed = True
+
+            if changed:
+                self._save()
+
+    def _save(self):
+        """Writes timings into file."""
+        path = self.path
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        path_tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+        path_tmp.write_text(json.dumps(self._data, sort_keys=True))
+        os.replace(path_tmp, path)
+
+    def get_result(self, *, dsn: str) -> InspectionResult:
+        """Returns recorded timings for the given DSN as a result, to compare estimates with actual times.
+
+        Columns: inspection, runs, expected (current estimate), last (last run time),
+        last_expected (estimate the last run was scheduled with), last_error_percent.
+
+        :param dsn:
+
+        """
+        from .toolbox import get_dsn_key
+
+        with self._lock:
+            timings = dict(self._get_data().get(get_dsn_key(dsn), {}))
+
+        rows = []
+
+        for alias, timing in sorted(timings.items(), key=lambda item: -item[1]['expected']):
+            last = timing['last']
+            last_expected = timing.get('last_expected')
+            error = None
+
+            if last_expected is not None and last:
+                error = round((last_expected - last) * 100 / last, 1)
+
+            rows.append([
+                alias, timing['runs'], round(timing['expected'], 3), round(last, 3),
+                None if last_expected is None else round(last_expected, 3), error])
+
+        return InspectionResult(
+            ['inspection', 'runs', 'expected', 'last', 'last_expected', 'last_error_percent'], rows)
+
@@ -1,52 +1,1453 @@
-from typing import List, Union, Set, Dict
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from hashlib import sha256
+from math import ceil, inf
+from pathlib import Path
+from queue import Queue, Empty
+from threading import Timer, Lock
+from time import monotonic
+from typing import List, Union, Set, Dict, Optional, Tuple, Iterator, Iterable, Type, TextIO
 
-try:
-    import psycopg
+from .catalog import SQL_COLUMNS, get_drop_sql, get_slices, iter_create_sql, rewrite
+from .formatters import Formatter, TableFormatter
+from .inspections import Inspection, InspectionResult
+from .settings import ENV_VAR
+from .shards import (
+    SQL_BOUNDS, get_bounds_params, get_ordered_sql, get_shards, get_view_sql, merge_results, rewrite_shard,
+)
+
+try:  # pragma: nocover
+    from envbox import get_environment
+    environ = get_environment()
+
+except ImportError:
+    from os import environ
+
+if False:  # pragma: nocover
+    from .cache import ResultsCache
+    from .snapshots import SnapshotStore
+    from .timings import Timings
+
+
+TypeOnly = Union[List[str], Set[str]]
+TypeInspectionsArgs = Dict[str, Dict[str, Union[str, List[str]]]]
+
+psycopg = None
+"""Database driver module: psycopg 3 or psycopg2. Imported on first use
+(see get_driver()) not to slow down CLI commands not connecting to PG.
+
+"""
+
+
+def get_driver():
+    """Returns database driver module (psycopg 3 or psycopg2), importing it if required."""
+    global psycopg
+
+    if psycopg is None:
+
+        try:
+            import psycopg as driver
+
+        except ImportError:
+            import psycopg2 as driver
+
+        psycopg = driver
+
+    return psycopg
+
+
+def parse_dsn(dsn: str) -> dict:
+    """Parses DSN (connection string or URI) into connection parameters.
+
+    :param dsn:
+
+    """
+    try:
+        from psycopg.conninfo import conninfo_to_dict
+
+    except ImportError:
+        from psycopg2.extensions import parse_dsn as conninfo_to_dict
+
+    return conninfo_to_dict(dsn)
+
+
+def get_dsn_key(dsn: str) -> str:
+    """Returns key identifying PostgreSQL instance and database for the given DSN.
+    Credentials do not influence the key.
+
+    :param dsn:
+
+    """
+    try:
+        params = parse_dsn(dsn)
+        ident = [params.get(name) or '' for name in ('host', 'port', 'dbname', 'user')]
+
+    except Exception:
+        ident = [dsn]
+
+    return sha256('\t'.join(ident).encode()).hexdigest()[:16]
+
+
+def get_pool(dsn: str = '', *, size: int = 4, max_lifetime: float = 3600, **kwargs):
+    """Returns a new connection pool (psycopg_pool.ConnectionPool) to be passed to Analyser.
+    Connections are checked before use and replaced after `max_lifetime`.
+
+    Requires psycopg 3 and psycopg_pool.
+
+    :param dsn: DSN to connection to PostgreSQL.
+    :param size: Maximum number of connections.
+    :param max_lifetime: Seconds for a connection to be kept.
+    :param kwargs: Other options for ConnectionPool.
+
+    """
+    from psycopg_pool import ConnectionPool
+
+    return ConnectionPool(
+        dsn or environ.get(ENV_VAR, ''),
+        min_size=1,
+        max_size=max(size, 1),
+        max_lifetime=max_lifetime,
+        check=ConnectionPool.check_connection,
+        open=True,
+        **kwargs
+    )
+
+
+class Analyser:
+    """Performs the analysis running known inspections."""
+
+    cancel_grace: float = 1
+    """Seconds to wait after inspection timeout for the server
+    to abort the query, before cancelling it from client side.
+
+    """
+
+    def __init__(
+            self,
+            *,
+            dsn: str = '',
+            workers: int = 1,
+            timeout: float = 0,
+            fetch_size: int = 0,
+            pipeline: bool = False,
+            cache: 'ResultsCache' = None,
+            cache_refresh: bool = False,
+            profile: bool = False,
+            explain: bool = False,
+            pool=None,
+            snapshots: 'SnapshotStore' = None,
+            timings: 'Timings' = None,
+            catalog: bool = False,
+            shards: int = 0,
+            consistent: bool = False
+    ):
+        """
+
+        :param dsn: DSN to connection to PostgreSQL.
+
+        :param workers: Number of inspections to run in parallel,
+            each worker using its own connection.
+
+        :param timeout: Seconds allowed for the whole run (0 - no limit).
+            Used as connection timeout and to limit statements execution time.
+            Inspections not started in time are skipped and reported with an error.
+
+            Timeouts for certain inspections (seconds) may be passed in
+            inspection arguments as "timeout" (e.g. using pseudo-inspection "common").
+
+        :param fetch_size: Number of rows to fetch at once using server-side cursors (0 - fetch all at once).
+            When set and inspections run one by one, `iter_run` yields inspections
+            with result rows being a lazily consumed iterator, valid until the next inspection is requested.
+            Errors fetching such rows are stored into inspection errors once the rows are consumed.
+
+        :param pipeline: Send all inspections queries at once over one connection
+            using pipeline mode (psycopg 3, libpq 14+) to save on network round trips.
+            `workers` and `fetch_size` are not used in this mode.
+
+        :param cache: Cache to take fresh results from and to put new results into.
+            Cached results rows are not fetched lazily.
+
+        :param cache_refresh: Do not take results from cache, yet put new results into it.
+
+        :param profile: Gather inspections profiling information (see Inspection.profile):
+            query time, rows count, approximate size of data fetched.
+            Results rows are not fetched lazily. In pipeline mode time is measured
+            from the pipeline start.
+
+        :param explain: Also gather query execution plan using EXPLAIN (ANALYZE, BUFFERS).
+            Note that inspection query is run once again for that. Implies `profile`.
+            Not available in pipeline mode.
+
+        :param pool: Connection pool (psycopg_pool.ConnectionPool, see `get_pool`) to take
+            connections from instead of connecting on every run. True to create such a pool
+            (of `workers` or `shards` connections, whichever is greater) on first use, kept until `close()`. Inspections queries on pooled connections are run
+            as prepared statements, so that the server may reuse their plans.
+            Not used by AsyncAnalyser.
+
+        :param snapshots: Store to save a snapshot of results into after every run (see `diff_snapshots`).
+            Results rows are not fetched lazily.
+
+        :param timings: Store to record inspections run times into and to take expected
+            run times from (see Inspection.expected). Inspections run in parallel are started
+            the longest expected first, so that the slowest ones do not delay the run completion.
+            Expected run times default to `Inspection.cost`.
+
+        :param catalog: Copy slices of system catalogs read by inspections (see Inspection.catalog)
+            into temporary tables once per connection, and run those inspections against the copies,
+            so that catalogs are scanned once per connection instead of once per inspection.
+            Temporary tables are not shared between sessions, so every connection makes
+            its own copies: with N workers (or shards) catalogs are scanned N times,
+            which only pays off if connections run several inspections reading catalogs each.
+            Relations of system schemas are not copied. If copies can not be made
+            (e.g. on a hot standby) catalogs are read directly. Not used by AsyncAnalyser.
+
+        :param shards: Split every inspection declaring relations it reports on (see Inspection.shard_relkinds)
+            into this number of queries, each run on its own connection for relations of its own
+            OID range, and merge their results. Such inspections are run before others.
+            Their rows are ordered by Inspection.shard_order columns in "C" collation (code points).
+            Not used in pipeline mode and by AsyncAnalyser.
+
+        :param consistent: Make inspections run on many connections (see `workers`, `shards`)
+            see the same state of the database: a snapshot is exported from a leader
+            REPEATABLE READ READ ONLY transaction kept open for the run, and every inspection
+            is run in a REPEATABLE READ transaction importing that snapshot.
+            Catalogs are read directly then (see `catalog`), as copies made after the snapshot
+            would not be visible in it. The leader connection is not taken from the pool.
+            Note that the snapshot prevents vacuum from removing rows deleted after it was taken,
+            till the end of the run. Not used in pipeline mode and by AsyncAnalyser.
+
+        """
+        if not dsn:
+            dsn = environ.get(ENV_VAR, '')
+
+        self.dsn = dsn
+        self.workers = max(workers, 1)
+        self.timeout = timeout
+        self.fetch_size = fetch_size
+        self.pipeline = pipeline
+        self.cache = cache
+        self.cache_refresh = cache_refresh
+        self.explain = explain
+        self.profile = profile or explain
+        self.pool = pool
+        self.snapshots = snapshots
+        self.timings = timings
+        self.catalog = catalog
+        self.shards = shards
+        self.consistent = consistent
+
+        self._catalog_slices: List[str] = []
+        self._catalog_ready: Dict[int, Tuple[str, ...]] = {}
+        """Connection id -> catalogs copied for the connection."""
+
+        self._snapshot_id: Optional[str] = None
+        """Snapshot exported for the run, if any (see `consistent`)."""
+
+        self._pool_own = None
+        self._pool_lock = Lock()
+        self._deadline: Optional[float] = None
+        self._timeouts_used: bool = False
+
+    def _connect(self):
+        """Returns a new connection to PostgreSQL."""
+        kwargs = {}
+
+        timeout = self.timeout
+
+        if timeout:
+            kwargs['connect_timeout'] = max(ceil(timeout), 2)
+
+        return get_driver().connect(self.dsn, **kwargs)
+
+    def _get_pool(self):
+        """Returns connection pool to use, if any."""
+        pool = self.pool
+
+        if pool is True:
+
+            with self._pool_lock:
+                pool = self._pool_own
+
+                if pool is None:
+                    pool = self._pool_own = get_pool(self.dsn, size=self._get_pool_size())
+
+        return pool or None
+
+    def _get_pool_size(self) -> int:
+        """Returns the number of connections used at a time, to size own pool (see `pool`)."""
+        size = self.workers
+
+        if self.shards > 1 and not self.pipeline:
+            # Shards of an inspection are run at once, each on its own connection.
+            size = max(size, self.shards)
+
+        return size
+
+    def close(self):
+        """Closes connection pool created by the analyser (see `pool`)."""
+        pool = self._pool_own
+
+        if pool is not None:
+            self._pool_own = None
+            pool.close()
+
+    def _acquire(self):
+        """Returns a connection: from the pool, if any, or a new one."""
+        pool = self._get_pool()
+        connection = self._connect() if pool is None else pool.getconn()
+
+        self._catalog_create(connection)
+
+        return connection
+
+    def _release(self, connection):
+        """Returns the connection to the pool, if any, or closes it.
+
+        :param connection: Connection from `_acquire`.
+
+        """
+        pool = self._get_pool()
+        catalog = self._catalog_ready.pop(id(connection), None)
+
+        if pool is None:
+            connection.close()
+            return
+
+        if not connection.closed:
+            try:
+                # Pooled connections are to be returned idle and without run limits.
+                connection.rollback()
+
+                if self._timeouts_used:
+                    connection.execute('RESET statement_timeout')
+                    connection.execute('RESET lock_timeout')
+                    connection.commit()
+
+                if catalog:
+                    connection.execute(get_drop_sql(catalog))
+                    connection.commit()
+
+            except Exception:
+                # Broken connections are discarded by the pool.
+                pass
+
+        pool.putconn(connection)
+
+    @contextmanager
+    def _connection(self):
+        """Context manager giving a connection. See `_acquire`."""
+        connection = self._acquire()
+
+        try:
+            yield connection
+
+        finally:
+            self._release(connection)
+
+    def _start(self, inspections: List[Inspection]) -> List[Inspection]:
+        """Initializes run state. Returns inspections which can not be run
+        (e.g. having invalid timeout), with errors stored into them.
+
+        :param inspections: Inspections to be run.
+
+        """
+        failed = []
+
+        for inspection in inspections:
+            try:
+                inspection.timeout = self._get_timeout_own(inspection)
+
+            except ValueError as e:
+                inspection.errors.append(f'{e}')
+                failed.append(inspection)
+
+        timeout = self.timeout
+        self._deadline = (monotonic() + timeout) if timeout else None
+        self._timeouts_used = bool(timeout) or any(inspection.timeout for inspection in inspections)
+
+        timings = self.timings
+
+        for inspection in inspections:
+            inspection.expected = (
+                timings.get_expected(inspection, dsn=self.dsn) if timings else float(inspection.cost))
+
+        self._catalog_slices = get_slices(
+            name for inspection in inspections for name in inspection.catalog) if self.catalog else []
+
+        return failed
+
+    @staticmethod
+    def _get_timeout_own(inspection: Inspection) -> float:
+        """Returns seconds allowed for the inspection by its "timeout" argument (0 - no limit).
+
+        Raises ValueError if the timeout is not a non-negative number.
+
+        :param inspection:
+
+        """
+        value = inspection.timeout
+
+        try:
+            timeout = float(value or 0)
+
+        except (TypeError, ValueError):
+            timeout = -1
+
+        if not 0 <= timeout < inf:
+            raise ValueError(f'Invalid timeout: {value!r}. Expected seconds, e.g. 30 or 0.5')
+
+        return timeout
+
+    @staticmethod
+    def _get_schedule(inspections: List[Inspection]) -> List[Inspection]:
+        """Returns inspections in order to be started when run in parallel:
+        the longest expected first (see Inspection.expected).
+
+        :param inspections:
+
+        """
+        return sorted(inspections, key=lambda inspection: -(inspection.expected or 0))
+
+    def _catalog_create(self, connection):
+        """Copies slices of system catalogs required by inspections of the run
+        into temporary tables of the connection session, if catalog mode is on.
+
+        :param connection:
+
+        """
+        names = self._catalog_slices
+
+        if not names or self._snapshot_id:
+            # Rows copied after the snapshot was exported are not visible in it. Catalogs are read directly.
+            return
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(SQL_COLUMNS, {'names': names})
+                columns = dict(cursor.fetchall())
+
+                for sql in iter_create_sql({name: columns[name] for name in names}):
+                    cursor.execute(sql)
+
+            connection.commit()
+
+        except Exception:
+            # E.g. temporary tables are not allowed. Catalogs are read directly.
+            self._rollback(connection)
+            return
+
+        self._catalog_ready[id(connection)] = tuple(names)
+
+    def _catalog_rewrite(self, sql: str, *, inspection: Inspection, connection) -> str:
+        """Returns inspection SQL reading copies of catalogs made for the connection, if any.
+
+        :param sql: Inspection SQL.
+        :param inspection:
+        :param connection:
+
+        """
+        names = self._catalog_ready.get(id(connection))
+
+        if not names or not inspection.catalog:
+            return sql
+
+        return rewrite(sql, tuple(name for name in names if name in inspection.catalog))
+
+    def _timings_record(self, inspections: List[Inspection]):
+        """Records inspections run times, if timings store is set."""
+        timings = self.timings
+
+        if timings:
+            timings.record(inspections, dsn=self.dsn)
+
+    def _get_timeout(self, inspection: Inspection) -> float:
+        """Returns seconds allowed for the inspection (0 - no limit)
+        taking into account its own timeout and time left for the run.
+
+        Raises TimeoutError if there's no time left.
+
+        :param inspection:
+
+        """
+        timeouts = []
+
+        timeout = inspection.timeout
+
+        if timeout:
+            timeouts.append(timeout)
+
+        deadline = self._deadline
+
+        if deadline is not None:
+            left = deadline - monotonic()
+
+            if left <= 0:
+                raise TimeoutError(f'Skipped: run timeout ({self.timeout} s) exceeded')
+
+            timeouts.append(left)
+
+        return min(timeouts, default=0)
+
+    @staticmethod
+    def _get_timeout_sql(timeout: float) -> Tuple[str, dict]:
+        """Returns SQL and params to limit statements and locks waiting time.
+
+        :param timeout: Seconds (0 - no limit).
+
+        """
+        return (
+            "SELECT set_config('statement_timeout', %(timeout)s, false), "
+            "set_config('lock_timeout', %(timeout)s, false)",
+            {'timeout': f'{ceil(timeout * 1000)}'}
+        )
+
+    @staticmethod
+    def _get_profile(result: Optional[InspectionResult], *, elapsed: float, expected: float = None) -> dict:
+        """Returns profiling information for the inspection result.
+
+        :param result: Inspection result (rows materialized).
+        :param elapsed: Seconds spent on query.
+        :param expected: Seconds the inspection was expected to run for (see Inspection.expected).
+
+        """
+        rows = result.rows if result else []
+
+        return {
+            'time': round(elapsed, 6),
+            'rows': len(rows),
+            # Approximation using text representation.
+            'bytes': sum(len(f'{value}') for row in rows for value in row if value is not None),
+            'expected': None if expected is None else round(expected, 6),
+        }
+
+    @staticmethod
+    def _get_explain_sql(sql: str) -> str:
+        """Returns SQL to get execution plan for the given query.
+
+        :param sql:
+
+        """
+        return f'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}'
+
+    @staticmethod
+    def _get_explain_plan(result: InspectionResult):
+        """Returns execution plan from EXPLAIN query result.
+
+        :param result:
+
+        """
+        plan = result.rows[0][0]
+
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        return plan
+
+    @staticmethod
+    def _get_error(error: Exception, *, elapsed: float, cancelled: bool = False) -> str:
+        """Returns error description, adding elapsed time for timed out queries.
+
+        :param error:
+        :param elapsed: Seconds elapsed since the query start.
+        :param cancelled: Query was cancelled from the client side.
+
+        """
+        # query_canceled, lock_not_available
+        code = getattr(error, 'sqlstate', None) or getattr(error, 'pgcode', None)
+
+        if cancelled or code in {'57014', '55P03'}:
+            return f'Timed out after {elapsed:.2f} s: {error}'
+
+        return f'{error}'
+
+    def _sql_exec(
+            self,
+            *,
+            connection,
+            sql: str,
+            params: dict,
+            name: str = '',
+            prepare: bool = False
+    ) -> InspectionResult:
+        """Executes SQL and returns its result.
+
+        :param connection:
+        :param sql:
+        :param params:
+        :param name: Server-side cursor name. If set along with `fetch_size`
+            result rows are lazily fetched in chunks.
+
+        :param prepare: Execute as a prepared statement (psycopg 3).
+            Not used for server-side cursors.
+
+        """
+        fetch_size = self.fetch_size
+
+        if not (name and fetch_size):
+
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params, **({'prepare': True} if prepare else {}))
+                description = cursor.description
+                rows = cursor.fetchall()
+
+            return InspectionResult.from_description(description, rows)
+
+        cursor = connection.cursor(name)
+
+        try:
+            cursor.execute(sql, params)
+            # Server-side cursors may not have description before the first fetch.
+            chunk = cursor.fetchmany(fetch_size)
+            description = cursor.description
+
+        except Exception:
+            cursor.close()
+            raise
+
+        return InspectionResult.from_description(description, self._iter_rows(cursor, chunk=chunk, size=fetch_size))
+
+    @staticmethod
+    def _iter_rows(cursor, *, chunk: list, size: int) -> Iterator[tuple]:
+        """Yields rows from the server-side cursor fetching them in chunks.
+
+        :param cursor:
+        :param chunk: Already fetched rows.
+        :param size: Chunk size.
+
+        """
+        try:
+            while chunk:
+                yield from chunk
+                chunk = cursor.fetchmany(size)
+
+        finally:
+            cursor.close()
+
+    def _iter_rows_guarded(self, rows: Iterator[tuple], *, inspection: Inspection, connection) -> Iterator[tuple]:
+        """Yields lazily fetched rows of the inspection. Fetch error (e.g. lost connection)
+        stops the iteration and is stored into inspection errors, so that it does not
+        abort the output of subsequent inspections.
+
+        :param rows: See `_iter_rows`.
+        :param inspection:
+        :param connection: Connection rows are fetched over.
+
+        """
+        try:
+            yield from rows
+
+        except Exception as e:
+            inspection.errors.append(f'Fetch failed: {e}')
+            self._rollback(connection)
+
+    @staticmethod
+    def _materialize(inspection: Inspection) -> Inspection:
+        """Turns lazily fetched result rows of the given inspection into a list."""
+        result = inspection.result
+
+        if result is not None and not isinstance(result.rows, list):
+            inspection.result = result._replace(rows=list(result.rows))
+
+        return inspection
+
+    def run(self, *, only: TypeOnly = None, arguments: TypeInspectionsArgs = None) -> List[Inspection]:
+        """Run analysis.
+
+        :param only: Names of inspections we're interested in.
+            If not set all inspections are run.
+
+        :param arguments: Arguments to pass to inspections.
+            Pseudo-inspection alias "common" can be used to pass params common for all inspections.
+
+            Example:
+                {
+                'insp_alias': {'param1': 'value', 'param2': 'value'},
+                'common': {'schema': 'nonpublic'},
+                }
+
+        """
+        inspections = self._get_inspections(only=only, arguments=arguments)
+
+        for inspection in self._iter_inspect(inspections):
+            self._materialize(inspection)
+
+        self._snapshot_save(inspections)
+
+        return inspections
+
+    def iter_run(self, *, only: TypeOnly = None, arguments: TypeInspectionsArgs = None) -> Iterator[Inspection]:
+        """Run analysis yielding every inspection as soon as it is complete.
+        Inspections are yielded in order of completion.
+
+        See `run` for params description.
+
+        """
+        inspections = self._get_inspections(only=only, arguments=arguments)
+
+        if not self.snapshots:
+            yield from self._iter_inspect(inspections)
+            return
+
+        for inspection in self._iter_inspect(inspections):
+            yield self._materialize(inspection)
+
+        self._snapshot_save(inspections)
+
+    def _snapshot_save(self, inspections: List[Inspection]):
+        """Saves a snapshot of inspections results, if snapshots store is set."""
+        snapshots = self.snapshots
+
+        if snapshots:
+            snapshots.save(inspections, dsn=self.dsn)
+
+    def _cache_get(self, inspection: Inspection) -> bool:
+        """Populates inspection result from cache if possible.
+        Returns True on success.
+
+        :param inspection:
+
+        """
+        cache = self.cache
+
+        if not cache or self.cache_refresh:
+            return False
+
+        try:
+            key = cache.get_key(dsn=self.dsn, inspection=inspection)
+
+        except Exception:
+            # E.g. missing SQL. Let it fail on run.
+            return False
+
+        cached = cache.get(key, ttl=inspection.cache_ttl)
+
+        if cached is None:
+            return False
+
+        inspection.result, inspection.cached_age = cached
+
+        return True
+
+    def _cache_set(self, inspection: Inspection):
+        """Puts successful inspection result into cache.
+
+        :param inspection:
+
+        """
+        cache = self.cache
+
+        if not cache or inspection.errors or inspection.result is None:
+            return
+
+        self._materialize(inspection)
+        cache.set(cache.get_key(dsn=self.dsn, inspection=inspection), inspection=inspection)
+
+    def _iter_inspect(self, inspections: List[Inspection]) -> Iterator[Inspection]:
+        """Runs the given inspections yielding them as soon as they are complete.
+        Inspections with fresh cached results are yielded first.
+
+        :param inspections:
+
+        """
+        pending = []
+
+        for inspection in inspections:
+
+            if self._cache_get(inspection):
+                yield inspection
+
+            else:
+                pending.append(inspection)
+
+        for inspection in self._iter_execute(pending):
+            self._cache_set(inspection)
+            yield inspection
+
+        self._timings_record(pending)
+
+    def _iter_execute(self, inspections: List[Inspection]) -> Iterator[Inspection]:
+        """Runs the given inspections yielding them as soon as they are complete.
+
+        :param inspections:
+
+        """
+        failed = self._start(inspections)
+        yield from failed
+
+        inspections = [inspection for inspection in inspections if inspection not in failed]
+        sharded = [inspection for inspection in inspections if self._is_sharded(inspection)]
+        inspections = [inspection for inspection in inspections if inspection not in sharded]
+        workers = min(self.workers, len(inspections))
+
+        with self._snapshot(enabled=self.consistent and not self.pipeline and (workers > 1 or bool(sharded))):
+
+            for inspection in sharded:
+                self._inspect_sharded(inspection)
+                yield inspection
+
+            if not inspections:
+                return
+
+            if self.pipeline:
+                yield from self._iter_pipeline(inspections)
+
+            elif workers > 1:
+                yield from self._iter_parallel(inspections, workers=workers)
+
+            else:
+                with self._connection() as connection:
+                    for inspection in inspections:
+                        self._inspect(connection=connection, inspection=inspection)
+                        yield inspection
+
+    @contextmanager
+    def _snapshot(self, *, enabled: bool):
+        """Context manager exporting a snapshot of the database (see `consistent`)
+        from a leader read only transaction kept open till exit.
+        If the snapshot can not be exported, connections take their own snapshots.
+
+        :param enabled: Whether to export a snapshot.
+
+        """
+        if not enabled:
+            yield
+            return
+
+        # Not taken from the pool, which is sized for inspections.
+        connection = self._connect()
+
+        try:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+
+                self._snapshot_id = self._sql_exec(
+                    connection=connection, sql='SELECT pg_catalog.pg_export_snapshot()', params=None).rows[0][0]
+
+            except Exception:
+                # E.g. not supported by the server. Run is not consistent.
+                self._rollback(connection)
+
+            yield
+
+        finally:
+            self._snapshot_id = None
+            connection.close()
+
+    def _snapshot_import(self, connection, *, read_only: bool = True):
+        """Starts a new transaction of the connection seeing the exported snapshot, if any.
+        Statements run in the transaction see the database as the leader does (see `_snapshot`).
+
+        :param connection:
+        :param read_only: Start read only transaction. Writable ones may create temporary relations.
+
+        """
+        snapshot = self._snapshot_id
+
+        if not snapshot:
+            return
+
+        connection.rollback()
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"SET TRANSACTION ISOLATION LEVEL REPEATABLE READ{' READ ONLY' if read_only else ''}")
+            cursor.execute(f"""SET TRANSACTION SNAPSHOT '{snapshot.replace("'", "''")}'""")
+
+    def _is_sharded(self, inspection: Inspection) -> bool:
+        """Returns True if the inspection is to be split into shards."""
+        return self.shards > 1 and not self.pipeline and bool(inspection.shard_relkinds)
+
+    def _inspect_sharded(self, inspection: Inspection):
+        """Runs the inspection split into shards by OID ranges of relations it reports on,
+        in parallel, each shard on its own connection, and merges shards results.
+        Errors of shards are stored into inspection errors.
+
+        :param inspection:
+
+        """
+        try:
+            self._get_timeout(inspection)
+
+        except TimeoutError as e:
+            inspection.errors.append(f'{e}')
+            return
+
+        started = monotonic()
+
+        try:
+            with self._connection() as connection:
+                self._snapshot_import(connection)
+                bounds = self._sql_exec(
+                    connection=connection,
+                    sql=SQL_BOUNDS,
+                    params=get_bounds_params(relkinds=inspection.shard_relkinds, count=self.shards),
+                ).rows[0][0]
+
+        except Exception as e:
+            inspection.errors.append(f'{e}')
+            return
+
+        shards = []
+
+        for shard_range in get_shards(bounds or []):
+            shard = type(inspection)(args=inspection.arguments)
+            shard.shard = shard_range
+            shard.expected = inspection.expected
+            shard.timeout = inspection.timeout
+            shards.append(shard)
+
+        for _ in self._iter_parallel(shards, workers=len(shards)):
+            pass
+
+        inspection.elapsed = monotonic() - started
+
+        for shard in shards:
+            inspection.errors.extend(
+                f'Shard {shard.shard[0]}-{shard.shard[1] or ""}: {error}' for error in shard.errors)
+
+        if inspection.errors:
+            return
+
+        inspection.result = merge_results([shard.result for shard in shards], order=inspection.get_shard_order())
+
+        if self.profile:
+            inspection.profile = self._get_profile(
+                inspection.result, elapsed=inspection.elapsed, expected=inspection.expected)
+
+    @staticmethod
+    def _get_inspections(*, only: TypeOnly = None, arguments: TypeInspectionsArgs = None) -> List[Inspection]:
+        """Returns inspection objects to be run, in registry order."""
+
+        inspections = []
+        only = set(only or [])
+        arguments = arguments or {}
+        arguments_common = arguments.get('common', {})
+
+        for inspection_cls in Inspection.inspections_all:
+
+            alias = inspection_cls.alias
+
+            if not only or alias in only:
+
+                inspections.append(inspection_cls(args={
+                    **arguments_common,
+                    **arguments.get(alias, {}),
+                } or None))
+
+        return inspections
+
+    def _inspect(self, *, connection, inspection: Inspection):
+        """Runs the given inspection using the connection,
+        storing any error into inspection errors.
+
+        """
+        try:
+            timeout = self._get_timeout(inspection)
+
+        except TimeoutError as e:
+            inspection.errors.append(f'{e}')
+            return
+
+        started = monotonic()
+        timer = None
+
+        try:
+            # Views of shards are temporary relations, to be created in a writable transaction.
+            self._snapshot_import(connection, read_only=inspection.shard is None)
+
+            if self._timeouts_used:
+                # Always set, to reset limits of previous inspections.
+                sql, params = self._get_timeout_sql(timeout)
+                self._sql_exec(connection=connection, sql=sql, params=params)
+
+            if timeout:
+                # In case server is unable to abort the query in time.
+                timer = Timer(timeout + self.cancel_grace, connection.cancel)
+                timer.daemon = True
+                timer.start()
+
+            sql = inspection.get_sql()
+            shard = inspection.shard
+
+            if shard is not None:
+                # The view lives till the end of transaction, rolled back after the query.
+                with connection.cursor() as cursor:
+                    cursor.execute(get_view_sql(relkinds=inspection.shard_relkinds, shard=shard))
+
+                sql = get_ordered_sql(
+                    rewrite_shard(inspection.re_sql_end.sub('', sql)), order=inspection.get_shard_order())
+
+            sql = self._catalog_rewrite(sql, inspection=inspection, connection=connection)
+            started = monotonic()
+
+            inspection.result = inspection.get_result(self._sql_exec(
+                connection=connection,
+                sql=sql,
+                params=inspection.get_params(),
+                name='' if shard else f'pg_analyse_{inspection.alias}',
+                prepare=shard is None and self._get_pool() is not None,
+            ))
+            inspection.elapsed = monotonic() - started
+
+            rows = inspection.result.rows
+
+            if not isinstance(rows, list):
+                inspection.result = inspection.result._replace(
+                    rows=self._iter_rows_guarded(rows, inspection=inspection, connection=connection))
+
+            if shard is not None:
+                self._materialize(inspection)
+                connection.rollback()
+
+            if self.profile:
+                self._materialize(inspection)
+                inspection.profile = self._get_profile(
+                    inspection.result, elapsed=monotonic() - started, expected=inspection.expected)
+
+        except Exception as e:
+            inspection.errors.append(self._get_error(
+                e, elapsed=monotonic() - started, cancelled=bool(timer and timer.finished.is_set())))
+            self._rollback(connection)
+
+        else:
+            if self.explain and inspection.shard is None:
+                try:
+                    inspection.profile['explain'] = self._get_explain_plan(self._sql_exec(
+                        connection=connection, sql=self._get_explain_sql(sql), params=inspection.get_params()))
+
+                except Exception as e:
+                    inspection.profile['explain_error'] = f'{e}'
+                    self._rollback(connection)
+
+        finally:
+            if timer:
+                timer.cancel()
+
+    @staticmethod
+    def _rollback(connection):
+        """Rolls back failed transaction so that the connection
+        is usable for subsequent inspections.
+
+        """
+        try:
+            connection.rollback()
+
+        except Exception:
+            # E.g. connection is lost, next inspections will report that.
+            pass
+
+    def _iter_parallel(self, inspections: List[Inspection], *, workers: int) -> Iterator[Inspection]:
+        """Runs inspections in threads over a pool of at most `workers` connections,
+        yielding them as soon as they are complete.
+
+        :param inspections:
+        :param workers:
+
+        """
+        pool = Queue()
+        connections = []
+
+        def inspect(inspection: Inspection) -> Inspection:
+
+            try:
+                connection = pool.get_nowait()
+
+            except Empty:
+                connection = self._acquire()
+                connections.append(connection)
+
+            try:
+                self._inspect(connection=connection, inspection=inspection)
+                # Rows are fetched here for the connection to be reused safely.
+                self._materialize(inspection)
+
+            finally:
+                pool.put(connection)
+
+            return inspection
+
+        executor = ThreadPoolExecutor(max_workers=workers)
+
+        try:
+            futures = [executor.submit(inspect, inspection) for inspection in self._get_schedule(inspections)]
+
+            for future in as_completed(futures):
+                # Propagates connection errors.
+                yield future.result()
+
+        finally:
+            # Consumer may stop early. Drop not yet started inspections.
+            executor.shutdown(wait=True, cancel_futures=True)
+
+            for connection in connections:
+                self._release(connection)
+
+    def _iter_pipeline(self, inspections: List[Inspection]) -> Iterator[Inspection]:
+        """Runs inspections over one connection in pipeline mode,
+        yielding them as soon as they are complete.
+
+        A failed query aborts the following ones in the pipeline,
+        so those are sent again in a new pipeline.
+
+        :param inspections:
+
+        """
+        pending = []
+
+        for inspection in inspections:
+            try:
+                pending.append((inspection, inspection.get_sql()))
+
+            except Exception as e:
+                inspection.errors.append(f'{e}')
+                yield inspection
+
+        pipeline_cls = getattr(get_driver(), 'Pipeline', None)
+
+        with self._connection() as connection:
+
+            if not (pipeline_cls and pipeline_cls.is_supported()):
+                # psycopg2 or older libpq.
+                for inspection, _ in pending:
+                    self._inspect(connection=connection, inspection=inspection)
+                    yield inspection
+                return
+
+            pending = [
+                (inspection, self._catalog_rewrite(sql, inspection=inspection, connection=connection))
+                for inspection, sql in pending]
+
+            # Every query is run in its own implicit transaction.
+            autocommit = connection.autocommit
+            connection.autocommit = True
+
+            try:
+                yield from self._iter_pipelined(connection, pending)
+
+            finally:
+                if self._get_pool() is not None and not connection.closed:
+                    # Pooled connection is to be returned as it was.
+                    connection.autocommit = autocommit
+
+    def _iter_pipelined(self, connection, pending: List[Tuple[Inspection, str]]) -> Iterator[Inspection]:
+        """Runs inspections in pipeline mode over the connection,
+        yielding them as soon as they are complete.
+
+        :param connection: Connection in autocommit mode.
+        :param pending: Inspections and their SQL.
+
+        """
+        prepare = {'prepare': True} if self._get_pool() is not None else {}
+
+        while pending:
+            cursors = []
+            error = None
+            started = monotonic()
 
-except ImportError:
-    import psycopg2 as psycopg
+            try:
+                with connection.pipeline():
+                    for inspection, sql in pending:
 
-from .formatters import Formatter, TableFormatter
-from .inspections import Inspection, InspectionResult
-from .settings import ENV_VAR
+                        if self._timeouts_used:
+                            try:
+                                timeout = self._get_timeout(inspection)
 
-try:  # pragma: nocover
-    from envbox import get_environment
-    environ = get_environment()
+                            except TimeoutError as e:
+                                # Skipped. Handled below as having no cursor.
+                                inspection.errors.append(f'{e}')
+                                cursors.append(None)
+                                continue
 
-except ImportError:
-    from os import environ
+                            connection.cursor().execute(*self._get_timeout_sql(timeout))
 
+                        cursor = connection.cursor()
+                        cursors.append(cursor)
+                        cursor.execute(sql, inspection.get_params(), **prepare)
 
-TypeOnly = Union[List[str], Set[str]]
-TypeInspectionsArgs = Dict[str, Dict[str, str]]
+            except Exception as e:
+                # The first error is from the first failed query, others are aborted.
+                error = e
 
+            # Failed connection fails every inspection left.
+            fatal = bool(connection.closed)
+            failed = error is not None
+            aborted = []
 
-class Analyser:
-    """Performs the analysis running known inspections."""
+            for idx, (inspection, sql) in enumerate(pending):
+                cursor = cursors[idx] if idx < len(cursors) else None
+
+                if cursor is None and idx < len(cursors):
+                    # Skipped.
+                    yield inspection
+
+                elif cursor is not None and cursor.pgresult is not None:
+                    inspection.result = inspection.get_result(InspectionResult.from_description(
+                        cursor.description, cursor.fetchall()))
+                    cursor.close()
+
+                    if self.profile:
+                        inspection.profile = self._get_profile(
+                            inspection.result, elapsed=monotonic() - started, expected=inspection.expected)
+
+                    yield inspection
+
+                elif error is not None:
+                    inspection.errors.append(self._get_error(error, elapsed=monotonic() - started))
+                    error = error if fatal else None
+                    yield inspection
+
+                elif failed:
+                    aborted.append((inspection, sql))
+
+                else:  # pragma: nocover
+                    inspection.errors.append('No result received')
+                    yield inspection
+
+            pending = aborted
+
+
+class AsyncAnalyser(Analyser):
+    """Performs the analysis running known inspections asynchronously.
+
+    Requires psycopg 3 (uses its async connections).
+
+    """
+
+    async def _sql_exec(self, *, connection, sql: str, params: dict, name: str = '') -> InspectionResult:
+        """Executes SQL and returns its result.
+
+        Rows are fetched with server-side cursor in chunks of `fetch_size` if `name` is set,
+        yet collected into a list.
 
-    def __init__(self, *, dsn: str = ''):
         """
+        fetch_size = self.fetch_size
+        chunked = bool(name and fetch_size)
 
-        :param dsn: DSN to connection to PostgreSQL.
+        async with (connection.cursor(name) if chunked else connection.cursor()) as cursor:
+            await cursor.execute(sql, params)
+
+            if chunked:
+                rows = []
+
+                while chunk := await cursor.fetchmany(fetch_size):
+                    rows.extend(chunk)
+
+            else:
+                rows = await cursor.fetchall()
+
+            description = cursor.description
+
+        return InspectionResult.from_description(description, rows)
+
+    async def _inspect(self, *, connection, inspection: Inspection):
+
+        try:
+            timeout = self._get_timeout(inspection)
+
+        except TimeoutError as e:
+            inspection.errors.append(f'{e}')
+            return
+
+        started = monotonic()
+
+        try:
+            if self._timeouts_used:
+                sql, params = self._get_timeout_sql(timeout)
+                await self._sql_exec(connection=connection, sql=sql, params=params)
+
+            sql = inspection.get_sql()
+            started = monotonic()
+
+            inspection.result = inspection.get_result(await self._sql_exec(
+                connection=connection,
+                sql=sql,
+                params=inspection.get_params(),
+                name=f'pg_analyse_{inspection.alias}',
+            ))
+            inspection.elapsed = monotonic() - started
+
+            if self.profile:
+                inspection.profile = self._get_profile(
+                    inspection.result, elapsed=monotonic() - started, expected=inspection.expected)
+
+            if self.explain:
+                try:
+                    inspection.profile['explain'] = self._get_explain_plan(await self._sql_exec(
+                        connection=connection, sql=self._get_explain_sql(sql), params=inspection.get_params()))
+
+                except Exception as e:
+                    inspection.profile['explain_error'] = f'{e}'
+                    await connection.rollback()
+
+        except Exception as e:
+            inspection.errors.append(self._get_error(e, elapsed=monotonic() - started))
+
+            try:
+                await connection.rollback()
+
+            except Exception:
+                pass
+
+    async def run(self, *, only: TypeOnly = None, arguments: TypeInspectionsArgs = None) -> List[Inspection]:
+        """Run analysis. Not more than `workers` inspections (and connections)
+        are active at a time. Cancellation closes opened connections.
+
+        :param only: Names of inspections we're interested in.
+            If not set all inspections are run.
+
+        :param arguments: Arguments to pass to inspections.
+            Pseudo-inspection alias "common" can be used to pass params common for all inspections.
 
         """
-        if not dsn:
-            dsn = environ.get(ENV_VAR, '')
+        inspections = self._get_inspections(only=only, arguments=arguments)
 
-        self.dsn = dsn
+        failed = self._start(inspections)
+        timeout = self.timeout
 
-    def _sql_exec(self, *, connection, sql: str, params: dict) -> InspectionResult:
+        import asyncio
 
-        with connection.cursor() as cursor:
-            cursor.execute(sql, params)
-            columns = [column.name for column in cursor.description]
-            rows = cursor.fetchall()
+        semaphore = asyncio.Semaphore(self.workers)
+        pool = asyncio.Queue()
+        connections = []
+
+        async def inspect(inspection: Inspection):
+
+            async with semaphore:
+
+                try:
+                    connection = pool.get_nowait()
+
+                except asyncio.QueueEmpty:
+                    connection = await get_driver().AsyncConnection.connect(
+                        self.dsn, **({'connect_timeout': max(ceil(timeout), 2)} if timeout else {}))
+                    connections.append(connection)
+
+                try:
+                    await self._inspect(connection=connection, inspection=inspection)
+
+                finally:
+                    pool.put_nowait(connection)
 
-        return InspectionResult(columns, rows)
+            self._cache_set(inspection)
+
+        pending = [
+            inspection for inspection in inspections
+            if inspection not in failed and not self._cache_get(inspection)]
+
+        try:
+            # Tasks acquire the semaphore in order of creation.
+            await asyncio.gather(*(inspect(inspection) for inspection in self._get_schedule(pending)))
+
+        finally:
+            for connection in connections:
+                await connection.close()
+
+        self._timings_record(pending)
+        self._snapshot_save(inspections)
+
+        return inspections
+
+
+class Fleet:
+    """Performs the analysis on many PostgreSQL instances,
+    merging results of the same inspections into one, tagged by host.
+
+    """
+
+    def __init__(self, *, dsns: List[str], concurrency: int = 8, **options):
+        """
+
+        :param dsns: DSNs to connect to PostgreSQL instances.
+
+        :param concurrency: Number of instances to analyse in parallel.
+
+        :param options: Options for Analyser used for every instance, e.g.:
+            workers, timeout (seconds allowed for the analysis of an instance).
+
+        """
+        self.dsns = dsns
+        self.concurrency = max(concurrency, 1)
+        self.options = options
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path], **kwargs) -> 'Fleet':
+        """Alternative constructor taking DSNs from a file.
+
+        :param path: File path. See `read_dsns`.
+        :param kwargs: Arguments for the constructor.
+
+        """
+        return cls(dsns=read_dsns(path), **kwargs)
+
+    @staticmethod
+    def get_host(dsn: str) -> str:
+        """Returns host label (without credentials) for the given DSN.
+
+        :param dsn:
+
+        """
+        try:
+            params = parse_dsn(dsn)
+
+        except Exception:
+            params = {}
+
+        host = params.get('host') or 'localhost'
+
+        port = params.get('port')
+        if port:
+            host = f'{host}:{port}'
+
+        dbname = params.get('dbname')
+        if dbname:
+            host = f'{host}/{dbname}'
+
+        return host
+
+    def _get_hosts(self) -> List[str]:
+        """Returns unique host labels for DSNs."""
+        hosts = []
+
+        for dsn in self.dsns:
+            host = base = self.get_host(dsn)
+            idx = 1
+
+            while host in hosts:
+                idx += 1
+                host = f'{base}#{idx}'
+
+            hosts.append(host)
+
+        return hosts
+
+    @staticmethod
+    def _get_inspections(*, only: TypeOnly = None, arguments: TypeInspectionsArgs = None) -> List[Inspection]:
+        """Returns inspection objects to be run, in registry order. See `Analyser._get_inspections`."""
+        return Analyser._get_inspections(only=only, arguments=arguments)
+
+    def _analyse(self, dsn: str, *, only: TypeOnly, arguments: TypeInspectionsArgs) -> List[Inspection]:
+
+        analyser = Analyser(dsn=dsn, **self.options)
+
+        try:
+            return analyser.run(only=only, arguments=arguments)
+
+        except Exception as e:
+            # Unable to connect, etc.
+            inspections = analyser._get_inspections(only=only, arguments=arguments)
+
+            for inspection in inspections:
+                inspection.errors.append(f'{e}')
+
+            return inspections
+
+        finally:
+            analyser.close()
 
     def run(self, *, only: TypeOnly = None, arguments: TypeInspectionsArgs = None) -> List[Inspection]:
-        """Run analysis.
+        """Run analysis. Returns inspections with results merged from all hosts.
+        Each result row is prepended with "host" column, errors are prefixed with host.
 
         :param only: Names of inspections we're interested in.
             If not set all inspections are run.
@@ -54,45 +1455,184 @@ class Analyser:
         :param arguments: Arguments to pass to inspections.
             Pseudo-inspection alias "common" can be used to pass params common for all inspections.
 
-            Example:
-                {
-                'insp_alias': {'param1': 'value', 'param2': 'value'},
-                'common': {'schema': 'nonpublic'},
-                }
+        """
+        def analyse(dsn: str) -> List[Inspection]:
+            return self._analyse(dsn, only=only, arguments=arguments)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            results = list(executor.map(analyse, self.dsns))
+
+        merged: Dict[str, Inspection] = {}
+
+        for host, inspections in zip(self._get_hosts(), results):
+
+            for inspection in inspections:
+
+                target = merged.get(inspection.alias)
+
+                if target is None:
+                    target = merged[inspection.alias] = type(inspection)(args=inspection.arguments)
+
+                target.hosts.append(host)
+                target.errors.extend(f'{host}: {error}' for error in inspection.errors)
+
+                self._merge_profile(target, inspection, host=host)
+
+                cached_age = inspection.cached_age
+
+                if cached_age is not None:
+                    # The oldest result of all hosts.
+                    target.cached_age = max(cached_age, target.cached_age or 0)
+
+                result = inspection.result
+
+                if result is None:
+                    continue
+
+                if target.result is None:
+                    target.result = InspectionResult(['host', *result.columns], [])
+
+                    if result.types:
+                        target.result.types = [25, *result.types]  # 25 - text
+
+                elif target.result.columns[1:] != list(result.columns):
+                    # E.g. another server version. Rows would be misaligned.
+                    target.errors.append(
+                        f"{host}: result columns ({', '.join(result.columns)}) differ from those of other hosts "
+                        f"({', '.join(target.result.columns[1:])}), rows are skipped")
+                    continue
+
+                target.result.rows.extend([host, *row] for row in result.rows)
+
+        return list(merged.values())
+
+    @staticmethod
+    def _merge_profile(target: Inspection, inspection: Inspection, *, host: str):
+        """Merges profiling information of the inspection run on the host into the merged inspection.
+
+        Merged profile keys: time (of the slowest host), rows and bytes (sums),
+        hosts (host -> profile of the host).
+
+        :param target: Merged inspection.
+        :param inspection: Inspection run on the host.
+        :param host: Host label.
 
         """
-        results = []
-        only = set(only or [])
-        arguments = arguments or {}
-        arguments_common = arguments.get('common', {})
+        profile = inspection.profile
+
+        if not profile:
+            return
+
+        merged = target.profile
+
+        if merged is None:
+            merged = target.profile = {'time': 0, 'rows': 0, 'bytes': 0, 'hosts': {}}
+
+        merged['time'] = max(merged['time'], profile.get('time') or 0)
+        merged['rows'] += profile.get('rows') or 0
+        merged['bytes'] += profile.get('bytes') or 0
+        merged['hosts'][host] = profile
+
+    def iter_run(self, *, only: TypeOnly = None, arguments: TypeInspectionsArgs = None) -> Iterator[Inspection]:
+        """Run analysis yielding merged inspections.
+
+        Merging requires all the hosts to be analysed, so inspections
+        are yielded only after that.
+
+        """
+        yield from self.run(only=only, arguments=arguments)
+
+
+def get_analyser(*, dsn: str = '', dsns: List[str] = None, concurrency: int = 8, **options) -> Union[Analyser, Fleet]:
+    """Returns analyser for one PostgreSQL instance or for many (fleet mode).
+
+    :param dsn: DSN to connection to PostgreSQL.
+
+    :param dsns: DSNs of many PostgreSQL instances to analyse (fleet mode).
+        If set `dsn` is ignored.
+
+    :param concurrency: Number of instances to analyse in parallel (fleet mode).
+
+    :param options: Options for Analyser (see its docs).
+
+    """
+    if dsns:
+        # Results are merged, so there's no use in lazy fetching.
+        options.pop('fetch_size', None)
+        return Fleet(dsns=dsns, concurrency=concurrency, **options)
+
+    return Analyser(dsn=dsn, **options)
+
+
+def get_formatter_cls(fmt: str = '') -> Type[Formatter]:
+    """Returns formatter class for the given alias.
+
+    :param fmt: Formatter alias. If not set table formatter is used.
+
+    """
+    return Formatter.formatters_all[fmt or TableFormatter.alias]
+
 
-        with psycopg.connect(self.dsn) as connection:
+def format_inspections(inspections: List[Inspection], *, fmt: str = '', human: bool = False) -> str:
+    """Formats inspections results into a string.
 
-            for inspection_cls in Inspection.inspections_all:
+    :param inspections: Inspections with results.
 
-                alias = inspection_cls.alias
+    :param fmt: Formatter alias to be used to format analysis results.
+
+    :param human: Use human friendly values formatting (e.g. sizes).
+
+    """
+    formatter_cls = get_formatter_cls(fmt)
+
+    out = []
+
+    for inspection in inspections:
+        out.append(formatter_cls(inspection, human=human).run())
+
+    return formatter_cls.wrap(out)
+
+
+def iter_format_inspections(inspections: Iterable[Inspection], *, fmt: str = '', human: bool = False) -> Iterator[str]:
+    """Formats inspections results yielding string chunks
+    as soon as inspections are available.
+
+    :param inspections: Inspections with results.
+
+    :param fmt: Formatter alias to be used to format analysis results.
+
+    :param human: Use human friendly values formatting (e.g. sizes).
+
+    """
+    formatter_cls = get_formatter_cls(fmt)
+
+    yield from formatter_cls.iter_wrap(
+        formatter_cls(inspection, human=human).run() for inspection in inspections)
 
-                if not only or alias in only:
 
-                    inspection = inspection_cls(args={
-                        **arguments_common,
-                        **arguments.get(alias, {}),
-                    } or None)
+def write_inspections(
+        inspections: Iterable[Inspection],
+        out: TextIO,
+        *,
+        fmt: str = '',
+        human: bool = False
+):
+    """Formats inspections results writing them into a file-like object
+    as soon as inspections are available.
+
+    Row formatters (e.g. ndjson, csv) write results row by row.
 
-                    try:
+    :param inspections: Inspections with results.
 
-                        inspection.result = self._sql_exec(
-                            connection=connection,
-                            sql=inspection.get_sql(),
-                            params=inspection.arguments,
-                        )
+    :param out: File-like object to write into.
 
-                    except Exception as e:
-                        inspection.errors.append(f'{e}')
+    :param fmt: Formatter alias to be used to format analysis results.
 
-                    results.append(inspection)
+    :param human: Use human friendly values formatting (e.g. sizes).
 
-        return results
+    """
+    formatter_cls = get_formatter_cls(fmt)
+    formatter_cls.write_all((formatter_cls(inspection, human=human) for inspection in inspections), out)
 
 
 def analyse_and_format(
@@ -101,7 +1641,13 @@ def analyse_and_format(
         fmt: str = '',
         only: TypeOnly = None,
         human: bool = False,
-        arguments: TypeInspectionsArgs = None
+        arguments: TypeInspectionsArgs = None,
+        workers: int = 1,
+        dsns: List[str] = None,
+        concurrency: int = 8,
+        timeout: float = 0,
+        fetch_size: int = 0,
+        **options
 ) -> str:
     """Performs the analysis and returns results as a string.
 
@@ -123,25 +1669,175 @@ def analyse_and_format(
                 'common': {'schema': 'nonpublic'},
                 }
 
+    :param workers: Number of inspections to run in parallel.
+
+    :param dsns: DSNs of many PostgreSQL instances to analyse (fleet mode).
+        If set `dsn` is ignored.
+
+    :param concurrency: Number of instances to analyse in parallel (fleet mode).
+
+    :param timeout: Seconds allowed for the analysis of an instance (0 - no limit).
+
+    :param fetch_size: Number of rows to fetch at once using server-side cursors (0 - fetch all at once).
+
+    :param options: Other options for Analyser (see its docs).
+
     """
-    analyser = Analyser(dsn=dsn)
+    analyser = get_analyser(
+        dsn=dsn, dsns=dsns, concurrency=concurrency,
+        workers=workers, timeout=timeout, fetch_size=fetch_size, **options)
+
     inspections = analyser.run(only=only, arguments=arguments)
 
-    fmt = fmt or TableFormatter.alias
-    formatter_cls = Formatter.formatters_all[fmt]
+    return format_inspections(inspections, fmt=fmt, human=human)
 
-    out = []
 
-    for inspection in inspections:
-        out.append(formatter_cls(inspection, human=human).run())
+def iter_analyse_and_format(
+        *,
+        dsn: str = '',
+        fmt: str = '',
+        only: TypeOnly = None,
+        human: bool = False,
+        arguments: TypeInspectionsArgs = None,
+        workers: int = 1,
+        dsns: List[str] = None,
+        concurrency: int = 8,
+        timeout: float = 0,
+        fetch_size: int = 0,
+        **options
+) -> Iterator[str]:
+    """Performs the analysis yielding formatted results chunks
+    as soon as every inspection is complete.
 
-    return formatter_cls.wrap(out)
+    Joined chunks make up a valid document for the given format.
+
+    See `analyse_and_format` for params description.
+    If `fetch_size` is set, inspections run one by one (no `workers`) are formatted
+    without holding entire results in memory.
+
+    """
+    analyser = get_analyser(
+        dsn=dsn, dsns=dsns, concurrency=concurrency,
+        workers=workers, timeout=timeout, fetch_size=fetch_size, **options)
+
+    yield from iter_format_inspections(analyser.iter_run(only=only, arguments=arguments), fmt=fmt, human=human)
+
+
+def analyse_and_write(
+        out: TextIO,
+        *,
+        dsn: str = '',
+        fmt: str = '',
+        only: TypeOnly = None,
+        human: bool = False,
+        arguments: TypeInspectionsArgs = None,
+        workers: int = 1,
+        dsns: List[str] = None,
+        concurrency: int = 8,
+        timeout: float = 0,
+        fetch_size: int = 0,
+        **options
+):
+    """Performs the analysis writing formatted results into a file-like object
+    as soon as every inspection is complete.
+
+    See `analyse_and_format` for params description.
+    With `fetch_size` set and a row formatter (e.g. ndjson, csv) rows
+    go to `out` as they are fetched, without holding entire results in memory.
+
+    :param out: File-like object to write into.
+
+    """
+    analyser = get_analyser(
+        dsn=dsn, dsns=dsns, concurrency=concurrency,
+        workers=workers, timeout=timeout, fetch_size=fetch_size, **options)
+
+    write_inspections(analyser.iter_run(only=only, arguments=arguments), out, fmt=fmt, human=human)
+
+
+def analyse_and_export(
+        path: Union[str, Path],
+        *,
+        fmt: str = 'parquet',
+        dsn: str = '',
+        only: TypeOnly = None,
+        arguments: TypeInspectionsArgs = None,
+        workers: int = 1,
+        dsns: List[str] = None,
+        concurrency: int = 8,
+        timeout: float = 0,
+        fetch_size: int = 0,
+        **options
+) -> List[Inspection]:
+    """Performs the analysis writing results into a typed columnar dataset
+    (Apache Parquet or Arrow IPC files) partitioned by inspection alias.
+    Requires pyarrow (pg_analyse[arrow]).
+
+    Returns inspections (results of which are consumed).
+
+    See `analyse_and_format` for params description.
+
+    :param path: Dataset directory path.
+
+    :param fmt: Dataset format: parquet, arrow.
+
+    """
+    from .arrow import write_dataset
+
+    analyser = get_analyser(
+        dsn=dsn, dsns=dsns, concurrency=concurrency,
+        workers=workers, timeout=timeout, fetch_size=fetch_size, **options)
+
+    return write_dataset(analyser.iter_run(only=only, arguments=arguments), path, fmt=fmt)
+
+
+async def analyse_and_format_async(
+        *,
+        dsn: str = '',
+        fmt: str = '',
+        only: TypeOnly = None,
+        human: bool = False,
+        arguments: TypeInspectionsArgs = None,
+        workers: int = 1,
+        timeout: float = 0,
+        fetch_size: int = 0,
+        **options
+) -> str:
+    """Asynchronously performs the analysis and returns results as a string.
+
+    See `analyse_and_format` for params description.
+
+    """
+    analyser = AsyncAnalyser(dsn=dsn, workers=workers, timeout=timeout, fetch_size=fetch_size, **options)
+    inspections = await analyser.run(only=only, arguments=arguments)
+
+    return format_inspections(inspections, fmt=fmt, human=human)
+
+
+def read_dsns(path: Union[str, Path]) -> List[str]:
+    """Reads DSNs from a file.
+    One DSN per line, empty lines and lines starting with # are skipped.
+
+    :param path: File path.
+
+    """
+    dsns = []
+
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+
+            if line and not line.startswith('#'):
+                dsns.append(line)
+
+    return dsns
 
 
 def parse_args_string(val: str) -> TypeInspectionsArgs:
     """Parses inspections args string into a dict.
 
     :param val: E.g.: idx_bloat:schema=my,bloat_min=20;common:schema=my
+        Repeated arguments are gathered into a list, e.g.: common:schema=one,schema=two
 
     """
     out = {}
@@ -154,10 +1850,21 @@ def parse_args_string(val: str) -> TypeInspectionsArgs:
 
         for arg in argstr.split(','):
             name, _, val = arg.partition('=')
+            name = name.strip()
             val = val.strip()
 
-            if val:
-                args[name.strip()] = val
+            if not val:
+                continue
+
+            if name in args:
+                # Repeated argument makes a list, e.g.: schema=one,schema=two
+                if not isinstance(args[name], list):
+                    args[name] = [args[name]]
+
+                args[name].append(val)
+
+            else:
+                args[name] = val
 
         if args:
             out[alias.strip()] = args
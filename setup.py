@@ -56,7 +56,7 @@ setup(
     author='Igor `idle sign` Starikov',
     author_email='idlesign@yandex.ru',
 
-    packages=find_packages(exclude=['tests']),
+    packages=find_packages(exclude=['tests', 'benchmarks', 'benchmarks.*']),
     include_package_data=True,
     zip_safe=False,
 
@@ -67,6 +67,12 @@ setup(
             'click',
             'tabulate',
         ],
+        'arrow': [
+            'pyarrow',
+        ],
+        'pool': [
+            'psycopg_pool',
+        ],
     },
 
     setup_requires=(['pytest-runner'] if 'test' in sys.argv else []) + [],
@@ -5,29 +5,92 @@ import pytest
 
 class PgMock:
 
-    def __init__(self, columns, rows, *, exception=None):
+    class Pipeline:
+
+        @staticmethod
+        def is_supported():
+            return True
+
+    def __init__(self, columns, rows, *, exception=None, types=None):
         self.columns = columns
         self.rows = rows
+        self.types = types or {}
         self.exception = exception
+        self.close_calls = 0
+        self.fetched = 0
+        self.rolled_back = 0
+        self.cursor_names = []
+        self.closed = False
+        self.autocommit = False
+        self.pgresult = None
+        self.pipelines = 0
+        self.executed = 0
+        self.prepared = 0
+        self.params = []
+        self.queries = []
+        self.taken = 0
+        self.returned = 0
 
     @property
     def description(self):
-        column_descr = namedtuple('column_descr', ['name'])
-        return [column_descr(column) for column in self.columns]
+        column_descr = namedtuple('column_descr', ['name', 'type_code'])
+        return [column_descr(column, self.types.get(column)) for column in self.columns]
 
     def fetchall(self):
         return self.rows
 
+    def fetchmany(self, size):
+        fetched = self.fetched
+        self.fetched += size
+        return self.rows[fetched:fetched + size]
+
+    def pipeline(self):
+        self.pipelines += 1
+        return self
+
+    def rollback(self):
+        self.rolled_back += 1
+
+    def commit(self):
+        pass
+
+    def getconn(self):
+        self.taken += 1
+        return self
+
+    def putconn(self, connection):
+        self.returned += 1
+
+    def cancel(self):
+        pass
+
     def connect(self, *arg, **kwargs):
         return self
 
-    def cursor(self):
+    @property
+    def AsyncConnection(self):
+        return PgMockAsync(self)
+
+    def close(self):
+        self.close_calls += 1
+
+    def cursor(self, *args):
+        self.cursor_names.extend(args)
         return self
 
     def execute(self, *args, **kwargs):
+        self.executed += 1
+        self.prepared += bool(kwargs.get('prepare'))
+        self.params.append(args[1] if len(args) > 1 else None)
+        self.queries.append(args[0] if args else None)
+        self.fetched = 0
+        self.pgresult = None
         exception = self.exception
+        if isinstance(exception, Exception):
+            raise exception
         if exception:
             raise ValueError(exception)
+        self.pgresult = True
         return
 
     def __enter__(self):
@@ -37,11 +100,49 @@ class PgMock:
         pass
 
 
+class PgMockAsync:
+
+    def __init__(self, mock):
+        self.mock = mock
+
+    @property
+    def description(self):
+        return self.mock.description
+
+    async def fetchall(self):
+        return self.mock.fetchall()
+
+    async def fetchmany(self, size):
+        return self.mock.fetchmany(size)
+
+    async def rollback(self):
+        self.mock.rollback()
+
+    async def connect(self, *arg, **kwargs):
+        return self
+
+    def cursor(self, *args):
+        self.mock.cursor(*args)
+        return self
+
+    async def execute(self, *args, **kwargs):
+        return self.mock.execute(*args, **kwargs)
+
+    async def close(self):
+        self.mock.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
 @pytest.fixture
 def mock_pg(monkeypatch):
 
-    def mock_pg_(columns, rows, *, exception=None):
-        mock_ = PgMock(columns, rows, exception=exception)
+    def mock_pg_(columns, rows, *, exception=None, types=None):
+        mock_ = PgMock(columns, rows, exception=exception, types=types)
         monkeypatch.setattr('pg_analyse.toolbox.psycopg', mock_)
         return mock_
 
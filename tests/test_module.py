@@ -1,8 +1,25 @@
+import asyncio
 import json
+import pickle
+import re
+import subprocess
+import sys
+import zlib
+from decimal import Decimal
+from io import StringIO
 from os import environ
+from pathlib import Path
+
+import pytest
 
 from pg_analyse.settings import ENV_VAR
-from pg_analyse.toolbox import analyse_and_format, parse_args_string
+from pg_analyse.cache import ResultsCache
+from pg_analyse.formatters import Formatter
+from pg_analyse.inspections import Inspection, InspectionResult
+from pg_analyse.toolbox import (
+    Analyser, AsyncAnalyser, Fleet, analyse_and_export, analyse_and_format, analyse_and_format_async, analyse_and_write,
+    format_inspections, iter_analyse_and_format, parse_args_string,
+)
 
 
 def test_parse_args():
@@ -87,3 +104,969 @@ def test_exceptions(mock_pg):
         'arguments': {'schema': 'public'},
         'errors': ['bang!'], 'result': {'rows': [], 'columns': []}}]
 
+
+
+def test_workers(mock_pg):
+
+    mock = mock_pg(['some_size'], [[10]])
+
+    inspections = Analyser(workers=4).run()
+    assert [inspection.alias for inspection in inspections] == [
+        inspection_cls.alias for inspection_cls in Inspection.inspections_all]
+    assert all(inspection.result.rows == [[10]] for inspection in inspections)
+    assert 1 <= mock.close_calls <= 4
+
+    mock_pg([], [], exception='bang!')
+
+    inspections = Analyser(workers=2).run(only=['idx_unused', 'idx_bloat'])
+    assert [inspection.alias for inspection in inspections] == ['idx_bloat', 'idx_unused']
+    assert all(inspection.errors == ['bang!'] for inspection in inspections)
+
+
+def test_async(mock_pg):
+
+    mock = mock_pg(['some_size'], [[123456789]])
+
+    out = asyncio.run(analyse_and_format_async(fmt='json', human=True, only=['idx_unused', 'idx_bloat'], workers=2))
+    out = json.loads(out)
+    assert [item['alias'] for item in out] == ['idx_bloat', 'idx_unused']
+    assert out[0]['result']['rows'] == [['117.74 MB']]
+    assert 1 <= mock.close_calls <= 2
+
+    mock_pg([], [], exception='bang!')
+
+    out = asyncio.run(analyse_and_format_async(fmt='json', only=['idx_unused']))
+    assert json.loads(out)[0]['errors'] == ['bang!']
+
+
+def test_timeout(mock_pg):
+
+    mock_pg(['some_size'], [[10]])
+
+    inspections = Analyser(timeout=30).run(only=['idx_unused'])
+    assert inspections[0].result.rows == [[10]]
+    assert not inspections[0].errors
+
+    inspections = Analyser(timeout=0.000001).run(only=['idx_unused'])
+    assert inspections[0].errors == ['Skipped: run timeout (1e-06 s) exceeded']
+
+    inspections = Analyser(timeout=0.000001, pipeline=True).run(only=['idx_unused'])
+    assert inspections[0].errors == ['Skipped: run timeout (1e-06 s) exceeded']
+
+    mock = mock_pg(['some_size'], [[10]])
+    inspections = Analyser().run(only=['idx_unused'], arguments={'common': {'timeout': '5'}})
+    assert inspections[0].result.rows == [[10]]
+    assert inspections[0].timeout == 5
+
+    # Timeout is not a query parameter.
+    assert all('timeout' not in params for params in mock.params if params and 'schema' in params)
+    out = json.loads(analyse_and_format(fmt='json', only=['idx_unused'], arguments={'common': {'timeout': '5'}}))
+    assert 'timeout' not in out[0]['arguments']
+
+    # Invalid timeout fails the inspection only.
+    for analyser in (Analyser(), Analyser(workers=2), Analyser(pipeline=True)):
+        inspections = analyser.run(
+            only=['idx_unused', 'idx_bloat'], arguments={'idx_bloat': {'timeout': '1m'}})
+        assert [inspection.errors for inspection in inspections] == [
+            ["Invalid timeout: '1m'. Expected seconds, e.g. 30 or 0.5"], []]
+        assert inspections[0].result is None
+        assert inspections[1].result.rows == [[10]]
+
+    inspections = asyncio.run(AsyncAnalyser().run(only=['idx_unused'], arguments={'common': {'timeout': '-1'}}))
+    assert inspections[0].errors == ["Invalid timeout: '-1'. Expected seconds, e.g. 30 or 0.5"]
+
+    class QueryCanceled(Exception):
+        sqlstate = '57014'
+
+    mock_pg([], [], exception=QueryCanceled('canceling statement due to statement timeout'))
+
+    for pipeline in (False, True):
+        inspections = Analyser(pipeline=pipeline).run(only=['idx_unused'], arguments={'idx_unused': {'timeout': '5'}})
+        error = inspections[0].errors[0]
+        assert error.startswith('Timed out after 0.')
+        assert error.endswith(' s: canceling statement due to statement timeout')
+
+
+def test_fleet(mock_pg, tmp_path, monkeypatch):
+
+    mock_pg(['some_size'], [(10,)])
+
+    fpath = tmp_path / 'hosts.txt'
+    fpath.write_text('# comment\nhost=one\n\nhost=two port=5433 dbname=my password=secret\nhost=one\n')
+
+    fleet = Fleet.from_file(fpath, concurrency=2)
+    assert fleet.dsns == ['host=one', 'host=two port=5433 dbname=my password=secret', 'host=one']
+
+    inspections = fleet.run(only=['idx_unused', 'idx_bloat'])
+    assert [inspection.alias for inspection in inspections] == ['idx_bloat', 'idx_unused']
+
+    hosts = ['one', 'two:5433/my', 'one#2']
+    inspection = inspections[0]
+    assert inspection.hosts == hosts
+    assert inspection.result.columns == ['host', 'some_size']
+    assert inspection.result.rows == [['one', 10], ['two:5433/my', 10], ['one#2', 10]]
+
+    out = json.loads(analyse_and_format(fmt='json', dsns=fleet.dsns, only=['idx_unused']))
+    assert out[0]['hosts'] == hosts
+    assert 'host' in analyse_and_format(dsns=fleet.dsns, only=['idx_unused'])
+
+    # Profiles of hosts.
+    inspection = Fleet(dsns=['host=one', 'host=two'], profile=True).run(only=['idx_unused'])[0]
+    assert inspection.profile['rows'] == 2
+    assert list(inspection.profile['hosts']) == ['one', 'two']
+    out = analyse_and_format(dsns=['host=one', 'host=two'], only=['idx_unused'], profile=True)
+    assert 'Profile: ' in out and 'two: Profile: ' in out
+
+    # Hosts results of other columns are not merged.
+    results = iter([
+        InspectionResult(['some_size'], [[1]]),
+        InspectionResult(['other_size'], [[2]]),
+    ])
+    monkeypatch.setattr(Inspection, 'get_result', lambda self, result: next(results))
+    inspection = Fleet(dsns=['host=one', 'host=two'], concurrency=1).run(only=['idx_unused'])[0]
+    assert inspection.result.rows == [['one', 1]]
+    assert inspection.errors == [
+        'two: result columns (other_size) differ from those of other hosts (some_size), rows are skipped']
+    monkeypatch.undo()
+
+    mock_pg([], [], exception='bang!')
+
+    out = analyse_and_format(dsns=['host=one', 'host=two'], only=['idx_unused'])
+    assert 'one: bang!' in out
+    assert 'two: bang!' in out
+
+
+def test_stream(mock_pg):
+
+    mock_pg(['some_size'], [[10]])
+
+    for workers in (1, 3):
+        chunks = list(iter_analyse_and_format(fmt='json', only=['idx_unused', 'idx_bloat'], workers=workers))
+        assert len(chunks) == 3
+        out = json.loads(''.join(chunks))
+        assert sorted(item['alias'] for item in out) == ['idx_bloat', 'idx_unused']
+
+        chunks = list(iter_analyse_and_format(only=['idx_unused', 'idx_bloat'], workers=workers))
+        assert len(chunks) == 2
+        assert chunks[1].startswith('\n\n\n')
+
+    assert json.loads(''.join(iter_analyse_and_format(fmt='json', only=['unknown']))) == []
+
+    # Early stop.
+    iterator = Analyser(workers=2).iter_run()
+    assert next(iterator).result.rows == [[10]]
+    iterator.close()
+
+
+def test_rows_formats(mock_pg):
+
+    mock_pg(['name', 'some_size'], [['a', 1024], ['b,c', 0]])
+
+    out = StringIO()
+    analyse_and_write(out, fmt='ndjson', human=True, only=['idx_unused', 'idx_bloat'], fetch_size=1)
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert lines == [
+        {'inspection': 'idx_bloat', 'name': 'a', 'some_size': '1.0 KB'},
+        {'inspection': 'idx_bloat', 'name': 'b,c', 'some_size': '0 B'},
+        {'inspection': 'idx_unused', 'name': 'a', 'some_size': '1.0 KB'},
+        {'inspection': 'idx_unused', 'name': 'b,c', 'some_size': '0 B'},
+    ]
+
+    assert analyse_and_format(fmt='csv', only=['idx_unused']) == (
+        'inspection,name,some_size\n'
+        'idx_unused,a,1024\n'
+        'idx_unused,"b,c",0\n')
+
+    mock_pg([], [], exception='bang!')
+    assert analyse_and_format(fmt='ndjson', only=['idx_unused']) == '{"inspection": "idx_unused", "error": "bang!"}\n'
+    assert analyse_and_format(fmt='csv', only=['idx_unused']) == 'inspection,error\nidx_unused,bang!\n'
+
+    out = StringIO()
+    analyse_and_write(out, fmt='json', only=['idx_unused'])
+    assert json.loads(out.getvalue())[0]['errors'] == ['bang!']
+
+
+def test_fetch_size(mock_pg):
+
+    rows = [[idx] for idx in range(5)]
+    mock = mock_pg(['some_size'], rows)
+
+    iterator = Analyser(fetch_size=2).iter_run(only=['idx_unused', 'idx_bloat'])
+    inspection = next(iterator)
+    assert not isinstance(inspection.result.rows, list)
+    assert list(inspection.result.rows) == rows
+    assert mock.cursor_names == ['pg_analyse_idx_bloat']
+    assert mock.close_calls == 1  # server-side cursor
+    iterator.close()
+
+    inspections = Analyser(fetch_size=2).run(only=['idx_unused', 'idx_bloat'])
+    assert [inspection.result.rows for inspection in inspections] == [rows, rows]
+
+    out = json.loads(analyse_and_format(fmt='json', only=['idx_unused'], fetch_size=3))
+    assert out[0]['result']['rows'] == rows
+
+    out = json.loads(''.join(iter_analyse_and_format(fmt='json', only=['idx_unused'], fetch_size=3)))
+    assert out[0]['result']['rows'] == rows
+
+    out = json.loads(asyncio.run(analyse_and_format_async(fmt='json', only=['idx_unused'], fetch_size=3)))
+    assert out[0]['result']['rows'] == rows
+
+    mock = mock_pg([], [], exception='bang!')
+    inspections = Analyser(fetch_size=2).run(only=['idx_unused', 'idx_bloat'])
+    assert [inspection.errors for inspection in inspections] == [['bang!'], ['bang!']]
+    assert mock.rolled_back == 2
+
+    # Errors fetching rows lazily are stored into inspection errors, not to abort the output.
+    mock = mock_pg(['some_size'], rows)
+    fetchmany = mock.fetchmany
+
+    def fetchmany_failing(size):
+        if mock.fetched:
+            raise ValueError('connection lost')
+        return fetchmany(size)
+
+    mock.fetchmany = fetchmany_failing
+
+    out = StringIO()
+    analyse_and_write(out, fmt='ndjson', only=['idx_unused', 'idx_bloat'], fetch_size=2)
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert lines == [
+        {'inspection': 'idx_bloat', 'some_size': 0},
+        {'inspection': 'idx_bloat', 'some_size': 1},
+        {'inspection': 'idx_bloat', 'error': 'Fetch failed: connection lost'},
+        {'inspection': 'idx_unused', 'some_size': 0},
+        {'inspection': 'idx_unused', 'some_size': 1},
+        {'inspection': 'idx_unused', 'error': 'Fetch failed: connection lost'},
+    ]
+    assert mock.rolled_back == 2
+
+    out = ''.join(iter_analyse_and_format(fmt='csv', only=['idx_unused'], fetch_size=2))
+    assert out == (
+        'inspection,some_size\nidx_unused,0\nidx_unused,1\n'
+        'inspection,error\nidx_unused,Fetch failed: connection lost\n')
+
+    out = ''.join(iter_analyse_and_format(only=['idx_unused'], fetch_size=2))
+    assert out.endswith('1\n\n  Fetch failed: connection lost')
+
+
+def test_sql_templates(tmp_path):
+
+    (tmp_path / 'my.sql').write_text(
+        "select '%' from t where s = :schema_name_param and n::text = :schema and x = :unknown")
+
+    class MyInspection(Inspection):
+
+        sql_dir = tmp_path
+        sql_name = 'my'
+
+        params = {'schema': 'public', 'schema_name': 'other'}
+        params_aliases = {'schema_name': 'schema_name_param'}
+
+    templates = Inspection.templates
+    templates.clear()
+
+    expected = "select '%%' from t where s = %(schema_name)s and n::text = %(schema)s and x = :unknown"
+    assert MyInspection().get_sql() == expected
+    assert templates.stats() == {'hits': 0, 'misses': 1, 'templates': 1, 'compiled': 1}
+
+    assert MyInspection().get_sql() == expected
+    assert templates.stats()['hits'] == 1
+
+    (tmp_path / 'my.sql').write_text('select :schema')
+    assert MyInspection().get_sql() == expected
+
+    templates.clear(path=MyInspection().get_sql_path())
+    assert MyInspection().get_sql() == 'select %(schema)s'
+    assert templates.stats()['templates'] == 1
+
+
+def test_pipeline(mock_pg):
+
+    mock = mock_pg(['some_size'], [[10]])
+
+    inspections = Analyser(pipeline=True, timeout=30).run(only=['idx_unused', 'idx_bloat'])
+    assert [inspection.result.rows for inspection in inspections] == [[[10]], [[10]]]
+    assert mock.autocommit
+    assert mock.pipelines == 1
+
+    out = json.loads(analyse_and_format(fmt='json', only=['idx_unused'], pipeline=True))
+    assert out[0]['result']['rows'] == [[10]]
+
+    mock = mock_pg([], [], exception='bang!')
+
+    inspections = Analyser(pipeline=True).run(only=['idx_unused', 'idx_bloat', 'tbl_bloat'])
+    assert [inspection.errors for inspection in inspections] == [['bang!'], ['bang!'], ['bang!']]
+    # Aborted queries are sent again.
+    assert mock.pipelines == 3
+
+
+def test_cache(mock_pg, tmp_path):
+
+    mock = mock_pg(['some_size'], [(10,)])
+    cache = ResultsCache(tmp_path / 'cache.sqlite', size_max=1024)
+
+    def run(**kwargs):
+        return json.loads(analyse_and_format(
+            fmt='json', only=['idx_unused', 'idx_bloat'], cache=cache, **kwargs))
+
+    out = run()
+    assert mock.executed == 2
+    assert 'cached_age' not in out[0]
+
+    out = run()
+    assert mock.executed == 2
+    assert out[0]['cached_age'] >= 0
+    assert out[0]['result']['rows'] == [[10]]
+    assert '(cached 0 s ago)' in analyse_and_format(only=['idx_unused'], cache=cache)
+
+    # Different arguments.
+    run(arguments={'common': {'schema': 'other'}})
+    assert mock.executed == 4
+
+    out = run(cache_refresh=True)
+    assert mock.executed == 6
+    assert 'cached_age' not in out[0]
+
+    # Expired.
+    cache.ttl = 0.000001
+    run()
+    assert mock.executed == 7  # idx_bloat has its own TTL
+
+    out = json.loads(asyncio.run(analyse_and_format_async(fmt='json', only=['idx_bloat'], cache=cache)))
+    assert out[0]['cached_age'] >= 0
+
+    # Eviction.
+    cache.size_max = 1
+    run(cache_refresh=True)
+    assert cache._get_connection().execute('SELECT count(*) FROM results').fetchone() == (0,)
+
+    # Values of types without JSON counterparts are kept.
+    from datetime import datetime, timedelta, timezone
+    from pg_analyse.encoding import dumps, loads
+
+    row = [
+        Decimal('1.50'), datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc), timedelta(days=1, seconds=2),
+        {'$decimal': 'a', 'x': [1, None]}, b'\x00', ('a', 1.5, True)]
+    assert loads(dumps([row])) == [[*row[:5], ['a', 1.5, True]]]
+
+    with pytest.raises(ValueError):
+        loads(b'\x80\x04K\x01.')  # pickle
+
+    cache.size_max = 1024 * 1024
+    cache.ttl = 300
+    inspection = Inspection.inspections_all[0]()
+    inspection.result = InspectionResult(['value'], [row])
+    inspection.result.types = [1700]
+    cache.set('key', inspection=inspection)
+    result, _ = cache.get('key')
+    assert result.rows == [[*row[:5], ['a', 1.5, True]]]
+    assert result.types == [1700]
+
+    # Data of unknown format is a miss.
+    cache._get_connection().execute("UPDATE results SET data = ? WHERE key = 'key'", (b'\x80\x04K\x01.',))
+    assert cache.get('key') is None
+
+    cache.clear()
+    cache.close()
+
+
+def test_profile(mock_pg):
+
+    plan = [{'Plan': {'Total Cost': 1.5, 'Shared Hit Blocks': 3, 'Shared Read Blocks': 0},
+             'Planning Time': 0.1, 'Execution Time': 0.2}]
+
+    mock_pg(['plan', 'some_size'], [[json.dumps(plan), 1000]])
+
+    out = json.loads(analyse_and_format(fmt='json', only=['idx_unused'], profile=True))
+    profile = out[0]['profile']
+    assert profile['time'] >= 0
+    assert profile['rows'] == 1
+    assert profile['bytes'] > 4
+
+    out = json.loads(analyse_and_format(fmt='json', only=['idx_unused'], explain=True))
+    assert out[0]['profile']['explain'] == plan
+
+    out = analyse_and_format(only=['idx_unused'], explain=True, human=True)
+    assert 'Profile: 0.' in out
+    assert 'Plan: execution 0.2 ms, planning 0.1 ms, cost 1.5, shared buffers hit 3 read 0' in out
+
+    out = json.loads(asyncio.run(analyse_and_format_async(fmt='json', only=['idx_unused'], explain=True)))
+    assert out[0]['profile']['explain'] == plan
+
+    out = json.loads(analyse_and_format(fmt='json', only=['idx_unused'], profile=True, pipeline=True))
+    assert out[0]['profile']['rows'] == 1
+
+    mock_pg([], [], exception='bang!')
+    out = json.loads(analyse_and_format(fmt='json', only=['idx_unused'], profile=True))
+    assert 'profile' not in out[0]
+
+
+def test_humanize():
+
+    assert Formatter.humanize_sizes([0, None, 1, 1023, 1024, 1536, 1024 ** 5, 1024 ** 9]) == [
+        '0 B', '0 B', '1.0 B', '1023.0 B', '1.0 KB', '1.5 KB', '1.0 PB', '1024.0 YB']
+    assert Formatter.humanize_size(123456789) == '117.74 MB'
+
+
+def test_columns_data():
+
+    result = InspectionResult(['a', 'b'], [(1, 2), (3, 4)])
+    assert result.get_columns_data() == [(1, 3), (2, 4)]
+    assert InspectionResult.from_columns_data(['a', 'b'], [(1, 3), (2, 4)]) == (['a', 'b'], [[1, 2], [3, 4]])
+    assert InspectionResult(['a', 'b'], []).get_columns_data() == [(), ()]
+
+
+def test_import_lightweight():
+    # CLI startup must not pull heavy modules in. Checked in a fresh interpreter.
+    heavy = ['psycopg', 'psycopg2', 'tabulate', 'asyncio', 'sqlite3', 'pyarrow', 'pg_analyse.inspections.bundled']
+    code = f'import sys, pg_analyse.cli; print([name for name in {heavy!r} if name in sys.modules])'
+
+    assert subprocess.check_output([sys.executable, '-c', code], text=True, cwd=Path(__file__).parent.parent).strip() == '[]'
+
+    code = (
+        'import sys; from pg_analyse.inspections import Inspection; '
+        'print(len(Inspection.inspections_all) > 0, "psycopg" in sys.modules)')
+
+    assert subprocess.check_output([sys.executable, '-c', code], text=True, cwd=Path(__file__).parent.parent).strip() == 'True False'
+
+
+def test_export(mock_pg, tmp_path):
+    pa = pytest.importorskip('pyarrow')
+    from pyarrow import ipc, parquet
+
+    rows = [['a', 1024, Decimal('1.50'), {'x': 1}], ['b', None, Decimal('20.25'), None], ['c', 3, None, [1]]]
+    mock_pg(['name', 'size', 'percent', 'extra'], rows, types={'name': 19, 'size': 20, 'extra': 3802})
+
+    inspections = analyse_and_export(tmp_path, only=['idx_unused', 'idx_bloat'], fetch_size=2)
+    assert [inspection.alias for inspection in inspections] == ['idx_bloat', 'idx_unused']
+
+    path, = (tmp_path / 'alias=idx_bloat').iterdir()
+    assert path.name.startswith('part-') and path.suffix == '.parquet'
+    table = parquet.read_table(path)
+    assert table.schema.types == [pa.string(), pa.int64(), pa.decimal128(38, 9), pa.string()]
+    assert table.to_pylist()[:2] == [
+        {'name': 'a', 'size': 1024, 'percent': Decimal('1.50'), 'extra': '{"x": 1}'},
+        {'name': 'b', 'size': None, 'percent': Decimal('20.25'), 'extra': None},
+    ]
+
+    # Runs do not overwrite each other.
+    analyse_and_export(tmp_path, only=['idx_bloat'])
+    assert len(list((tmp_path / 'alias=idx_bloat').iterdir())) == 2
+
+    analyse_and_export(tmp_path / 'arrow', fmt='arrow', only=['idx_unused'])
+    path, = (tmp_path / 'arrow' / 'alias=idx_unused').glob('*.arrow')
+    table = ipc.open_file(path).read_all()
+    assert table.num_rows == 3
+
+    # Values of subsequent batches are of types taken from the first one.
+    from pg_analyse.arrow import iter_record_batches, write_dataset
+
+    result = InspectionResult(
+        ['percent', 'numeric', 'size', 'name'],
+        [
+            [Decimal('9.50'), Decimal('1.5'), 1, 'a'],
+            [Decimal('12.50'), Decimal('1234567890123.1234567891'), 2.0, 2],
+            [None, None, None, None],
+        ])
+    result.types = [None, 1700, None, None]
+    batches = list(iter_record_batches(result, batch_size=1))
+    assert len({batch.schema for batch in batches}) == 1
+    assert pa.Table.from_batches(batches).to_pydict() == {
+        'percent': [Decimal('9.50'), Decimal('12.50'), None],
+        'numeric': [Decimal('1.5'), Decimal('1234567890123.123456789'), None],
+        'size': [1, 2, None],
+        'name': ['a', '2', None],
+    }
+
+    # Values not fitting types are not lost silently.
+    for values, types, error in (
+        ([1, 1.5], None, "Value 1.5 does not fit column type int64"),
+        ([1, 2 ** 70], None, f"Value {2 ** 70} does not fit column type int64"),
+        ([1, 'x'], None, "Value 'x' does not fit column type int64"),
+        ([Decimal('1'), Decimal(10 ** 35)], [1700], "does not fit column type decimal128(38, 9)"),
+        ([Decimal('NaN')], [1700], "Value Decimal('NaN') does not fit"),
+    ):
+        result = InspectionResult(['size'], [[value] for value in values])
+        result.types = types
+
+        with pytest.raises(ValueError, match=re.escape(error)):
+            list(iter_record_batches(result, batch_size=1))
+
+    # Overflowing first batch values are stringified.
+    result = InspectionResult(['size'], [[2 ** 70], [1]])
+    assert pa.Table.from_batches(list(iter_record_batches(result, batch_size=1))).to_pydict() == {
+        'size': [f'{2 ** 70}', '1']}
+
+    # Inspection export failure is reported, no partial file is left.
+    mock_pg(['size'], [[1], [1.5]])
+    inspections = write_dataset(
+        Analyser(fetch_size=1).iter_run(only=['idx_unused']), tmp_path / 'unfit', batch_size=1)
+    assert inspections[0].errors == ['Unable to export: Value 1.5 does not fit column type int64']
+    assert not list((tmp_path / 'unfit' / 'alias=idx_unused').iterdir())
+
+    mock_pg([], [], exception='bang!')
+    inspections = analyse_and_export(tmp_path / 'failed', only=['idx_unused'])
+    assert inspections[0].errors == ['bang!']
+    assert not (tmp_path / 'failed').exists()
+
+
+def test_pool(mock_pg):
+
+    mock = mock_pg(['some_size'], [[10]])
+
+    # Mock serves as a pool too.
+    analyser = Analyser(pool=mock, timeout=30)
+
+    for _ in range(2):
+        inspections = analyser.run(only=['idx_bloat'], arguments={'idx_bloat': {'bloat_min': '20'}})
+        assert inspections[0].result.rows == [[10]]
+
+    assert mock.returned == 2
+    assert mock.close_calls == 0
+    assert mock.prepared == 2
+    assert {'schema': 'public', 'bloat_min': 20} in mock.params
+
+    inspections = Analyser(pool=mock, workers=2).run(only=['idx_unused', 'idx_bloat'])
+    assert [inspection.result.rows for inspection in inspections] == [[[10]], [[10]]]
+    assert mock.returned == mock.taken
+
+    mock.autocommit = False
+    Analyser(pool=mock, pipeline=True).run(only=['idx_unused', 'idx_bloat'])
+    assert not mock.autocommit  # restored
+    assert mock.prepared == 6
+
+    # Parameters are typed after defaults.
+    inspection_cls = {inspection_cls.alias: inspection_cls for inspection_cls in Inspection.inspections_all}['seq_exh']
+    inspection = inspection_cls(args={'left_min': '3', 'unknown': '1'})
+    assert inspection.get_params() == {'schema': 'public', 'left_min': 3, 'unknown': '1'}
+    inspection = inspection_cls(args={'left_min': 'x'})
+    assert inspection.get_params()['left_min'] == 'x'
+
+
+def test_exporter(mock_pg):
+    from threading import Thread
+    from urllib.request import Request, urlopen
+
+    from pg_analyse.exporter import Exporter, get_server
+
+    mock = mock_pg(
+        ['index_name', 'index_size', 'bloat_percentage', 'scans'],
+        [['my "idx"', 8192, Decimal('12.5'), 3], ['other', None, 1, 0]])
+
+    exporter = Exporter(only=['idx_bloat', 'idx_unused'], arguments={'idx_unused': {'interval': '10'}})
+    exporter.refresh()
+
+    out = exporter.render()
+    assert 'pg_analyse_inspection_up{inspection="idx_bloat"} 1.0' in out
+    assert '# UNIT pg_analyse_idx_bloat_index_size_bytes bytes' in out
+    assert 'pg_analyse_idx_bloat_index_size_bytes{index_name="my \\"idx\\""} 8192.0' in out
+    assert 'pg_analyse_idx_unused_bloat_percentage{index_name="other"} 1.0' in out
+    assert 'index_size_bytes{index_name="other"}' not in out
+    assert 'scans' not in out
+    assert out.endswith('# EOF\n')
+
+    assert exporter._schedule['idx_unused'] < exporter._schedule['idx_bloat']  # own interval vs cache_ttl
+    assert exporter._get_due()[0] == []
+
+    # Refresh intervals are not inspections arguments.
+    assert exporter.intervals == {'idx_unused': 10}
+    assert all('interval' not in params for params in mock.params if params)
+    assert 'interval' not in exporter._snapshot['idx_unused'][0].arguments
+
+    # Failed refresh keeps the last good result.
+    executed = mock.executed
+    mock.exception = 'bang!'
+    exporter.refresh(only=['idx_bloat'])
+    out = exporter.render(openmetrics=False)
+    assert 'pg_analyse_inspection_up{inspection="idx_bloat"} 0.0' in out
+    assert 'index_size_bytes{index_name="my \\"idx\\""} 8192.0' in out
+    assert '# UNIT' not in out and '# EOF' not in out
+    assert mock.executed > executed
+
+    # Fleet mode.
+    exporter_fleet = Exporter(only=['idx_unused'], dsns=['host=one', 'host=two'])
+    exporter_fleet.analyser.run = lambda **kwargs: 1 / 0
+    inspections = exporter_fleet.refresh()
+    assert inspections[0].errors == ['division by zero']
+    assert 'pg_analyse_inspection_up{inspection="idx_unused"} 0.0' in exporter_fleet.render()
+
+    server = get_server(exporter, port=0)
+    Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        url = f'http://127.0.0.1:{server.server_port}'
+        executed = mock.executed
+
+        with urlopen(Request(f'{url}/metrics', headers={'Accept': 'application/openmetrics-text'})) as response:
+            assert response.headers['Content-Type'].startswith('application/openmetrics-text')
+            assert response.read().decode().endswith('# EOF\n')
+
+        assert mock.executed == executed  # Scrapes do not run queries.
+
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_snapshots(mock_pg, tmp_path):
+    from pg_analyse.encoding import dumps
+    from pg_analyse.snapshots import Snapshot, SnapshotStore, diff_snapshots
+
+    store = SnapshotStore(tmp_path)
+    dsn = 'host=myhost user=me password=secret'
+
+    mock_pg(['idx', 'idx_size', 'flag'], [['a', 10, True], ['b', 20, True], ['c', 30, False]])
+    Analyser(dsn=dsn, snapshots=store).run(only=['idx_unused', 'idx_bloat'])
+
+    mock_pg(['idx', 'idx_size', 'flag'], [['a', 10, True], ['b', 25, True], ['d', 40, True]])
+    list(Analyser(dsn=dsn, snapshots=store, fetch_size=2).iter_run(only=['idx_unused']))
+
+    paths = store.get_paths('host=myhost user=me password=other')
+    assert len(paths) == 2
+    assert not store.get_paths('host=other')
+
+    old, new = map(Snapshot.load, paths)
+    assert new.host == 'myhost'
+
+    inspections = diff_snapshots(old, new)
+    assert len(inspections) == 1
+
+    inspection = inspections[0]
+    assert inspection.alias == 'idx_unused'
+    assert inspection.result.columns == ['change', 'idx', 'idx_size', 'flag', 'idx_size_delta', 'flag_delta']
+    assert inspection.result.rows == [
+        ['changed', 'b', 25, True, 5, None],
+        ['added', 'd', 40, True, None, None],
+        ['removed', 'c', 30, False, None, None],
+    ]
+
+    out = json.loads(format_inspections(inspections, fmt='json', human=True))
+    assert out[0]['result']['rows'][0] == ['changed', 'b', '25.0 B', True, '5.0 B', None]
+
+    # Not unique keys: rows are compared as a whole.
+    old.inspections['idx_unused']['data'][0] = ('a', 'a', 'a')
+    result = diff_snapshots(old, new)[0].result
+    assert result.columns == ['change', 'idx', 'idx_size', 'flag']
+    assert result.rows == [
+        ['added', 'b', 25, True],
+        ['added', 'd', 40, True],
+        ['removed', 'a', 20, True],
+        ['removed', 'a', 30, False],
+    ]
+
+    # Data is not unpickled.
+    path = tmp_path / 'pickled.snapshot'
+    path.write_bytes(zlib.compress(pickle.dumps({'version': 1})))
+
+    with pytest.raises(ValueError, match='not a snapshot'):
+        Snapshot.load(path)
+
+    path.write_bytes(zlib.compress(dumps({'version': 1})))
+
+    with pytest.raises(ValueError, match='unsupported snapshot version 1'):
+        Snapshot.load(path)
+
+
+def test_timings(mock_pg, tmp_path):
+    from pg_analyse.timings import Timings
+
+    mock_pg(['some_size'], [[10]])
+    timings = Timings(tmp_path / 'timings.json')
+    dsn = 'host=myhost user=me password=secret'
+    only = ['idx_unused', 'idx_bloat', 'tbl_bloat']
+
+    # Cold start: static cost hints.
+    inspections = Analyser(dsn=dsn, workers=2, timings=timings).run(only=only)
+    assert [inspection.alias for inspection in inspections] == ['idx_bloat', 'idx_unused', 'tbl_bloat']
+    assert [inspection.expected for inspection in inspections] == [20, 1, 30]
+    assert [inspection.alias for inspection in Analyser._get_schedule(inspections)] == [
+        'tbl_bloat', 'idx_bloat', 'idx_unused']
+    assert all(inspection.elapsed >= 0 for inspection in inspections)
+
+    # Recorded times are used from now on, for the same instance only.
+    timings = Timings(tmp_path / 'timings.json')
+    inspection = inspections[2]
+    assert timings.get_expected(inspection, dsn='host=myhost user=me') == inspection.elapsed
+    assert timings.get_expected(inspection, dsn='host=other') == 30
+
+    out = json.loads(analyse_and_format(
+        dsn=dsn, fmt='json', only=['tbl_bloat'], timings=timings, profile=True))
+    assert out[0]['profile']['expected'] == round(inspection.elapsed, 6)
+
+    result = timings.get_result(dsn=dsn)
+    assert result.columns == ['inspection', 'runs', 'expected', 'last', 'last_expected', 'last_error_percent']
+    assert {row[0]: row[1] for row in result.rows} == {'tbl_bloat': 2, 'idx_bloat': 1, 'idx_unused': 1}
+
+    # Failed inspections are not recorded.
+    mock_pg([], [], exception='bang!')
+    asyncio.run(AsyncAnalyser(dsn=dsn, workers=2, timings=timings).run(only=only))
+    assert {row[0]: row[1] for row in timings.get_result(dsn=dsn).rows}['tbl_bloat'] == 2
+
+
+def test_catalog(mock_pg):
+    from pg_analyse.catalog import rewrite
+
+    sql = (
+        "SELECT pg_class.relname, 'pg_index'::regclass -- pg_index\n"
+        "FROM pg_catalog.pg_index i JOIN pg_class ON pg_class.oid = i.indrelid, pg_indexes, myschema.pg_index")
+    assert rewrite(sql, ('pg_class', 'pg_index')) == (
+        "SELECT pg_analyse_pg_class.relname, 'pg_index'::regclass -- pg_index\n"
+        "FROM pg_temp.pg_analyse_pg_index i JOIN pg_temp.pg_analyse_pg_class "
+        "ON pg_analyse_pg_class.oid = i.indrelid, pg_indexes, myschema.pg_index")
+
+    names = ['pg_namespace', 'pg_class', 'pg_index', 'pg_attribute', 'pg_constraint']
+    mock = mock_pg(['relname', 'columns'], [(name, 'relname, relkind') for name in names])
+
+    only = ['idx_dub', 'idx_fk', 'idx_unused']
+    inspections = Analyser(catalog=True).run(only=only)
+    assert all(not inspection.errors for inspection in inspections)
+
+    creates = [query for query in mock.queries if query.startswith('CREATE TEMP TABLE')]
+    assert len(creates) == 5
+    assert creates[0] == (
+        'CREATE TEMP TABLE pg_analyse_pg_class AS SELECT oid, relname, relkind FROM pg_catalog.pg_class '
+        "WHERE relnamespace NOT IN (SELECT oid FROM pg_catalog.pg_namespace "
+        "WHERE nspname IN ('pg_catalog', 'information_schema') OR nspname LIKE 'pg\\_toast%')")
+
+    # A copy per worker connection, dropped when pooled connection is returned.
+    mock.queries.clear()
+    analyser = Analyser(catalog=True, workers=2, pool=mock)
+    analyser.run(only=only)
+    queries = [f'{query}' for query in mock.queries]
+    assert 1 <= len([query for query in queries if query.startswith('CREATE TEMP TABLE pg_analyse_pg_class')]) <= 2
+    drops = [query for query in queries if query.startswith('DROP TABLE IF EXISTS pg_temp.pg_analyse_pg_class, ')]
+    assert len(drops) == mock.taken
+    assert not analyser._catalog_ready
+
+    # Inspections not reading catalogs do not trigger copying.
+    mock.queries.clear()
+    Analyser(catalog=True).run(only=['idx_unused'])
+    assert not [query for query in mock.queries if 'pg_analyse_pg' in query]
+
+    # Unable to copy: catalogs are read directly.
+    mock = mock_pg(['relname', 'columns'], [('pg_class', 'relname')])
+    analyser = Analyser(catalog=True)
+    inspections = analyser.run(only=only)
+    assert all(not inspection.errors for inspection in inspections)
+    assert not [query for query in mock.queries if query.startswith('CREATE')]
+    assert mock.rolled_back == 1
+
+
+def test_client_engine(mock_pg):
+    from pg_analyse.inspections.client import (
+        ForeignKeyDefinition, find_duplicated_foreign_keys, find_intersected_foreign_keys,
+    )
+
+    index_columns = [
+        'schema_name', 'table_name', 'index_name', 'index_size', 'access_method', 'key_columns_count',
+        'columns', 'opclasses', 'predicate', 'is_unique']
+
+    mock = mock_pg(index_columns, [
+        ['my', 't1', 'i_a', 10, 'btree', 1, ['a'], [1978], '', False],
+        ['my', 't1', 'i_a_dub', 20, 'btree', 1, ['a'], [1978], '', False],
+        ['my', 't1', 'i_a_partial', 30, 'btree', 1, ['a'], [1978], '(a > 0)', False],
+        ['my', 't1', 'i_a_b', 40, 'btree', 2, ['a', 'b'], [1978, 1978], '', True],
+        ['my', 't1', 'i_a_incl', 50, 'btree', 1, ['a', 'c'], [1978], '', False],
+        ['my', 't1', 'i_b_a', 60, 'btree', 2, ['b', 'a'], [1978, 1978], '', False],
+        ['my', 't1', 'i_a_hash', 70, 'hash', 1, ['a'], [1977], '', False],
+        ['my', 't2', 'i_a', 80, 'btree', 1, ['a'], [1978], '', False],
+    ])
+
+    def run(alias: str, engine: str = 'client') -> Inspection:
+        return Analyser().run(only=[alias], arguments={alias: {'engine': engine, 'schema': 'my'}})[0]
+
+    inspection = run('idx_dub')
+    assert mock.queries[-1].startswith('-- Compact definitions of indexes')
+    assert mock.params[-1]['schema'] == ['my']
+    assert inspection.result.columns == ['table_name', 'duplicated_indexes']
+    assert inspection.result.rows == [['t1', 'idx=i_a, size=10; idx=i_a_dub, size=20']]
+
+    inspection = run('idx_intersect')
+    assert inspection.result.rows == [
+        ['t1', 'idx=i_a, size=10; idx=i_a_b, size=40'],
+        ['t1', 'idx=i_a_b, size=40; idx=i_a_dub, size=20'],
+        ['t1', 'idx=i_a_b, size=40; idx=i_a_incl, size=50'],
+    ]
+
+    out = json.loads(format_inspections([inspection], fmt='json'))
+    assert out[0]['result']['columns'] == ['table_name', 'intersected_indexes']
+
+    # SQL engine is the default.
+    inspection = run('idx_dub', engine='sql')
+    assert inspection.result.columns == index_columns
+    assert not mock.queries[-1].startswith('-- Compact definitions')
+
+    mock_pg(['schema_name', 'table_name', 'constraint_name', 'foreign_table_name', 'columns', 'foreign_columns'], [
+        ['my', 't1', 'fk_1', 't2', [1, 2], [1, 2]],
+        ['my', 't1', 'fk_2', 't2', [2, 1], [2, 1]],
+        ['my', 't1', 'fk_3', 't3', [2], [1]],
+    ])
+    assert run('fk_dub').result.rows == [['t1', 'fk_1', 'fk_2']]
+    assert run('fk_isect').result.rows == [['t1', 'fk_1', 'fk_3'], ['t1', 'fk_2', 'fk_3']]
+
+    definitions = [ForeignKeyDefinition('t', f'fk_{idx}', 'r', ((idx, 1),)) for idx in range(100000)]
+    assert find_duplicated_foreign_keys(definitions) == []
+    assert find_intersected_foreign_keys(definitions) == []
+
+
+def test_schemas(mock_pg):
+
+    assert parse_args_string('common:schema=one,schema=tenant_*,bloat_min=20') == {
+        'common': {'schema': ['one', 'tenant_*'], 'bloat_min': '20'}}
+
+    mock = mock_pg(['schema', 'some_size'], [['one', 10], ['tenant_1', 20]])
+
+    inspection = Analyser().run(only=['idx_bloat'], arguments={'common': {'schema': ['one', 'tenant_*']}})[0]
+    assert inspection.result.rows == [['one', 10], ['tenant_1', 20]]
+    assert mock.executed == 1
+
+    sql = mock.queries[-1]
+    assert sql.startswith(
+        'SELECT pg_analyse_schemas.nspname AS schema, pg_analyse_result.* FROM (SELECT nspname FROM ')
+    assert 'schema_name_param = pg_analyse_schemas.nspname and ' in sql
+    assert sql.endswith('%(bloat_min)s\n) pg_analyse_result')
+
+    params = mock.params[-1]
+    assert params['pg_analyse_schemas'] == ['one', 'tenant\\_%']
+    assert 'schema' not in params
+    assert params['bloat_min'] == 50
+
+    # A pattern.
+    Analyser().run(only=['idx_bloat'], arguments={'idx_bloat': {'schema': 'a?c'}})
+    assert mock.params[-1]['pg_analyse_schemas'] == ['a_c']
+
+    # Inspections without schema argument are run as usual.
+    Analyser().run(only=['q_slowest'], arguments={'common': {'schema': ['one', 'tenant_*']}})
+    assert 'pg_analyse_schemas' not in mock.queries[-1]
+    assert 'pg_analyse_schemas' not in mock.params[-1]
+
+    # A plain schema name.
+    Analyser().run(only=['idx_bloat'], arguments={'idx_bloat': {'schema': 'my_schema'}})
+    assert mock.params[-1]['schema'] == 'my_schema'
+    assert mock.queries[-1].startswith('-- local placeholder')
+
+    # Client engine fetches all schemas definitions at once.
+    columns = ['schema_name', 'table_name', 'constraint_name', 'foreign_table_name', 'columns', 'foreign_columns']
+    mock = mock_pg(columns, [
+        ['b', 't1', 'fk_1', 't2', [1], [1]],
+        ['b', 't1', 'fk_2', 't2', [1], [1]],
+        ['a', 't1', 'fk_1', 't2', [1], [1]],
+        ['a', 't1', 'fk_2', 't2', [1], [1]],
+        ['c', 't1', 'fk_1', 't2', [1], [1]],
+    ])
+    inspection = Analyser().run(only=['fk_dub'], arguments={'fk_dub': {'schema': '*'}})[0]
+    assert mock.queries[-1].startswith('-- Compact definitions')
+    assert mock.params[-1]['schema'] == ['%']
+    assert inspection.result.columns == ['schema', 'table_name', 'constraint_name', 'duplicate_constraint_name']
+    assert inspection.result.rows == [['a', 't1', 'fk_1', 'fk_2'], ['b', 't1', 'fk_1', 'fk_2']]
+
+    # SQL engine when passed explicitly.
+    Analyser().run(only=['fk_dub'], arguments={'fk_dub': {'schema': '*', 'engine': 'sql'}})
+    assert mock.queries[-1].startswith('SELECT pg_analyse_schemas.nspname AS schema')
+
+    # Braces in inspection SQL are kept.
+    class Braces(Inspection):
+        params = {'schema': 'public'}
+        sql_name = 'braces'
+
+        def _tpl_read(self) -> str:
+            return "SELECT '{}'::int[] AS ids WHERE :schema <> '{sql}';"
+
+    assert Braces(args={'schema': 't_*'}).get_sql().endswith(
+        "(\nSELECT '{}'::int[] AS ids WHERE pg_analyse_schemas.nspname <> '{sql}'\n) pg_analyse_result")
+
+
+def test_shards(mock_pg):
+    from pg_analyse.inspections import InspectionResult
+    from pg_analyse.shards import get_shards, get_view_sql, merge_results, rewrite_shard
+
+    assert get_shards([100, 100, 200]) == [(0, 100), (100, 200), (200, None)]
+    assert get_shards([]) == [(0, None)]
+    assert get_view_sql(relkinds=('i',), shard=(100, 200)) == (
+        'CREATE TEMP VIEW pg_analyse_shard_pg_class AS SELECT * FROM pg_catalog.pg_class '
+        "WHERE relkind NOT IN ('i') OR (oid::bigint >= 100 AND oid::bigint < 200)")
+    assert rewrite_shard('SELECT pg_class.relname FROM pg_catalog.pg_class JOIN pg_index i') == (
+        'SELECT pg_analyse_shard_pg_class.relname FROM pg_temp.pg_analyse_shard_pg_class JOIN pg_index i')
+
+    merged = merge_results([
+        InspectionResult(['a', 'b'], [[1, 'x'], [3, None]]),
+        InspectionResult(['a', 'b'], [[2, 'y'], [3, 'z']]),
+    ], order=['a', 'b'])
+    assert merged.rows == [[1, 'x'], [2, 'y'], [3, 'z'], [3, None]]
+
+    mock = mock_pg(['table_name', 'index_name'], [[[100, 200], 'b'], [[100, 200], 'c']])
+
+    inspection = Analyser(shards=3, workers=2).run(only=['idx_bloat', 'idx_unused'])[0]
+    assert inspection.alias == 'idx_bloat'
+    assert not inspection.errors
+    assert [row[1] for row in inspection.result.rows] == ['b', 'b', 'b', 'c', 'c', 'c']
+    assert inspection.elapsed is not None
+
+    views = sorted(query for query in mock.queries if query.startswith('CREATE TEMP VIEW'))
+    assert len(views) == 3
+
+    # Shards rows are ordered in code points order, the one of merge.
+    shard_queries = [query for query in mock.queries if query.startswith('SELECT * FROM (\n')]
+    assert len(shard_queries) == 3
+    assert shard_queries[0].endswith(
+        ') pg_analyse_shard ORDER BY pg_analyse_shard."table_name" COLLATE "C", '
+        'pg_analyse_shard."index_name" COLLATE "C"')
+
+    # Own pool fits all shards of an inspection.
+    assert Analyser(pool=True, shards=4)._get_pool_size() == 4
+    assert Analyser(pool=True, shards=4, workers=6)._get_pool_size() == 6
+    assert Analyser(pool=True, shards=4, pipeline=True)._get_pool_size() == 1
+    assert views[0].endswith('(oid::bigint >= 0 AND oid::bigint < 100)')
+    assert views[2].endswith('(oid::bigint >= 200)')
+
+    # Not sharded.
+    mock.queries.clear()
+    Analyser(shards=3, pipeline=True).run(only=['idx_bloat'])
+    assert not [query for query in mock.queries if 'pg_analyse_shard' in f'{query}']
+
+    # Errors of shards.
+    mock_pg(['table_name'], [[[100]]], exception='failed')
+    inspection = Analyser(shards=2).run(only=['idx_bloat'])[0]
+    assert inspection.errors == ['failed']
+    assert inspection.result is None
+
+
+def test_consistent(mock_pg):
+    mock = mock_pg(['snapshot'], [["00000003-0000001B-1"]])
+
+    only = ['idx_unused', 'idx_bloat', 'tbl_bloat']
+    inspections = Analyser(workers=2, consistent=True).run(only=only)
+    assert all(not inspection.errors for inspection in inspections)
+
+    queries = [f'{query}' for query in mock.queries]
+    assert queries[:2] == [
+        'SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY',
+        'SELECT pg_catalog.pg_export_snapshot()',
+    ]
+    assert queries.count("SET TRANSACTION SNAPSHOT '00000003-0000001B-1'") == 3
+    assert queries.count('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY') == 4
+
+    # Catalogs are read directly, as copies would not be visible in the snapshot.
+    mock.queries.clear()
+    inspections = Analyser(workers=2, consistent=True, catalog=True).run(only=['idx_dub', 'idx_fk'])
+    assert all(not inspection.errors for inspection in inspections)
+    queries = [f'{query}' for query in mock.queries]
+    assert queries.count("SET TRANSACTION SNAPSHOT '00000003-0000001B-1'") == 2
+    assert not [query for query in queries if 'pg_analyse_pg_' in query]
+
+    # The leader connection is not taken from the pool.
+    mock.close_calls = 0
+    Analyser(workers=2, consistent=True, pool=mock).run(only=only)
+    assert mock.taken == mock.returned <= 2
+    assert mock.close_calls == 1
+
+    # One connection: no snapshot exported.
+    mock.queries.clear()
+    Analyser(consistent=True).run(only=only)
+    assert not [query for query in mock.queries if 'SNAPSHOT' in f'{query}']
+
+    # Unable to export: connections take their own snapshots.
+    mock = mock_pg(['snapshot'], [], exception='not supported')
+    inspections = Analyser(workers=2, consistent=True).run(only=only)
+    assert all(inspection.errors == ['not supported'] for inspection in inspections)
+    assert not [query for query in mock.queries if 'SNAPSHOT' in f'{query}' and 'export' not in f'{query}']